@@ -0,0 +1,142 @@
+import argparse
+import os
+import sys
+import threading
+
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get('ANALYTICS_REFRESH_SECONDS', 30))
+LOW_STOCK_THRESHOLD = int(os.environ.get('LOW_STOCK_THRESHOLD', 5))
+
+# Each statement folds the orders in (%s, %s] into one rollup table
+ROLLUP_QUERIES = [
+    """
+    INSERT INTO sales_by_game (game_id, units, revenue, last_sold)
+    SELECT oi.game_id, COUNT(*), SUM(COALESCE(oi.price, g.price, 0)), MAX(uo.date_order)
+    FROM user_orders uo
+    JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE uo.order_id > %s AND uo.order_id <= %s
+    GROUP BY oi.game_id
+    ON DUPLICATE KEY UPDATE units = units + VALUES(units), revenue = revenue + VALUES(revenue),
+                            last_sold = GREATEST(COALESCE(last_sold, VALUES(last_sold)), VALUES(last_sold))
+    """,
+    """
+    INSERT INTO sales_by_platform (platform, units, revenue)
+    SELECT COALESCE(g.platform, 'Unknown'), COUNT(*), SUM(COALESCE(oi.price, g.price, 0))
+    FROM user_orders uo
+    JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE uo.order_id > %s AND uo.order_id <= %s
+    GROUP BY COALESCE(g.platform, 'Unknown')
+    ON DUPLICATE KEY UPDATE units = units + VALUES(units), revenue = revenue + VALUES(revenue)
+    """,
+    """
+    INSERT INTO sales_by_day (day, orders, units, revenue)
+    SELECT uo.date_order, COUNT(DISTINCT uo.order_id), COUNT(oi.game_id),
+           COALESCE(SUM(COALESCE(oi.price, g.price)), 0)
+    FROM user_orders uo
+    LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE uo.order_id > %s AND uo.order_id <= %s AND uo.date_order IS NOT NULL
+    GROUP BY uo.date_order
+    ON DUPLICATE KEY UPDATE orders = orders + VALUES(orders), units = units + VALUES(units),
+                            revenue = revenue + VALUES(revenue)
+    """,
+]
+
+
+def refresh(cnx, batch_size=5000):
+    """
+    Fold every order after the stored watermark into the rollup tables, `batch_size` orders
+    per transaction, and return the number of orders processed.
+
+    The watermark row is locked for the duration of each batch, so concurrent refreshers
+    (one per worker) take turns instead of double counting. The batch's orders are read
+    with a locking read, which waits for checkouts still inserting into that id range
+    rather than skipping past an order that commits late.
+    """
+    cursor = cnx.cursor()
+    processed = 0
+    try:
+        while True:
+            cursor.execute("SELECT last_order_id FROM sales_rollup_state WHERE id = 1 FOR UPDATE")
+            last_order_id = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT order_id FROM user_orders
+                WHERE order_id > %s
+                ORDER BY order_id
+                LIMIT %s
+                LOCK IN SHARE MODE
+            """, (last_order_id, batch_size))
+            order_ids = [row[0] for row in cursor.fetchall()]
+            if not order_ids:
+                cnx.rollback()
+                break
+
+            for query in ROLLUP_QUERIES:
+                cursor.execute(query, (last_order_id, order_ids[-1]))
+            cursor.execute("UPDATE sales_rollup_state SET last_order_id = %s, refreshed_at = NOW() WHERE id = 1",
+                           (order_ids[-1],))
+            cnx.commit()
+            processed += len(order_ids)
+            if len(order_ids) < batch_size:
+                break
+    finally:
+        cursor.close()
+    return processed
+
+
+def reset(cnx):
+    """
+    Empty the rollups and rewind the watermark, so the next refresh recomputes everything.
+    """
+    cursor = cnx.cursor()
+    try:
+        cursor.execute("SELECT last_order_id FROM sales_rollup_state WHERE id = 1 FOR UPDATE")
+        cursor.fetchall()
+        for table in ('sales_by_game', 'sales_by_platform', 'sales_by_day'):
+            cursor.execute("DELETE FROM {}".format(table))
+        cursor.execute("UPDATE sales_rollup_state SET last_order_id = 0, refreshed_at = NULL WHERE id = 1")
+        cnx.commit()
+    finally:
+        cursor.close()
+
+
+class RollupRefresher:
+    def __init__(self, db, interval=ANALYTICS_REFRESH_SECONDS):
+        """
+        Refresh the sales rollups every `interval` seconds on a daemon thread (0 disables it,
+        e.g. when `python analytics.py refresh` runs from cron instead).
+        """
+        self.db = db
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sales-rollups', daemon=True)
+
+    def start(self):
+        if self.interval > 0:
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.db.refresh_sales_rollups()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the precomputed sales rollups.")
+    parser.add_argument('command', choices=['refresh', 'rebuild'])
+    args = parser.parse_args(argv)
+
+    from storageBackend import open_backend
+
+    processed = open_backend().refresh_sales_rollups(rebuild=args.command == 'rebuild')
+    if processed is None:
+        return 1
+    print("Rolled up {} orders".format(processed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
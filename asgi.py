@@ -0,0 +1,276 @@
+"""
+ASGI entry point for the storefront, an alternative to the threaded `python main.py` server:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+    python asgi.py              (the same, when uvicorn is installed)
+
+The read-heavy pages (/home, /filter, /game/<id>, /profile) are coroutines that read through
+AsyncMySql, so while they wait on MySQL the event loop serves other requests instead of a
+thread sitting blocked per request. They render main.py's templates with its sessions, hooks,
+ETags and page cache. Every other route is main.py's Flask view, run in a worker thread
+(asyncio.to_thread) on the synchronous MySql pool.
+
+To try it locally, point DB_HOST/DB_PORT at a MySQL container, e.g.
+`docker run -e MYSQL_ROOT_PASSWORD=root -p 3306:3306 mysql:8`, and start it once with
+`python migrate.py bootstrap`. benchmarks/asgi_bench.py compares it with the threaded server.
+"""
+import asyncio
+import functools
+import io
+import os
+import sys
+
+from flask import g, redirect, request, session, url_for
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Response
+
+import main
+from asyncSqlCommands import AsyncMySql
+from sqlCommands import MySql
+from sessionStore import USER_CACHE_TTL
+
+ASGI_POOL_SIZE = int(os.environ.get('ASGI_DB_POOL_SIZE', 10))
+
+flask_app = main.app
+# Shares the sync layer's catalog cache, so writes made through MySql invalidate these pages too.
+# The async views read MySQL; on another backend (DB_BACKEND=sqlite) every route runs in a thread.
+db = None
+if isinstance(main.crsr, MySql):
+    db = AsyncMySql(pool_size=ASGI_POOL_SIZE, catalog_cache=main.crsr.catalog_cache, profiler=main.crsr.profiler)
+
+# Flask endpoint -> coroutine serving it for GET and HEAD
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint):
+    def register(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return register
+
+
+async def load_request_state():
+    """
+    Fetch what templates would otherwise load synchronously (library, user row) into `g`,
+    concurrently, so rendering does no blocking database I/O. Views load their covers with load_covers.
+    """
+    loads = {}
+    if 'user_id' in session:
+        user_id = session['user_id']
+        loads['library'] = db.get_owned_game_ids(user_id)
+        user_key = 'user:{}'.format(user_id)
+        g.user = main.session_store.get(user_key)
+        if g.user is None:
+            loads['user'] = db.get_user_profile(user_id)
+    results = dict(zip(loads, await asyncio.gather(*loads.values())))
+    if 'library' in results:
+        g.library = results['library'] or set()
+    if results.get('user') is not None:
+        g.user = results['user']
+        main.session_store.set('user:{}'.format(g.user['user_id']), g.user, USER_CACHE_TTL)
+
+
+async def load_covers(games):
+    """
+    main.load_covers, awaited, for the games a view is about to render.
+    """
+    game_ids = [game['game_id'] for game in games]
+    if game_ids:
+        main.add_covers(game_ids, await db.get_cover_map(game_ids))
+
+
+def async_catalog_page(view):
+    """
+    main.catalog_page for coroutine views.
+    """
+    @functools.wraps(view)
+    async def wrapper(**kwargs):
+        if not main.catalog_page_shareable():
+            await load_request_state()
+            return main.private_response(await view(**kwargs))
+
+        version = await db.get_catalog_version()
+        etag = main.catalog_etag(version)
+        if request.if_none_match.contains_weak(etag):
+            return main.shared_response('', etag, 304)
+        key = (request.full_path, version)
+        html = main.page_cache.get(key)
+        if html is None:
+            await load_request_state()
+            html = await view(**kwargs)
+            if not isinstance(html, str):
+                return html
+            main.page_cache.set(key, html)
+        return main.shared_response(html, etag)
+    return wrapper
+
+
+@async_view('home')
+@async_catalog_page
+async def home():
+    page = await db.get_games_by_platform(platform='pc', **main.page_args())
+    if page:
+        await load_covers(page[0])
+    return main.render_listing('home', 'PC', page)
+
+
+@async_view('filter_games')
+@async_catalog_page
+async def filter_games():
+    platform = request.values.get('platform')
+    if not platform:
+        return redirect(url_for('home'))
+    page = await db.get_games_by_platform(platform=platform, **main.page_args())
+    if page:
+        await load_covers(page[0])
+    return main.render_listing('filter_games', platform, page, platform=platform)
+
+
+@async_view('game_details')
+@async_catalog_page
+async def game_details(game_id):
+    game = await db.get_game_by_id(game_id)
+    if game:
+        await load_covers([game])
+    return main.render_game(game)
+
+
+@async_view('profile')
+async def profile():
+    await load_request_state()
+    user = g.get('user')
+    if not user:
+        return redirect(url_for('home'))
+    profile_data = await db.get_profile(user['user_id'], before_order_id=request.args.get('before', type=int),
+                                        library_after=request.args.get('after', type=int))
+    if profile_data:
+        await load_covers(profile_data['library'])
+    return main.render_profile(user, profile_data)
+
+
+def wsgi_environ(scope, body):
+    """
+    Build a WSGI environ for an ASGI HTTP request whose body has been read in full.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def async_endpoint(environ):
+    """
+    Return (view, kwargs) when the request is for an async view, otherwise None.
+    """
+    if db is None or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+        return None
+    try:
+        endpoint, kwargs = flask_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    view = ASYNC_VIEWS.get(endpoint)
+    return (view, kwargs) if view else None
+
+
+async def dispatch_async(environ, view, kwargs):
+    """
+    Flask's full_dispatch_request with an awaited view: before/after-request hooks, error
+    handlers and the session all behave as for the sync views.
+    """
+    ctx = flask_app.request_context(environ)
+    ctx.push()
+    error = None
+    try:
+        try:
+            try:
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view(**kwargs)
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            return flask_app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            return flask_app.handle_exception(e)
+    finally:
+        ctx.pop(error)
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_response(send, response, head=False):
+    body = b'' if head else response.get_data()
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()
+               if name.lower() != 'content-length']
+    headers.append((b'content-length', str(len(response.get_data())).encode()))
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if db is not None:
+                await db.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise RuntimeError("Unsupported ASGI scope type: {}".format(scope['type']))
+
+    environ = wsgi_environ(scope, await read_body(receive))
+    target = async_endpoint(environ)
+    if target:
+        response = await dispatch_async(environ, *target)
+    else:
+        response = await asyncio.to_thread(Response.from_app, flask_app.wsgi_app, environ, buffered=True)
+    await send_response(send, response, head=scope['method'] == 'HEAD')
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Serving asgi:app needs an ASGI server, e.g. `pip install uvicorn`")
+    uvicorn.run(app, host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 8000)))
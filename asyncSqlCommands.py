@@ -0,0 +1,159 @@
+"""
+Asyncio counterpart of sqlCommands.MySql for the read-heavy pages served by asgi.py.
+
+It runs the same queries through mysql.connector.aio (the connector's native asyncio driver)
+on its own AsyncConnectionPool, so a page waiting on MySQL yields the event loop instead of
+holding a thread. Writes stay on the synchronous MySql.
+"""
+import mysql.connector
+import mysql.connector.aio
+
+from catalogCache import CatalogCache
+from connectionPool import AsyncConnectionPool
+from queryProfiler import QueryProfiler
+from sqlCommands import (CATALOG_VERSION_QUERY, COVER_MAP_QUERY, DB_CONFIG, GAME_BY_ID_QUERY, LIBRARY_PAGE_QUERY,
+                         ORDER_HISTORY_QUERY, OWNED_GAME_IDS_QUERY, POOL_HEALTH_CHECK, USER_PROFILE_QUERY,
+                         USER_SUMMARY_QUERY, game_page_query)
+from storageBackend import (CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL, ORDER_PAGE_SIZE, PAGE_SIZE, POOL_SIZE, POOL_TIMEOUT,
+                            SLOW_QUERY_MS, build_profile, cover_map_from_rows, profile_limits, split_page)
+
+
+class AsyncMySql:
+    def __init__(self, pool_size=POOL_SIZE, pool_timeout=POOL_TIMEOUT, health_check=POOL_HEALTH_CHECK,
+                 catalog_cache=None, profiler=None):
+        """
+        Initialize the pool of asyncio connections. Pass the synchronous MySql's catalog_cache
+        and profiler to share cached pages (and their invalidation on writes) and query stats
+        with it. The schema is left to MySql, which checks it at startup.
+        """
+        self.profiler = profiler or QueryProfiler(slow_threshold_ms=SLOW_QUERY_MS)
+        self.pool = AsyncConnectionPool(lambda: mysql.connector.aio.connect(**DB_CONFIG),
+                                        size=pool_size, timeout=pool_timeout, health_check=health_check,
+                                        wrap=self.profiler.wrap_async)
+        self.catalog_cache = catalog_cache or CatalogCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def _cached(self, key, loader):
+        """
+        CatalogCache.get_or_load for a coroutine loader.
+        """
+        value = self.catalog_cache.get(key)
+        if value is None:
+            value = await loader()
+            if value is not None:
+                self.catalog_cache.set(key, value)
+        return value
+
+    async def _fetch(self, query, params=(), dictionary=True, one=False):
+        async with self.pool.connection() as cnx:
+            cursor = await cnx.cursor(dictionary=dictionary)
+            try:
+                await cursor.execute(query, params)
+                return await cursor.fetchone() if one else await cursor.fetchall()
+            finally:
+                await cursor.close()
+
+    async def get_catalog_version(self):
+        """
+        Return the catalog version counter (see MySql.get_catalog_version).
+        """
+        return await self._cached('version', self._load_catalog_version) or 0
+
+    async def _load_catalog_version(self):
+        try:
+            row = await self._fetch(CATALOG_VERSION_QUERY, dictionary=False, one=True)
+            return row[0] if row else None
+        except mysql.connector.Error as e:
+            print("Error reading catalog version: {}".format(e))
+            return None
+
+    async def get_games_by_platform(self, platform=None, after_id=None, limit=PAGE_SIZE):
+        """
+        Retrieve one page of games for the specified platform. Returns (games, next_after_id), or None on error.
+        """
+        key = (platform.lower() if platform else None, after_id, limit)
+        return await self._cached(key, lambda: self._load_game_page(platform, after_id, limit))
+
+    async def _load_game_page(self, platform, after_id, limit):
+        query, params, limit = game_page_query(platform, after_id, limit)
+        try:
+            return split_page(await self._fetch(query, params), limit, 'game_id')
+        except mysql.connector.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    async def get_game_by_id(self, game_id):
+        """
+        Retrieve a game by its ID, including games_count.
+        """
+        try:
+            return await self._fetch(GAME_BY_ID_QUERY, (game_id,), one=True)
+        except mysql.connector.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    async def get_user_profile(self, user_id):
+        """
+        Retrieve the displayable fields of a user (everything but the password hash).
+        """
+        try:
+            return await self._fetch(USER_PROFILE_QUERY, (user_id,), one=True)
+        except mysql.connector.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    async def get_owned_game_ids(self, user_id):
+        """
+        Retrieve the set of game_ids owned by a user with a single query.
+        """
+        try:
+            return {row[0] for row in await self._fetch(OWNED_GAME_IDS_QUERY, (user_id,), dictionary=False)}
+        except mysql.connector.Error as e:
+            print(f"Error fetching owned game ids: {e}")
+            return None
+
+    async def get_profile(self, user_id, before_order_id=None, library_after=None, order_limit=ORDER_PAGE_SIZE,
+                          library_limit=PAGE_SIZE):
+        """
+        Retrieve the profile summary, a library page and an order history page (see MySql.get_profile).
+        """
+        before, after, order_limit, library_limit = profile_limits(before_order_id, library_after, order_limit,
+                                                                   library_limit)
+        try:
+            async with self.pool.connection() as cnx:
+                cursor = await cnx.cursor(dictionary=True)
+                try:
+                    await cursor.execute(USER_SUMMARY_QUERY, (user_id,))
+                    summary = await cursor.fetchone()
+                    await cursor.execute(LIBRARY_PAGE_QUERY, (user_id, after, library_limit + 1))
+                    library = await cursor.fetchall()
+                    await cursor.execute(ORDER_HISTORY_QUERY, (user_id, before, order_limit + 1))
+                    order_rows = await cursor.fetchall()
+                finally:
+                    await cursor.close()
+            return build_profile(summary, library, order_rows, order_limit, library_limit)
+        except mysql.connector.Error as e:
+            print("Error fetching profile: {}".format(e))
+            return None
+
+    async def get_cover_map(self, game_ids):
+        """
+        Return {game_id: {(variant, format): filename}} for the processed covers of `game_ids`.
+        """
+        game_ids = sorted({int(game_id) for game_id in game_ids})
+        if not game_ids:
+            return {}
+        return await self._cached(('covers', tuple(game_ids)), lambda: self._load_cover_map(game_ids)) or {}
+
+    async def _load_cover_map(self, game_ids):
+        try:
+            query = COVER_MAP_QUERY.format(', '.join(['%s'] * len(game_ids)))
+            return cover_map_from_rows(await self._fetch(query, game_ids, dictionary=False))
+        except mysql.connector.Error as e:
+            print("Error fetching cover variants: {}".format(e))
+            return None
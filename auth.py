@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger('gamestore.auth')
+
+# Any werkzeug method string; the cost is part of it (e.g. scrypt:N:r:p or pbkdf2:sha256:iterations).
+# Stored hashes made with a different method are replaced at the user's next login.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+# At most AUTH_WORKERS hashes run at once; beyond AUTH_MAX_PENDING queued ones, callers wait
+# up to AUTH_QUEUE_TIMEOUT seconds and are then turned away
+AUTH_WORKERS = int(os.environ.get('AUTH_WORKERS', 2))
+AUTH_MAX_PENDING = int(os.environ.get('AUTH_MAX_PENDING', 16))
+AUTH_QUEUE_TIMEOUT = float(os.environ.get('AUTH_QUEUE_TIMEOUT', 2))
+
+# Attempts per client IP, and failed attempts per username, allowed in each LOGIN_WINDOW seconds
+LOGIN_IP_LIMIT = int(os.environ.get('LOGIN_IP_LIMIT', 20))
+LOGIN_USER_LIMIT = int(os.environ.get('LOGIN_USER_LIMIT', 5))
+LOGIN_WINDOW = float(os.environ.get('LOGIN_WINDOW', 300))
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Too many attempts; retry in {}s".format(retry_after))
+        self.retry_after = retry_after
+
+
+class AuthBusy(Exception):
+    """
+    Raised when the hashing pool is saturated.
+    """
+
+
+def hash_method(password_hash):
+    """
+    Return the method part of a werkzeug hash, e.g. 'scrypt:32768:8:1'.
+    """
+    return password_hash.split('$', 1)[0] if password_hash else None
+
+
+class RateLimiter:
+    def __init__(self, limit, window, max_keys=100000):
+        """
+        Fixed-window counters per key, kept in this process (each worker counts separately).
+        """
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counters = {}
+        self.rejected = 0
+
+    def _counter(self, key, now):
+        counter = self._counters.get(key)
+        if counter is None or counter[0] + self.window <= now:
+            if len(self._counters) >= self.max_keys:
+                self._counters = {k: c for k, c in self._counters.items() if c[0] + self.window > now}
+            counter = self._counters[key] = [now, 0]
+        return counter
+
+    def check(self, key):
+        """
+        Return the seconds until `key` may try again, or 0 if it is under the limit.
+        """
+        with self._lock:
+            now = time.monotonic()
+            started, count = self._counter(key, now)
+            if count < self.limit:
+                return 0
+            self.rejected += 1
+            return max(1, int(started + self.window - now + 1))
+
+    def hit(self, key):
+        """
+        Count an attempt by `key`, returning check() as it was before counting it.
+        """
+        retry_after = self.check(key)
+        if not retry_after:
+            with self._lock:
+                self._counter(key, time.monotonic())[1] += 1
+        return retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class Authenticator:
+    def __init__(self, db, method=PASSWORD_HASH_METHOD, workers=AUTH_WORKERS, max_pending=AUTH_MAX_PENDING,
+                 queue_timeout=AUTH_QUEUE_TIMEOUT):
+        """
+        Log users in and sign them up, hashing passwords on a small dedicated thread pool.
+
+        werkzeug's hashes (hashlib's scrypt and pbkdf2_hmac) release the GIL, so capping the pool
+        at `workers` threads caps the CPU a login storm can take from catalog requests. Callers
+        block on the result; when `max_pending` hashes are already queued or running they wait
+        at most `queue_timeout` seconds for room before AuthBusy is raised.
+        """
+        self.db = db
+        self.method = method
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='auth')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.ip_limiter = RateLimiter(LOGIN_IP_LIMIT, LOGIN_WINDOW)
+        self.user_limiter = RateLimiter(LOGIN_USER_LIMIT, LOGIN_WINDOW)
+
+        # Checked when the username is unknown, so that case takes as long as a wrong password
+        self._dummy_hash = generate_password_hash('', method)
+        self.method_prefix = hash_method(self._dummy_hash)
+
+        self._lock = threading.Lock()
+        self._hashes = 0
+        self._busy = 0
+        self._rehashed = 0
+        self._total_hash = 0.0
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._busy += 1
+            raise AuthBusy("Password hashing pool is saturated")
+        try:
+            future = self._executor.submit(self._timed, func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _timed(self, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._hashes += 1
+                self._total_hash += time.perf_counter() - start
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, self.method).result()
+
+    def login(self, username, password, ip):
+        """
+        Return {'user_id', 'username'} for valid credentials, otherwise None.
+        Raises RateLimited or AuthBusy without checking the password.
+        """
+        user_key = 'user:{}'.format(username.lower())
+        retry_after = self.ip_limiter.hit('ip:{}'.format(ip)) or self.user_limiter.check(user_key)
+        if retry_after:
+            raise RateLimited(retry_after)
+
+        login = self.db.get_login(username)
+        password_hash = login['password_hash'] if login else self._dummy_hash
+        valid = self._run(check_password_hash, password_hash, password).result()
+        if not (login and valid):
+            self.user_limiter.hit(user_key)
+            return None
+
+        self.user_limiter.reset(user_key)
+        if hash_method(password_hash) != self.method_prefix:
+            try:
+                self._run(self._rehash, login['user_id'], password)
+            except AuthBusy:
+                pass  # Try again at the next login
+        return {'user_id': login['user_id'], 'username': login['username']}
+
+    def _rehash(self, user_id, password):
+        if self.db.update_password_hash(user_id, generate_password_hash(password, self.method)):
+            with self._lock:
+                self._rehashed += 1
+
+    def signup(self, username, password, phone, address, email, ip):
+        """
+        Create a user and return {'user_id', 'username'}, or None on error.
+        Raises RateLimited or AuthBusy before hashing, and AccountExists if the username or email is taken.
+        """
+        retry_after = self.ip_limiter.hit('ip:{}'.format(ip))
+        if retry_after:
+            raise RateLimited(retry_after)
+        password_hash = self.hash_password(password)
+        user_id = self.db.create_user([username, password_hash, phone, address, email])
+        if not user_id:
+            return user_id
+        return {'user_id': user_id, 'username': username}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method_prefix,
+                'hashes': self._hashes,
+                'avg_hash_ms': 1000 * self._total_hash / self._hashes if self._hashes else 0.0,
+                'busy_rejections': self._busy,
+                'rehashed': self._rehashed,
+                'ip_rate_limited': self.ip_limiter.rejected,
+                'user_rate_limited': self.user_limiter.rejected,
+            }
@@ -0,0 +1,240 @@
+"""
+Compare the threaded WSGI server with the ASGI server (asgi.py) as concurrency rises.
+
+    python -m benchmarks.seed --games 5000 --users 1000 --orders 20000
+    python -m benchmarks.asgi_bench --concurrency 16,64,256 --requests 2000 --output asgi.json
+
+Each mode runs in its own server process with the same database pool size. In `sync` mode,
+main.app runs on werkzeug's threaded server, one thread per connection. In `asgi` mode,
+asgi.app runs on uvicorn with one event loop. The clients are coroutines in this process.
+They request /game/<id> anonymously and /profile logged in, at each concurrency level.
+The report gives, per mode and level:
+- throughput
+- latency percentiles
+- errors
+- the server's peak RSS and thread count, sampled from /proc (Linux)
+
+Comparing the levels shows how many concurrent requests each mode carries for its memory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from benchmarks.common import percentiles, use_database
+from benchmarks.seed import PASSWORD
+
+MODES = ['sync', 'asgi']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='projectDB_bench')
+    parser.add_argument('--mode', choices=MODES + ['both'], default='both')
+    parser.add_argument('--concurrency', default='16,64,256', help="comma-separated client counts")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per route and level")
+    parser.add_argument('--pool-size', type=int, default=10, help="database connections per server")
+    parser.add_argument('--output')
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def serve(mode, port):
+    """
+    Server process body: run one mode on 127.0.0.1:`port` until killed.
+    """
+    if mode == 'sync':
+        from werkzeug.serving import make_server
+        import main
+
+        make_server('127.0.0.1', port, main.app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+
+        uvicorn.run('asgi:app', host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, mode):
+    port = free_port()
+    env = dict(os.environ, DB_POOL_SIZE=str(args.pool_size), ASGI_DB_POOL_SIZE=str(args.pool_size),
+               LOGIN_IP_LIMIT='1000000', DB_STARTUP='verify')
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.asgi_bench', '--serve', mode, '--port', str(port),
+                                '--database', args.database], env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("{} server exited with {}".format(mode, process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("{} server did not start".format(mode))
+
+
+class ProcessSampler:
+    """
+    Track a process's peak resident memory and thread count from /proc.
+    """
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_kb = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with open('/proc/{}/status'.format(self.pid)) as file:
+                    for line in file:
+                        if line.startswith('VmRSS:'):
+                            self.peak_rss_kb = max(self.peak_rss_kb, int(line.split()[1]))
+                        elif line.startswith('Threads:'):
+                            self.peak_threads = max(self.peak_threads, int(line.split()[1]))
+            except OSError:
+                return
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def http_request(port, method, path, form=None, cookie=None):
+    """
+    Minimal HTTP/1.1 client (one connection per request). Returns (status, headers).
+    """
+    body = urllib.parse.urlencode(form).encode() if form else b''
+    lines = ['{} {} HTTP/1.1'.format(method, path), 'Host: 127.0.0.1:{}'.format(port), 'Connection: close',
+             'Content-Length: {}'.format(len(body))]
+    if form:
+        lines.append('Content-Type: application/x-www-form-urlencoded')
+    if cookie:
+        lines.append('Cookie: {}'.format(cookie))
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head = response.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+    headers = {}
+    for line in head[1:]:
+        name, _, value = line.partition(':')
+        headers.setdefault(name.strip().lower(), value.strip())
+    return int(head[0].split()[1]), headers
+
+
+async def log_in(port, username):
+    status, headers = await http_request(port, 'POST', '/login', {'username': username, 'password': PASSWORD})
+    if status != 302 or 'set-cookie' not in headers:
+        raise RuntimeError("Login as {} failed ({})".format(username, status))
+    return headers['set-cookie'].split(';', 1)[0]
+
+
+async def run_level(port, route, concurrency, requests, game_ids, user_count):
+    samples = []
+    errors = 0
+    remaining = requests
+
+    async def client(index):
+        nonlocal errors, remaining
+        rng = random.Random(index)
+        cookie = None
+        if route == 'profile':
+            cookie = await log_in(port, 'bench_user_{}'.format(1 + index % max(1, user_count - 1)))
+        while remaining > 0:
+            remaining -= 1
+            path = '/game/{}'.format(rng.choice(game_ids)) if route == 'game' else '/profile'
+            start = time.perf_counter()
+            try:
+                status, _ = await http_request(port, 'GET', path, cookie=cookie)
+            except OSError:
+                status = None
+            samples.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    result = percentiles(samples)
+    result['errors'] = errors
+    result['throughput_rps'] = round(len(samples) / elapsed, 2) if elapsed else 0.0
+    return result
+
+
+def main():
+    args = parse_args()
+    use_database(args.database)
+    if args.serve:
+        serve(args.serve, args.port)
+        return 0
+
+    from sqlCommands import MySql
+
+    db = MySql(startup='skip')
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT game_id FROM games WHERE retired_at IS NULL")
+        game_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*) FROM users")
+        user_count = cursor.fetchone()[0]
+        cursor.close()
+    if not game_ids or user_count < 2:
+        print("The database is empty; run `python -m benchmarks.seed`")
+        return 1
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    modes = MODES if args.mode == 'both' else [args.mode]
+    report = {'requests': args.requests, 'pool_size': args.pool_size, 'results': {}}
+    for mode in modes:
+        process, port = start_server(args, mode)
+        try:
+            for route in ('game', 'profile'):
+                for level in levels:
+                    with ProcessSampler(process.pid) as sampler:
+                        result = asyncio.run(run_level(port, route, level, args.requests, game_ids, user_count))
+                    result['peak_rss_mb'] = round(sampler.peak_rss_kb / 1024, 1)
+                    result['peak_threads'] = sampler.peak_threads
+                    report['results'].setdefault(mode, {}).setdefault(route, {})[level] = result
+                    print("{:<5} {:<8} c={:<4} {!s:>8} req/s  p95 {!s:>8} ms  rss {:>7} MB  {:>4} threads  {} errors"
+                          .format(mode, route, level, result['throughput_rps'], result.get('p95_ms'),
+                                  result['peak_rss_mb'], result['peak_threads'], result['errors']))
+        finally:
+            process.kill()
+            process.wait()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print("Wrote {}".format(args.output))
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
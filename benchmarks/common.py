@@ -0,0 +1,89 @@
+import os
+import random
+
+ADJECTIVES = ['Dark', 'Eternal', 'Lost', 'Crimson', 'Silent', 'Iron', 'Hollow', 'Neon', 'Ancient', 'Frozen',
+              'Wild', 'Broken', 'Golden', 'Shadow', 'Last', 'Savage', 'Cosmic', 'Little', 'Final', 'Burning']
+NOUNS = ['Kingdom', 'Legacy', 'Odyssey', 'Frontier', 'Knight', 'Horizon', 'Dungeon', 'Empire', 'Galaxy', 'Harbor',
+         'Requiem', 'Citadel', 'Outlaw', 'Voyage', 'Tides', 'Machine', 'Garden', 'Protocol', 'Spire', 'Wasteland']
+STUDIOS = ['Nightjar', 'Polar Fox', 'Red Kite', 'Bluehole', 'Tinker', 'Ember', 'Lantern', 'Quartz', 'Moonrise',
+           'Granite', 'Cobalt', 'Saffron']
+WORDS = ['explore', 'battle', 'craft', 'survive', 'discover', 'ancient', 'secrets', 'open', 'world', 'story',
+         'puzzle', 'combat', 'co-op', 'racing', 'stealth', 'magic', 'city', 'forest', 'ocean', 'space', 'heroes',
+         'monsters', 'journey', 'build', 'defend', 'legendary', 'quest', 'dragons', 'robots', 'mystery']
+PLATFORMS = ['PC', 'PS5', 'Xbox X', 'Nintendo Switch']
+
+
+BACKENDS = ['mysql', 'sqlite']
+
+
+def use_database(name, backend='mysql'):
+    """
+    Point the storage backend at a scratch database: the MySQL database `name`, or with the
+    sqlite backend the file instance/<name>.db. Must run before sqlCommands is imported.
+    """
+    os.environ['DB_BACKEND'] = backend
+    os.environ['DB_NAME'] = name
+    os.environ['SQLITE_PATH'] = os.path.join('instance', '{}.db'.format(name))
+
+
+def sql(db, statement):
+    """
+    Adapt one of the seeding statements below, written for MySQL, to `db`'s dialect.
+    """
+    if db.placeholder == '%s':
+        return statement
+    return statement.replace('%s', db.placeholder).replace('INSERT IGNORE', 'INSERT OR IGNORE')
+
+
+def synthetic_game(rng, serial):
+    """
+    Return one (game_name, details, developer, publisher, platform, price, count) row.
+    """
+    name = '{} {} {}'.format(rng.choice(ADJECTIVES), rng.choice(NOUNS), serial)
+    details = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))).capitalize() + '.'
+    developer = rng.choice(STUDIOS) + ' Studios'
+    publisher = rng.choice(STUDIOS) + ' Interactive'
+    price = round(rng.uniform(4.99, 69.99), 2)
+    return name, details, developer, publisher, rng.choice(PLATFORMS), price, rng.randint(0, 500)
+
+
+def seed_games(db, count, batch_size=1000, seed=42):
+    """
+    Top the games table up to `count` rows with synthetic titles, in batched inserts.
+    """
+    rng = random.Random(seed)
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT COUNT(*) FROM games")
+        existing = cursor.fetchone()[0]
+        for start in range(existing, count, batch_size):
+            rows = [synthetic_game(rng, serial) for serial in range(start, min(start + batch_size, count))]
+            cursor.execute("SELECT COALESCE(MAX(game_id), 0) FROM games")
+            last_id = cursor.fetchone()[0]
+            cursor.executemany(sql(db, """
+                INSERT INTO games (game_name, details, developer, publisher, platform, price)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """), [row[:6] for row in rows])
+            # The seeder is the only writer, so the new ids are the ones above last_id, in insert order
+            cursor.execute(sql(db, "SELECT game_id FROM games WHERE game_id > %s ORDER BY game_id"), (last_id,))
+            game_ids = [row[0] for row in cursor.fetchall()]
+            cursor.executemany(sql(db, "INSERT INTO game_inventory (game_id, games_count) VALUES (%s, %s)"),
+                               [(game_id, row[6]) for game_id, row in zip(game_ids, rows)])
+            cnx.commit()
+        cursor.close()
+    db.catalog_changed()
+
+
+def percentiles(samples):
+    """
+    Summarize latency samples (seconds) as milliseconds.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(1000 * ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+
+    return {'count': len(ordered), 'p50_ms': at(0.50), 'p95_ms': at(0.95), 'p99_ms': at(0.99),
+            'max_ms': round(1000 * ordered[-1], 3), 'mean_ms': round(1000 * sum(ordered) / len(ordered), 3)}
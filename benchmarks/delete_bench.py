@@ -0,0 +1,128 @@
+"""
+Time removing a best-selling game: the old per-order DELETE loop against chunked purging and retiring.
+
+    python -m benchmarks.delete_bench --orders 100000 --chunk-size 1000
+
+Each strategy gets a fresh game with --orders single-item orders. `legacy` replays the old
+MySql.delete_game (one DELETE per order, all in one transaction), `chunked` is the current
+delete_game (set-based deletes, one short transaction per chunk) and `retire` is the soft
+delete. The longest transaction is reported alongside the total, since that is how long
+other checkouts can be kept waiting on the game's locks.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import use_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='projectDB_bench')
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--strategy', choices=['legacy', 'chunked', 'retire', 'all'], default='all')
+    return parser.parse_args()
+
+
+def setup_popular_game(db, orders, batch_size=5000):
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("INSERT IGNORE INTO users (username, password_hash) VALUES ('bench', '')")
+        cursor.execute("SELECT user_id FROM users WHERE username = 'bench'")
+        user_id = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO games (game_name, platform, price) VALUES ('Bench Popular Game', 'PC', 9.99)")
+        game_id = cursor.lastrowid
+        cursor.execute("INSERT INTO game_inventory (game_id, games_count) VALUES (%s, 100)", (game_id,))
+        cursor.execute("SELECT COALESCE(MAX(order_id), 140100) FROM user_orders")
+        next_order_id = cursor.fetchone()[0] + 1
+        for start in range(0, orders, batch_size):
+            order_ids = range(next_order_id + start, next_order_id + min(start + batch_size, orders))
+            cursor.executemany("INSERT INTO user_orders (order_id, date_order, user_id) VALUES (%s, CURDATE(), %s)",
+                               [(order_id, user_id) for order_id in order_ids])
+            cursor.executemany("INSERT INTO order_items (order_id, game_id, price) VALUES (%s, %s, 9.99)",
+                               [(order_id, game_id) for order_id in order_ids])
+            cnx.commit()
+        cursor.close()
+    return game_id
+
+
+def legacy_delete(db, game_id):
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT order_id FROM order_items WHERE game_id = %s", (game_id,))
+        order_ids = cursor.fetchall()
+        cursor.execute("DELETE FROM order_items WHERE game_id = %s", (game_id,))
+        for order_id in order_ids:
+            cursor.execute("DELETE FROM user_orders WHERE order_id = %s", (order_id[0],))
+        cursor.execute("DELETE FROM game_inventory WHERE game_id = %s", (game_id,))
+        cursor.execute("DELETE FROM games WHERE game_id = %s", (game_id,))
+        cnx.commit()
+        cursor.close()
+
+
+def chunked_delete(db, game_id, chunk_size):
+    """
+    MySql.delete_game, with every transaction timed.
+    """
+    transactions = []
+    start = time.perf_counter()
+    db.retire_games([game_id])
+    transactions.append(time.perf_counter() - start)
+    with db.pool.connection() as cnx:
+        while True:
+            start = time.perf_counter()
+            deleted = db._delete_order_chunk(cnx, game_id, chunk_size)
+            transactions.append(time.perf_counter() - start)
+            if not deleted:
+                break
+        start = time.perf_counter()
+        cursor = cnx.cursor()
+        cursor.execute("DELETE FROM games WHERE game_id = %s", (game_id,))
+        cnx.commit()
+        cursor.close()
+        transactions.append(time.perf_counter() - start)
+    return transactions
+
+
+def measure(db, strategy, orders, chunk_size):
+    game_id = setup_popular_game(db, orders)
+    queries_before = db.profiler.report()['queries']
+    start = time.perf_counter()
+    if strategy == 'legacy':
+        legacy_delete(db, game_id)
+        transactions = [time.perf_counter() - start]
+    elif strategy == 'chunked':
+        transactions = chunked_delete(db, game_id, chunk_size)
+    else:
+        db.retire_games([game_id])
+        transactions = [time.perf_counter() - start]
+    elapsed = time.perf_counter() - start
+    result = {
+        'total_ms': round(1000 * elapsed, 1),
+        'transactions': len(transactions),
+        'longest_transaction_ms': round(1000 * max(transactions), 1),
+        'statements': db.profiler.report()['queries'] - queries_before,
+    }
+    if strategy == 'retire':
+        # Leave the database as we found it
+        db.delete_game(game_id, chunk_size)
+    return result
+
+
+def main():
+    args = parse_args()
+    use_database(args.database)
+    from sqlCommands import MySql
+
+    db = MySql()
+    strategies = ['legacy', 'chunked', 'retire'] if args.strategy == 'all' else [args.strategy]
+    report = {'orders': args.orders, 'chunk_size': args.chunk_size}
+    for strategy in strategies:
+        report[strategy] = measure(db, strategy, args.orders, args.chunk_size)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
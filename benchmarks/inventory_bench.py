@@ -0,0 +1,147 @@
+"""
+Hammer one hot game from many threads and compare inventory strategies.
+
+    python -m benchmarks.inventory_bench --threads 32 --stock 500 --attempts 40
+
+`reservation` buys through MySql.checkout (conditional decrement), `trigger` replays the
+old path: plain INSERTs guarded by the per-row triggers from migration 0002. Runs against
+the database named by --database, which is created and migrated if needed.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import mysql.connector
+
+import migrate
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='projectDB_bench')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--stock', type=int, default=200)
+    parser.add_argument('--attempts', type=int, default=25, help="purchase attempts per thread")
+    parser.add_argument('--strategy', choices=['reservation', 'trigger', 'both'], default='both')
+    return parser.parse_args()
+
+
+def setup_hot_game(db, stock):
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("INSERT IGNORE INTO users (username, password_hash) VALUES ('bench', '')")
+        cursor.execute("SELECT user_id FROM users WHERE username = 'bench'")
+        user_id = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO games (game_name, platform, price) VALUES ('Bench Hot Game', 'PC', 9.99)")
+        game_id = cursor.lastrowid
+        cursor.execute("INSERT INTO game_inventory (game_id, games_count) VALUES (%s, %s)", (game_id, stock))
+        cnx.commit()
+        cursor.close()
+    return user_id, game_id
+
+
+def teardown_hot_game(db, game_id):
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT COUNT(*) FROM order_items WHERE game_id = %s", (game_id,))
+        sold = cursor.fetchone()[0]
+        cursor.execute("SELECT games_count FROM game_inventory WHERE game_id = %s", (game_id,))
+        remaining = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM games WHERE game_id = %s", (game_id,))
+        cnx.commit()
+        cursor.close()
+    return sold, remaining
+
+
+def set_triggers(db, enabled):
+    trigger_migration = next(m for m in migrate.load_migrations() if m.name == '0002_inventory_triggers')
+    statements = list(trigger_migration.statements())
+    if not enabled:
+        statements = [statement for statement in statements if statement.startswith('DROP')]
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+def trigger_purchase(db, user_id, game_id):
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        try:
+            cursor.execute('INSERT INTO user_orders (date_order, user_id) VALUES (CURDATE(), %s)', (user_id,))
+            cursor.execute('INSERT INTO order_items (order_id, game_id) VALUES (%s, %s)', (cursor.lastrowid, game_id))
+            cnx.commit()
+            return True
+        except mysql.connector.Error:
+            cnx.rollback()
+            return False
+        finally:
+            cursor.close()
+
+
+def reservation_purchase(db, user_id, game_id):
+    order, _ = db.checkout(user_id, [game_id])
+    return order is not None
+
+
+def run(db, strategy, args):
+    user_id, game_id = setup_hot_game(db, args.stock)
+    purchase = reservation_purchase if strategy == 'reservation' else trigger_purchase
+    if strategy == 'trigger':
+        set_triggers(db, True)
+
+    successes = []
+    barrier = threading.Barrier(args.threads)
+
+    def worker():
+        barrier.wait()
+        bought = 0
+        for _ in range(args.attempts):
+            if purchase(db, user_id, game_id):
+                bought += 1
+        successes.append(bought)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if strategy == 'trigger':
+        set_triggers(db, False)
+    sold, remaining = teardown_hot_game(db, game_id)
+    attempts = args.threads * args.attempts
+    return {
+        'strategy': strategy,
+        'threads': args.threads,
+        'initial_stock': args.stock,
+        'attempts': attempts,
+        'reported_successes': sum(successes),
+        'items_sold': sold,
+        'remaining_stock': remaining,
+        'oversold': max(0, sold - args.stock),
+        'seconds': round(elapsed, 3),
+        'attempts_per_sec': round(attempts / elapsed, 1),
+        'sales_per_sec': round(sold / elapsed, 1),
+    }
+
+
+def main():
+    args = parse_args()
+    os.environ['DB_NAME'] = args.database
+    from sqlCommands import MySql
+
+    db = MySql(pool_size=args.threads + 1)
+    strategies = ['reservation', 'trigger'] if args.strategy == 'both' else [args.strategy]
+    results = [run(db, strategy, args) for strategy in strategies]
+    print(json.dumps(results, indent=2))
+    return 1 if any(result['oversold'] for result in results if result['strategy'] == 'reservation') else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+"""
+Load-test the storefront routes and record latency, throughput and queries per request.
+
+    python -m benchmarks.seed --games 5000 --users 1000 --orders 20000
+    python -m benchmarks.routes_bench run --driver both --concurrency 8 --requests 400 --output before.json
+    python -m benchmarks.routes_bench compare before.json after.json
+
+`run` drives /home, /filter, /game/<id>, /profile, /buyGame and /admin with concurrent
+clients, either in-process through the Flask test client or over real HTTP (a threaded
+local server, or --url for one that is already running). Queries per request come from
+the X-DB-Queries header, so an external server needs DB_DEBUG_HEADERS=1 to report them.
+`compare` prints per-route deltas and exits non-zero when a p95 regressed past --threshold.
+Pass `--backend sqlite` to both commands to run against an embedded database file instead of MySQL.
+"""
+import argparse
+import datetime
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks.common import BACKENDS, PLATFORMS, percentiles, use_database
+from benchmarks.seed import PASSWORD, seed
+
+# (name, who is logged in, method, path, form data); '{game_id}' and '{platform}' are filled per request
+SCENARIOS = [
+    ('home', None, 'GET', '/home', None),
+    ('filter', None, 'GET', '/filter?platform={platform}', None),
+    ('game', None, 'GET', '/game/{game_id}', None),
+    ('profile', 'user', 'GET', '/profile', None),
+    ('buyGame', 'user', 'POST', '/buyGame', {'gameID': '{game_id}'}),
+    ('admin', 'admin', 'GET', '/admin', None),
+]
+
+
+class TestClientSession:
+    """
+    One logged-in (or anonymous) browser, driven in-process through the Flask test client.
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, response.headers.get('X-DB-Queries')
+
+
+class HttpSession:
+    """
+    One browser talking to a real server over HTTP, with its own cookie jar.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status, response.headers.get('X-DB-Queries')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('X-DB-Queries')
+
+
+def login(session, username):
+    status, _ = session.request('POST', '/login', {'username': username, 'password': PASSWORD})
+    if status >= 400:
+        raise RuntimeError("Login failed for {} (HTTP {})".format(username, status))
+
+
+def run_scenario(make_session, scenario, game_ids, user_count, concurrency, requests):
+    """
+    Run one scenario with `concurrency` clients sharing `requests` requests.
+    """
+    name, role, method, path, data = scenario
+    samples = []
+    queries = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index, count):
+        rng = random.Random(index)
+        session = make_session()
+        try:
+            if role == 'admin':
+                login(session, 'bench_admin')
+            elif role == 'user':
+                login(session, 'bench_user_{}'.format(1 + index % max(1, user_count - 1)))
+        except Exception as e:
+            print(e)
+            with lock:
+                errors.append(count)
+            return
+        local_samples, local_queries, local_errors = [], [], 0
+        for _ in range(count):
+            values = {'game_id': rng.choice(game_ids), 'platform': rng.choice(PLATFORMS)}
+            url = path.format(**values)
+            form = {key: value.format(**values) for key, value in data.items()} if data else None
+            start = time.perf_counter()
+            try:
+                status, query_count = session.request(method, url, form)
+            except Exception as e:
+                status, query_count = None, None
+                print("{} {} failed: {}".format(method, url, e))
+            local_samples.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                local_errors += 1
+            if query_count is not None:
+                local_queries.append(int(query_count))
+        with lock:
+            samples.extend(local_samples)
+            queries.extend(local_queries)
+            errors.append(local_errors)
+
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, share)) for i, share in enumerate(shares) if share]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    result = {'count': 0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None, 'mean_ms': None}
+    result.update(percentiles(samples))
+    result['errors'] = sum(errors)
+    result['throughput_rps'] = round(len(samples) / elapsed, 2) if elapsed else 0.0
+    result['avg_queries'] = round(sum(queries) / len(queries), 2) if queries else None
+    result['max_queries'] = max(queries) if queries else None
+    return result
+
+
+def start_local_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_port)
+
+
+def git_revision():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL)
+        return output.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    use_database(args.database, args.backend)
+    os.environ['DB_DEBUG_HEADERS'] = '1'
+    # Every benchmark client logs in from the same address
+    os.environ.setdefault('LOGIN_IP_LIMIT', '1000000')
+    from storageBackend import open_backend
+
+    db = open_backend()
+    if args.seed:
+        seed(db, args.games, args.users, args.orders)
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT game_id FROM games")
+        game_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*) FROM users")
+        user_count = cursor.fetchone()[0]
+        cursor.close()
+    if not game_ids or user_count < 2:
+        print("The database is empty; run `python -m benchmarks.seed` or pass --seed")
+        return 1
+
+    drivers = {}
+    server = None
+    if args.driver in ('test-client', 'both') or (args.driver == 'http' and not args.url):
+        import main as storefront
+        app = storefront.app
+    if args.driver in ('test-client', 'both'):
+        drivers['test-client'] = lambda: TestClientSession(app)
+    if args.driver in ('http', 'both'):
+        base_url = args.url
+        if not base_url:
+            server, base_url = start_local_server(app)
+        drivers['http'] = lambda: HttpSession(base_url)
+
+    scenarios = [scenario for scenario in SCENARIOS if not args.routes or scenario[0] in args.routes]
+    results = {}
+    try:
+        for driver, make_session in drivers.items():
+            for scenario in scenarios:
+                if args.warmup:
+                    run_scenario(make_session, scenario, game_ids, user_count, args.concurrency, args.warmup)
+                result = run_scenario(make_session, scenario, game_ids, user_count, args.concurrency, args.requests)
+                results.setdefault(driver, {})[scenario[0]] = result
+                print("{:<12} {:<8} p50 {!s:>8} ms  p95 {!s:>8} ms  p99 {!s:>8} ms  {!s:>8} req/s  {} queries  {} errors"
+                      .format(driver, scenario[0], result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                              result['throughput_rps'], result['avg_queries'], result['errors']))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'database': args.database,
+        'backend': args.backend,
+        'games': len(game_ids),
+        'users': user_count,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print("Wrote {}".format(args.output))
+    else:
+        print(json.dumps(report, indent=2))
+    return 1 if any(result['errors'] for routes in results.values() for result in routes.values()) else 0
+
+
+def compare(args):
+    with open(args.old) as file:
+        old = json.load(file)
+    with open(args.new) as file:
+        new = json.load(file)
+    print("{} -> {}".format(old.get('revision'), new.get('revision')))
+
+    regressed = []
+    for driver, routes in new['results'].items():
+        for route, result in routes.items():
+            before = old['results'].get(driver, {}).get(route)
+            if not before:
+                continue
+            deltas = []
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'avg_queries'):
+                if before.get(metric) and result.get(metric) is not None:
+                    change = 100.0 * (result[metric] - before[metric]) / before[metric]
+                    deltas.append('{} {} -> {} ({:+.1f}%)'.format(metric, before[metric], result[metric], change))
+                    if metric == 'p95_ms' and change > args.threshold:
+                        regressed.append('{}/{}'.format(driver, route))
+            print("{:<12} {:<8} {}".format(driver, route, '  '.join(deltas)))
+
+    if regressed:
+        print("p95 regressed by more than {}%: {}".format(args.threshold, ', '.join(regressed)))
+        return 1
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the route benchmark")
+    run_parser.add_argument('--database', default='projectDB_bench')
+    run_parser.add_argument('--backend', choices=BACKENDS, default='mysql', help="sqlite needs no database server")
+    run_parser.add_argument('--driver', choices=['test-client', 'http', 'both'], default='both')
+    run_parser.add_argument('--url', help="benchmark an already running server instead of a local one")
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--requests', type=int, default=400, help="requests per route")
+    run_parser.add_argument('--warmup', type=int, default=40, help="untimed requests per route")
+    run_parser.add_argument('--routes', nargs='*', choices=[scenario[0] for scenario in SCENARIOS])
+    run_parser.add_argument('--seed', action='store_true', help="top the database up before running")
+    run_parser.add_argument('--games', type=int, default=5000)
+    run_parser.add_argument('--users', type=int, default=1000)
+    run_parser.add_argument('--orders', type=int, default=20000)
+    run_parser.add_argument('--output', help="write the JSON report here")
+
+    compare_parser = commands.add_parser('compare', help="diff two JSON reports")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help="allowed p95 regression, percent")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""
+Measure /search and /search/suggest query latency on a large synthetic catalog.
+
+    python -m benchmarks.search_bench --games 100000 --queries 500
+
+Seeds the scratch database up to --games titles, then times the FULLTEXT queries
+(bypassing the catalog cache) against the LIKE '%q%' scan they replace.
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import ADJECTIVES, NOUNS, WORDS, percentiles, seed_games, use_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='projectDB_bench')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--like-queries', type=int, default=20, help="LIKE scans are slow; run fewer")
+    return parser.parse_args()
+
+
+def time_calls(function, inputs):
+    samples = []
+    for value in inputs:
+        start = time.perf_counter()
+        function(value)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def like_scan(db, text):
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        pattern = '%{}%'.format(text)
+        cursor.execute("""
+            SELECT game_id FROM games
+            WHERE game_name LIKE %s OR developer LIKE %s OR publisher LIKE %s OR details LIKE %s
+            LIMIT 41
+        """, (pattern, pattern, pattern, pattern))
+        cursor.fetchall()
+        cursor.close()
+
+
+def main():
+    args = parse_args()
+    use_database(args.database)
+    from sqlCommands import MySql, fulltext_terms
+
+    db = MySql()
+    seed_games(db, args.games)
+
+    rng = random.Random(7)
+    searches = ['{} {}'.format(rng.choice(ADJECTIVES), rng.choice(WORDS)) for _ in range(args.queries)]
+    prefixes = [rng.choice(NOUNS)[:rng.randint(2, 5)] for _ in range(args.queries)]
+
+    fulltext = time_calls(lambda text: db._search_games(fulltext_terms(text), 1, 40), searches)
+    suggest = time_calls(lambda text: db._suggest_games(fulltext_terms(text), 8), prefixes)
+    like = time_calls(lambda text: like_scan(db, text), [text.split()[-1] for text in searches[:args.like_queries]])
+
+    report = {
+        'games': args.games,
+        'fulltext_search': percentiles(fulltext),
+        'typeahead_suggest': percentiles(suggest),
+        'like_scan': percentiles(like),
+    }
+    report['single_digit_ms_p95'] = all(report[name]['p95_ms'] < 10
+                                        for name in ('fulltext_search', 'typeahead_suggest'))
+    print(json.dumps(report, indent=2))
+    return 0 if report['single_digit_ms_p95'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""
+Seed a scratch database with a synthetic catalog, user base and order history.
+
+    python -m benchmarks.seed --games 5000 --users 1000 --orders 20000
+
+The schema comes from migrations/ (the database is bootstrapped if needed). User 1 is
+`bench_admin`; the others are `bench_user_<n>`; all share the password `bench`.
+With `--backend sqlite` the database is the file instance/<database>.db and no server is needed.
+"""
+import argparse
+import datetime
+import random
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.common import BACKENDS, seed_games, sql, use_database
+
+PASSWORD = 'bench'
+
+
+def seed_users(db, count, batch_size=1000):
+    """
+    Top the users table up to `count` users. The first user created is the admin.
+    """
+    # A cheap hash keeps seeding fast; the login path still verifies it normally
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users")
+        existing = cursor.fetchone()[0]
+        for start in range(existing, count, batch_size):
+            rows = []
+            for serial in range(start, min(start + batch_size, count)):
+                username = 'bench_admin' if serial == 0 else 'bench_user_{}'.format(serial)
+                rows.append((username, password_hash, '555-{:07d}'.format(serial),
+                             '{} Bench Street'.format(serial), '{}@bench.example'.format(username)))
+            cursor.executemany(sql(db, """
+                INSERT IGNORE INTO users (username, password_hash, phone, address, email)
+                VALUES (%s, %s, %s, %s, %s)
+            """), rows)
+            cnx.commit()
+        cursor.close()
+
+
+def seed_orders(db, count, batch_size=1000, max_items=3, seed=42):
+    """
+    Top the order history up to `count` orders of 1..max_items games each, spread over the last year.
+    Stock is not decremented; this is history, not live checkout.
+    """
+    rng = random.Random(seed)
+    with db.pool.connection() as cnx:
+        cursor = cnx.cursor()
+        cursor.execute("SELECT user_id FROM users WHERE user_id <> 1")
+        user_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT game_id FROM games")
+        game_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(order_id), 140100) FROM user_orders")
+        existing, last_order_id = cursor.fetchone()
+        if not user_ids or not game_ids:
+            cursor.close()
+            return
+
+        for start in range(existing, count, batch_size):
+            orders = []
+            items = []
+            for _ in range(start, min(start + batch_size, count)):
+                last_order_id += 1
+                date_order = datetime.date.today() - datetime.timedelta(days=rng.randint(0, 364))
+                orders.append((last_order_id, date_order, rng.choice(user_ids)))
+                for game_id in rng.sample(game_ids, rng.randint(1, min(max_items, len(game_ids)))):
+                    items.append((last_order_id, game_id))
+            cursor.executemany(sql(db, "INSERT INTO user_orders (order_id, date_order, user_id) VALUES (%s, %s, %s)"),
+                               orders)
+            cursor.executemany(sql(db, "INSERT INTO order_items (order_id, game_id) VALUES (%s, %s)"), items)
+            cnx.commit()
+        cursor.close()
+
+
+def seed(db, games, users, orders):
+    seed_games(db, games)
+    seed_users(db, users)
+    seed_orders(db, orders)
+    # Seeded orders bypass checkout, which is what normally maintains the summaries
+    db.rebuild_user_summaries()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='projectDB_bench')
+    parser.add_argument('--backend', choices=BACKENDS, default='mysql', help="sqlite needs no database server")
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=20000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    use_database(args.database, args.backend)
+    from storageBackend import open_backend
+
+    seed(open_backend(), args.games, args.users, args.orders)
+    print("Seeded {} with {} games, {} users, {} orders".format(args.database, args.games, args.users, args.orders))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
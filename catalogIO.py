@@ -0,0 +1,280 @@
+import argparse
+import csv
+import json
+import sys
+from decimal import Decimal, InvalidOperation
+
+FIELDS = ['game_id', 'game_name', 'details', 'developer', 'publisher', 'platform', 'price', 'count']
+
+# games.price is DECIMAL(4,2)
+MAX_PRICE = Decimal('99.99')
+
+
+def read_records(file, fmt):
+    """
+    Yield (line number, record dict) from a CSV (with header) or JSON Lines stream, one at a time.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_num, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {'_error': 'invalid JSON: {}'.format(e)}
+            yield line_num, record
+
+
+def validate(record):
+    """
+    Return the (game_name, details, developer, publisher, platform, price, count) row
+    for a record, or raise ValueError naming the problem.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('record is not an object')
+    if '_error' in record:
+        raise ValueError(record['_error'])
+
+    def text(field, required=False):
+        value = record.get(field)
+        value = '' if value is None else str(value).strip()
+        if required and not value:
+            raise ValueError('missing {}'.format(field))
+        if field != 'details' and len(value) > 255:
+            raise ValueError('{} is longer than 255 characters'.format(field))
+        return value
+
+    try:
+        price = Decimal(str(record.get('price', '')).strip())
+    except InvalidOperation:
+        raise ValueError('invalid price {!r}'.format(record.get('price')))
+    if not Decimal(0) <= price <= MAX_PRICE:
+        raise ValueError('price {} out of range'.format(price))
+
+    count = record.get('count', record.get('games_count', 0))
+    try:
+        count = int(count or 0)
+    except (TypeError, ValueError):
+        raise ValueError('invalid count {!r}'.format(count))
+    if count < 0:
+        raise ValueError('negative count')
+
+    return (text('game_name', required=True), text('details'), text('developer'), text('publisher'),
+            text('platform', required=True), price, count)
+
+
+def chunked(records, batch_size):
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_catalog(db, records, batch_size=500, on_reject=None):
+    """
+    Insert games and their inventory from an iterable of (line number, record) pairs.
+
+    Rows are validated as they stream in and written in chunks of `batch_size`, each with
+    one executemany per table and one commit, so memory does not grow with the input.
+    Invalid rows (and every row of a chunk the database refuses) are passed to
+    `on_reject(line number, record, reason)`. Returns a summary dict.
+    """
+    summary = {'imported': 0, 'rejected': 0, 'batches': 0}
+
+    def reject(line_num, record, reason):
+        summary['rejected'] += 1
+        if on_reject:
+            on_reject(line_num, record, reason)
+
+    def valid_rows():
+        for line_num, record in records:
+            try:
+                yield line_num, record, validate(record)
+            except ValueError as e:
+                reject(line_num, record, str(e))
+
+    for chunk in chunked(valid_rows(), batch_size):
+        try:
+            with db.pool.connection() as cnx:
+                insert_chunk(cnx, [row for _, _, row in chunk], db.placeholder)
+            summary['imported'] += len(chunk)
+            summary['batches'] += 1
+        except db.errors as e:
+            for line_num, record, _ in chunk:
+                reject(line_num, record, 'database error: {}'.format(e))
+
+    db.catalog_changed()
+    return summary
+
+
+def insert_chunk(cnx, rows, placeholder='%s'):
+    """
+    Insert one chunk of validated rows and their stock as a single transaction.
+    `placeholder` is the driver's parameter marker ('?' for sqlite3).
+    """
+    insert_game = """
+        INSERT INTO games (game_name, details, developer, publisher, platform, price)
+        VALUES ({0}, {0}, {0}, {0}, {0}, {0})
+    """.format(placeholder)
+    cursor = cnx.cursor()
+    try:
+        # Explicit because sqlite3 connections run in autocommit mode; MySQL accepts it too
+        cursor.execute("BEGIN")
+        cursor.executemany(insert_game, [row[:6] for row in rows])
+        first_id = cursor.lastrowid
+        if not first_id:
+            # sqlite3 reports no id after executemany; its writers are serialized, so the rows end at MAX(game_id)
+            cursor.execute("SELECT MAX(game_id) FROM games")
+            first_id = cursor.fetchone()[0] - len(rows) + 1
+
+        # A multi-row INSERT gets consecutive ids unless another session interleaved
+        # (innodb_autoinc_lock_mode=2); confirm before trusting them, else look them up per row.
+        cursor.execute("""
+            SELECT game_id, game_name FROM games
+            WHERE game_id BETWEEN {0} AND {0}
+            ORDER BY game_id
+        """.format(placeholder), (first_id, first_id + len(rows) - 1))
+        inserted = cursor.fetchall()
+        if [name for _, name in inserted] == [row[0] for row in rows]:
+            game_ids = [game_id for game_id, _ in inserted]
+        else:
+            cnx.rollback()
+            cursor.execute("BEGIN")
+            game_ids = []
+            for row in rows:
+                cursor.execute(insert_game, row[:6])
+                game_ids.append(cursor.lastrowid)
+
+        cursor.executemany("INSERT INTO game_inventory (game_id, games_count) VALUES ({0}, {0})".format(placeholder),
+                           [(game_id, row[6]) for game_id, row in zip(game_ids, rows)])
+        cnx.commit()
+    finally:
+        cursor.close()
+
+
+def iter_catalog(db, batch_size=1000):
+    """
+    Stream every game with its stock as dicts, using an unbuffered (server-side) cursor
+    that fetches `batch_size` rows at a time instead of fetchall().
+    """
+    with db.pool.connection() as cnx:
+        # Both drivers' default cursors are unbuffered: MySQL streams rows, sqlite3 steps the statement
+        cursor = cnx.cursor()
+        try:
+            cursor.execute("""
+                SELECT g.game_id, g.game_name, g.details, g.developer, g.publisher, g.platform, g.price,
+                       gi.games_count AS count
+                FROM games g
+                LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+                ORDER BY g.game_id
+            """)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(columns, row))
+        finally:
+            cursor.close()
+
+
+def export_catalog(db, file, fmt, batch_size=1000):
+    """
+    Write the catalog to a CSV or JSON Lines stream. Returns the number of games written.
+    """
+    written = 0
+    writer = csv.DictWriter(file, fieldnames=FIELDS) if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+    for row in iter_catalog(db, batch_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            file.write(json.dumps(row, default=str) + '\n')
+        written += 1
+    return written
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import, export, retire or purge games in the catalog.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    importer = subparsers.add_parser('import', help="import games from a CSV or JSON Lines file")
+    importer.add_argument('path')
+    importer.add_argument('--format', choices=['csv', 'jsonl'])
+    importer.add_argument('--batch-size', type=int, default=500)
+    importer.add_argument('--rejects', help="write rejected rows with their reason to this JSON Lines file")
+
+    exporter = subparsers.add_parser('export', help="export the catalog to a CSV or JSON Lines file ('-' for stdout)")
+    exporter.add_argument('path')
+    exporter.add_argument('--format', choices=['csv', 'jsonl'])
+    exporter.add_argument('--batch-size', type=int, default=1000)
+
+    retire = subparsers.add_parser('retire', help="take games off the store, keeping their order history")
+    retire.add_argument('game_ids', nargs='+', type=int)
+
+    purge = subparsers.add_parser('purge', help="permanently delete games and every order containing them")
+    purge.add_argument('game_ids', nargs='+', type=int)
+    purge.add_argument('--chunk-size', type=int, default=1000, help="orders deleted per transaction")
+
+    args = parser.parse_args(argv)
+
+    from storageBackend import open_backend
+
+    db = open_backend()
+    if args.command == 'retire':
+        retired = db.retire_games(args.game_ids)
+        if retired is None:
+            return 1
+        print("Retired {} games".format(retired))
+        return 0
+
+    if args.command == 'purge':
+        failed = [game_id for game_id in args.game_ids if not db.delete_game(game_id, args.chunk_size)]
+        print("Purged {} games".format(len(args.game_ids) - len(failed)))
+        return 1 if failed else 0
+
+    fmt = detect_format(args.path, args.format)
+    if args.command == 'import':
+        rejects = open(args.rejects, 'w') if args.rejects else None
+
+        def on_reject(line_num, record, reason):
+            print("Rejected line {}: {}".format(line_num, reason), file=sys.stderr)
+            if rejects:
+                rejects.write(json.dumps({'line': line_num, 'reason': reason, 'record': record}, default=str) + '\n')
+
+        try:
+            with open(args.path, 'r', newline='', encoding='utf-8') as file:
+                summary = import_catalog(db, read_records(file, fmt), args.batch_size, on_reject)
+        finally:
+            if rejects:
+                rejects.close()
+        print("Imported {imported} games in {batches} batches, rejected {rejected}".format(**summary))
+        return 1 if summary['rejected'] else 0
+
+    if args.path == '-':
+        written = export_catalog(db, sys.stdout, fmt, args.batch_size)
+    else:
+        with open(args.path, 'w', newline='', encoding='utf-8') as file:
+            written = export_catalog(db, file, fmt, args.batch_size)
+    print("Exported {} games".format(written), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import mysql.connector
+except ImportError:  # Only the MySQL backends need the driver; the SQLite pool passes its own errors
+    mysql = None
+
+if mysql is not None:
+    PoolError = mysql.connector.errors.PoolError
+    DRIVER_ERRORS = (mysql.connector.Error,)
+    # Errors after which the connection itself is suspect
+    DISCONNECT_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+else:
+    class PoolError(Exception):
+        pass
+    DRIVER_ERRORS = ()
+    DISCONNECT_ERRORS = ()
+
+
+class PoolTimeout(PoolError):
+    """
+    Raised when no connection could be checked out before the pool timeout.
+    """
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=5, timeout=10.0, health_check=True, wrap=None, errors=DRIVER_ERRORS):
+        """
+        Initialize a bounded, thread-safe pool around the `connect` factory.
+
+        At most `size` connections are open at once. A borrower waits up to `timeout`
+        seconds for a free connection, and with `health_check` every idle connection
+        is pinged (and reconnected if the server dropped it) before it is handed out.
+        `wrap`, if given, is applied to connections handed out by `connection()`
+        (e.g. to instrument their cursors). `errors` are the driver's exception classes; a
+        connection whose rollback or close raises one of them is dropped instead of escaping.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.wrap = wrap
+        self.errors = errors
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._closed = False
+
+    def acquire(self):
+        """
+        Check out a connection, opening a new one while the pool is below its size.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._created >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout("No connection available within {:.1f}s".format(self.timeout))
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    cnx = self._idle.pop()
+                else:
+                    cnx = None
+                    self._created += 1
+                self._in_use += 1
+            finally:
+                self._waiting -= 1
+
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            if cnx is None:
+                cnx = self._connect()
+            elif self.health_check:
+                self._ensure_connected(cnx)
+        except Exception:
+            self._forget(cnx)
+            raise
+        return cnx
+
+    def release(self, cnx, discard=False):
+        """
+        Return a connection to the pool, rolling back anything left uncommitted.
+        Once the pool is closed, returned connections are closed instead.
+        """
+        discard = discard or self._closed
+        if not discard:
+            try:
+                if cnx.in_transaction:
+                    cnx.rollback()
+            except self.errors:
+                discard = True
+
+        if discard:
+            self._forget(cnx)
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(cnx)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a `with` block.
+        """
+        cnx = self.acquire()
+        discard = False
+        try:
+            yield self.wrap(cnx) if self.wrap else cnx
+        except DISCONNECT_ERRORS:
+            # The connection itself is suspect; let the next borrower open a fresh one
+            discard = True
+            raise
+        finally:
+            self.release(cnx, discard)
+
+    def stats(self):
+        """
+        Return a snapshot of pool usage for sizing and monitoring.
+        """
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'avg_wait_ms': 1000 * self._total_wait / self._checkouts if self._checkouts else 0.0,
+                'max_wait_ms': 1000 * self._max_wait,
+            }
+
+    def close(self):
+        """
+        Close every idle connection. Connections still checked out are closed on release.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for cnx in idle:
+            self._close_quietly(cnx)
+
+    def _ensure_connected(self, cnx):
+        if not cnx.is_connected():
+            cnx.reconnect(attempts=2, delay=0)
+            with self._cond:
+                self._reconnects += 1
+
+    def _forget(self, cnx):
+        with self._cond:
+            self._created -= 1
+            self._in_use -= 1
+            self._cond.notify()
+        if cnx is not None:
+            self._close_quietly(cnx)
+
+    def _close_quietly(self, cnx):
+        try:
+            cnx.close()
+        except self.errors:
+            pass
+
+
+class AsyncConnectionPool:
+    def __init__(self, connect, size=5, timeout=10.0, health_check=True, wrap=None):
+        """
+        ConnectionPool for asyncio: `connect` is a coroutine function (e.g. mysql.connector.aio.connect)
+        and borrowers wait on the event loop instead of blocking a thread. Use it from one event loop.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check = health_check
+        self.wrap = wrap
+
+        self._cond = asyncio.Condition()
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._closed = False
+
+    async def acquire(self):
+        """
+        Check out a connection, opening a new one while the pool is below its size.
+        """
+        start = time.monotonic()
+        async with self._cond:
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._cond.wait_for(lambda: self._idle or self._created < self.size),
+                                       self.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise PoolTimeout("No connection available within {:.1f}s".format(self.timeout))
+            finally:
+                self._waiting -= 1
+
+            if self._idle:
+                cnx = self._idle.pop()
+            else:
+                cnx = None
+                self._created += 1
+            self._in_use += 1
+
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+        try:
+            if cnx is None:
+                cnx = await self._connect()
+            elif self.health_check and not await cnx.is_connected():
+                await cnx.reconnect(attempts=2, delay=0)
+                self._reconnects += 1
+        except BaseException:
+            await self._forget(cnx)
+            raise
+        return cnx
+
+    async def release(self, cnx, discard=False):
+        """
+        Return a connection to the pool, rolling back anything left uncommitted.
+        Once the pool is closed, returned connections are closed instead.
+        """
+        discard = discard or self._closed
+        if not discard:
+            try:
+                if cnx.in_transaction:
+                    await cnx.rollback()
+            except DRIVER_ERRORS:
+                discard = True
+
+        if discard:
+            await self._forget(cnx)
+            return
+
+        async with self._cond:
+            self._in_use -= 1
+            self._idle.append(cnx)
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrow a connection for the duration of an `async with` block.
+        """
+        cnx = await self.acquire()
+        discard = False
+        try:
+            yield self.wrap(cnx) if self.wrap else cnx
+        except DISCONNECT_ERRORS:
+            discard = True
+            raise
+        finally:
+            await self.release(cnx, discard)
+
+    def stats(self):
+        """
+        Return a snapshot of pool usage, in the same shape as ConnectionPool.stats().
+        """
+        return {
+            'size': self.size,
+            'open': self._created,
+            'idle': len(self._idle),
+            'in_use': self._in_use,
+            'waiting': self._waiting,
+            'checkouts': self._checkouts,
+            'timeouts': self._timeouts,
+            'reconnects': self._reconnects,
+            'avg_wait_ms': 1000 * self._total_wait / self._checkouts if self._checkouts else 0.0,
+            'max_wait_ms': 1000 * self._max_wait,
+        }
+
+    async def close(self):
+        """
+        Close every idle connection. Connections still checked out are closed on release.
+        """
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for cnx in idle:
+            try:
+                await cnx.close()
+            except DRIVER_ERRORS:
+                pass
+
+    async def _forget(self, cnx):
+        async with self._cond:
+            self._created -= 1
+            self._in_use -= 1
+            self._cond.notify()
+        if cnx is not None:
+            try:
+                await cnx.close()
+            except DRIVER_ERRORS:
+                pass
@@ -0,0 +1,123 @@
+import argparse
+import hashlib
+import io
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it covers are served at full size
+    Image = None
+
+VARIANTS_DIR = os.path.join('static', 'covers', 'variants')
+
+# Bounding boxes, sized for the cards at 2x density
+VARIANTS = {
+    'card': (400, 600),
+    'thumb': (160, 240),
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 78, 'method': 6},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'cover'
+
+
+def render_variants(source_path, game_name, output_dir=VARIANTS_DIR):
+    """
+    Resize a cover into every variant and format, writing each under a content-hashed name.
+    Returns a list of (variant, format, filename, width, height, bytes).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    with Image.open(source_path) as original:
+        original = original.convert('RGB')
+        for variant, box in VARIANTS.items():
+            image = original.copy()
+            image.thumbnail(box, Image.LANCZOS)
+            for fmt, options in FORMATS.items():
+                buffer = io.BytesIO()
+                image.save(buffer, **options)
+                data = buffer.getvalue()
+                digest = hashlib.sha256(data).hexdigest()[:16]
+                filename = '{}-{}-{}.{}'.format(slugify(game_name), variant, digest, fmt)
+                path = os.path.join(output_dir, filename)
+                if not os.path.exists(path):
+                    with open(path, 'wb') as file:
+                        file.write(data)
+                written.append((variant, fmt, filename, image.width, image.height, len(data)))
+    return written
+
+
+class CoverProcessor:
+    def __init__(self, db, workers=2, output_dir=VARIANTS_DIR):
+        """
+        Generate cover variants on a small worker pool so uploads never resize on the request thread.
+        """
+        self.db = db
+        self.output_dir = output_dir
+        self.enabled = Image is not None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='covers')
+
+    def submit(self, game_id, game_name, source_path):
+        """
+        Queue a cover for processing. Returns a Future, or None when Pillow is not installed.
+        """
+        if not self.enabled:
+            return None
+        return self._executor.submit(self.process, game_id, game_name, source_path)
+
+    def process(self, game_id, game_name, source_path):
+        try:
+            variants = render_variants(source_path, game_name, self.output_dir)
+        except (IOError, OSError) as e:
+            print("Error processing cover for game {}: {}".format(game_id, e))
+            return False
+        return self.db.set_cover_variants(game_id, variants)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def backfill(db, covers_dir=os.path.join('static', 'covers'), workers=4, batch_size=1000):
+    """
+    Generate variants for every game that has an original cover but no variants yet,
+    checking `batch_size` games' existing variants per query.
+    """
+    processor = CoverProcessor(db, workers=workers)
+    if not processor.enabled:
+        print("Pillow is not installed; install it to generate cover variants")
+        return 0
+    games = db.get_game_names()
+    futures = []
+    for start in range(0, len(games), batch_size):
+        batch = games[start:start + batch_size]
+        cover_map = db.get_cover_map([game['game_id'] for game in batch])
+        for game in batch:
+            source = os.path.join(covers_dir, '{}.jpg'.format(game['game_name']))
+            if game['game_id'] not in cover_map and os.path.exists(source):
+                futures.append(processor.submit(game['game_id'], game['game_name'], source))
+    done = sum(1 for future in futures if future.result())
+    processor.shutdown()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate resized, content-hashed cover variants.")
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    from storageBackend import open_backend
+
+    print("Processed {} covers".format(backfill(open_backend(), workers=args.workers)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
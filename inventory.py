@@ -0,0 +1,64 @@
+import random
+import time
+
+try:
+    from mysql.connector import errorcode
+except ImportError:  # Only MySQL transactions are retried; SQLite serializes its writers
+    errorcode = None
+
+# Errors after which InnoDB has rolled back (or should retry) the whole transaction
+RETRYABLE_ERRORS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT} if errorcode else set()
+
+
+def reserve(cursor, quantities, placeholder='%s'):
+    """
+    Atomically take stock for every game in `quantities` ({game_id: count}).
+
+    A single conditional UPDATE decrements only rows that still have enough stock, so
+    concurrent buyers of the last copy cannot both succeed. Returns False if any game was
+    short; the caller must then roll back, because the other rows may already have been
+    decremented, and can call `shortages` afterwards to find out which games were short.
+    `placeholder` is the driver's parameter marker ('?' for sqlite3).
+    """
+    game_ids = sorted(quantities)
+    if not game_ids:
+        return True
+    case = ' '.join(['WHEN {0} THEN {0}'.format(placeholder)] * len(game_ids))
+    case_params = [value for game_id in game_ids for value in (game_id, quantities[game_id])]
+    query = """
+        UPDATE game_inventory
+        SET games_count = games_count - CASE game_id {case} END
+        WHERE game_id IN ({placeholders})
+          AND games_count >= CASE game_id {case} END
+    """.format(case=case, placeholders=', '.join([placeholder] * len(game_ids)))
+    cursor.execute(query, case_params + game_ids + case_params)
+    return cursor.rowcount == len(game_ids)
+
+
+def shortages(cursor, quantities, placeholder='%s'):
+    """
+    Return the game_ids whose current stock is below the requested count (or that do not exist).
+    """
+    game_ids = sorted(quantities)
+    query = """
+        SELECT game_id, games_count
+        FROM game_inventory
+        WHERE game_id IN ({})
+    """.format(', '.join([placeholder] * len(game_ids)))
+    cursor.execute(query, game_ids)
+    available = {row[0]: row[1] for row in cursor.fetchall()}
+    return [game_id for game_id in game_ids if available.get(game_id, 0) < quantities[game_id]]
+
+
+def run_with_retry(transaction, attempts=4, base_delay=0.02):
+    """
+    Call `transaction()` and retry it on deadlock or lock-wait timeout, with exponential
+    backoff and jitter. `transaction` must roll back its own work before raising.
+    """
+    for attempt in range(attempts):
+        try:
+            return transaction()
+        except Exception as e:
+            if getattr(e, 'errno', None) not in RETRYABLE_ERRORS or attempt == attempts - 1:
+                raise
+            time.sleep(base_delay * (2 ** attempt) * (1 + random.random()))
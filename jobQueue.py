@@ -0,0 +1,174 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger('gamestore.jobs')
+
+
+class Job:
+    def __init__(self, name, func, args, kwargs, key):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+
+class JobQueue:
+    def __init__(self, workers=2, max_attempts=4, retry_delay=1.0):
+        """
+        Run background jobs on `workers` daemon threads, off the request thread.
+
+        A job that raises is retried up to `max_attempts` times in all, waiting `retry_delay`
+        seconds and doubling the wait after each failure. Jobs live in memory: the work they
+        do must be safe to redo (or to lose) if the process restarts.
+        """
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._cond = threading.Condition()
+        self._scheduled = []
+        self._sequence = itertools.count()
+        self._pending_keys = set()
+        self._running = 0
+        self._stopping = False
+
+        self._enqueued = 0
+        self._started = 0
+        self._completed = 0
+        self._retried = 0
+        self._failed = 0
+        self._skipped = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+        self._by_name = {}
+
+        self._threads = [threading.Thread(target=self._work, name='jobs-{}'.format(i), daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def enqueue(self, name, func, *args, key=None, **kwargs):
+        """
+        Queue func(*args, **kwargs). With a `key`, the job is dropped if one with the same key
+        is still waiting to run (e.g. a refresh that the queued one will cover anyway).
+        Returns False if the job was dropped.
+        """
+        with self._cond:
+            if key is not None and key in self._pending_keys:
+                self._skipped += 1
+                return False
+            job = Job(name, func, args, kwargs, key)
+            if key is not None:
+                self._pending_keys.add(key)
+            self._push(job, time.monotonic())
+            self._enqueued += 1
+            return True
+
+    def _push(self, job, run_at):
+        heapq.heappush(self._scheduled, (run_at, next(self._sequence), job))
+        self._cond.notify()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._stopping and not self._scheduled:
+                    return None
+                now = time.monotonic()
+                if self._scheduled and self._scheduled[0][0] <= now:
+                    job = heapq.heappop(self._scheduled)[2]
+                    if job.attempts == 0:
+                        self._started += 1
+                        waited = now - job.enqueued_at
+                        self._total_wait += waited
+                        self._max_wait = max(self._max_wait, waited)
+                    self._pending_keys.discard(job.key)
+                    self._running += 1
+                    return job
+                self._cond.wait(self._scheduled[0][0] - now if self._scheduled else None)
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            job.attempts += 1
+            start = time.perf_counter()
+            error = None
+            try:
+                job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                error = e
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                self._running -= 1
+                self._total_run += elapsed
+                counts = self._by_name.setdefault(job.name, {'completed': 0, 'retried': 0, 'failed': 0})
+                if error is None:
+                    self._completed += 1
+                    counts['completed'] += 1
+                elif job.attempts < self.max_attempts:
+                    self._retried += 1
+                    counts['retried'] += 1
+                    delay = self.retry_delay * 2 ** (job.attempts - 1)
+                    logger.warning("Job %s failed (attempt %d), retrying in %.1fs: %s", job.name, job.attempts,
+                                   delay, error)
+                    self._push(job, time.monotonic() + delay)
+                else:
+                    self._failed += 1
+                    counts['failed'] += 1
+                    logger.error("Job %s failed after %d attempts: %s", job.name, job.attempts, error)
+                self._cond.notify_all()
+
+    def stats(self):
+        """
+        Return a snapshot of queue depth, outcomes and latencies for monitoring.
+        """
+        with self._cond:
+            now = time.monotonic()
+            attempts = self._completed + self._retried + self._failed
+            return {
+                'workers': len(self._threads),
+                'depth': sum(1 for run_at, _, _ in self._scheduled if run_at <= now),
+                'retry_scheduled': sum(1 for run_at, _, _ in self._scheduled if run_at > now),
+                'running': self._running,
+                'enqueued': self._enqueued,
+                'completed': self._completed,
+                'retried': self._retried,
+                'failed': self._failed,
+                'skipped': self._skipped,
+                'avg_wait_ms': 1000 * self._total_wait / self._started if self._started else 0.0,
+                'max_wait_ms': 1000 * self._max_wait,
+                'avg_run_ms': 1000 * self._total_run / attempts if attempts else 0.0,
+                'jobs': {name: dict(counts) for name, counts in self._by_name.items()},
+            }
+
+    def join(self, timeout=None):
+        """
+        Wait until nothing is queued or running (retries included). Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._scheduled or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers once the queue has drained (pending retries included).
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
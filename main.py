@@ -1,18 +1,50 @@
+import functools
+import hashlib
+import logging
 import os
 import re
-from flask import Flask, render_template, request, redirect, url_for, flash, session, abort
-from werkzeug.security import generate_password_hash
-from sqlCommands import MySql
+from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, g, jsonify, \
+    send_from_directory, make_response
+from storageBackend import PAGE_SIZE, CATALOG_CACHE_TTL, AccountExists, open_backend
+from catalogCache import CatalogCache
+from coverImages import CoverProcessor, VARIANTS_DIR
+import orderJobs
+from auth import Authenticator, AuthBusy, RateLimited
+from analytics import RollupRefresher
+from jobQueue import JobQueue
+from sessionStore import ServerSideSessionInterface, create_store, USER_CACHE_TTL
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
-crsr = MySql()
-
-logged_in = False
+# MySQL by default; DB_BACKEND=sqlite runs on an embedded database file instead
+crsr = open_backend()
+covers = CoverProcessor(crsr)
+# Folds new orders into the sales rollups behind the admin dashboard
+rollups = RollupRefresher(crsr)
+rollups.start()
+# Receipts, confirmation emails and rollup refreshes run here once an order has committed
+jobs = JobQueue(workers=2)
+# Password hashing runs on its own small, bounded pool, with per-IP and per-user login limits
+authenticator = Authenticator(crsr)
+
+# Sessions and cached user rows live in a store every worker shares (Redis or SESSION_DIR)
+session_store = create_store()
+app.session_interface = ServerSideSessionInterface(session_store)
 
 UPLOAD_FOLDER = os.path.join('static', 'covers')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+COVER_MAX_AGE = 365 * 24 * 3600
+# Rendered anonymous catalog pages, keyed by path and catalog version
+page_cache = CatalogCache(maxsize=int(os.environ.get('PAGE_CACHE_SIZE', 512)), ttl=CATALOG_CACHE_TTL)
+# How long a shared cache (CDN, reverse proxy) may serve an anonymous catalog page without revalidating
+HTTP_CACHE_S_MAXAGE = int(os.environ.get('HTTP_CACHE_S_MAXAGE', 0))
+# Served instead of a listing when the database read failed; never cached, so the next request retries
+CATALOG_UNAVAILABLE = ("Catalog unavailable, please try again", 503)
+# Send X-DB-Queries / X-DB-Time-Ms / Server-Timing on every response (always on in debug mode)
+DB_DEBUG_HEADERS = os.environ.get('DB_DEBUG_HEADERS') == '1'
+
+logging.basicConfig(level=logging.INFO)
 
 
 def sanitize_filename(filename):
@@ -25,16 +57,165 @@ def sanitize_filename(filename):
     return sanitized_filename
 
 
+def get_library():
+    # Load the logged-in user's owned game_ids once and keep them for the rest of the request
+    if 'library' not in g:
+        owned_game_ids = None
+        if 'user_id' in session:
+            owned_game_ids = crsr.get_owned_game_ids(session['user_id'])
+        g.library = owned_game_ids or set()
+    return g.library
+
+
+def invalidate_library():
+    g.pop('library', None)
+
+
+def current_user():
+    # The user row is cached in the session store, so a logged-in request does not query users
+    if 'user' not in g:
+        g.user = None
+        if 'user_id' in session:
+            user_id = session['user_id']
+            g.user = session_store.get_or_load('user:{}'.format(user_id),
+                                               lambda: crsr.get_user_profile(user_id), USER_CACHE_TTL)
+    return g.user
+
+
+def invalidate_user(user_id):
+    session_store.delete('user:{}'.format(user_id))
+    g.pop('user', None)
+
+
+def log_in(user):
+    session.regenerate()
+    session['user_id'] = user['user_id']
+    session['username'] = user['username']
+
+
 def game_in_library(game_id):
-    if logged_in:
-        user_id = session['user_id']
-        owned_games = crsr.get_owned_games(user_id)
-        if owned_games:
-            return any(game['game_id'] == game_id for game in owned_games)
-    return False
+    return game_id in get_library()
+
+
+def load_covers(games):
+    # Look up the processed variants of the games about to be rendered with one query, not one per card
+    game_ids = [game['game_id'] for game in games if game['game_id'] not in g.get('cover_map', {})]
+    if game_ids:
+        add_covers(game_ids, crsr.get_cover_map(game_ids))
+
+
+def add_covers(game_ids, cover_map):
+    # Games without variants are recorded too, so cover_url does not look them up again
+    covers = g.setdefault('cover_map', {})
+    for game_id in game_ids:
+        covers[game_id] = cover_map.get(game_id, {})
+
+
+def cover_url(game, variant='card', fmt='jpg'):
+    # Views load the variants of a whole page up front; fall back to the uploaded original
+    if game['game_id'] not in g.get('cover_map', {}):
+        load_covers([game])
+    filename = g.cover_map[game['game_id']].get((variant, fmt))
+    if filename:
+        return url_for('cover_file', filename=filename)
+    if fmt == 'jpg':
+        return url_for('static', filename='covers/{}.jpg'.format(game['game_name']))
+    return None
+
+
+app.jinja_env.globals.update(game_in_library=game_in_library, cover_url=cover_url)
+
 
+def catalog_page(view):
+    """
+    Conditional GET and rendered-page caching for anonymous catalog pages.
 
-app.jinja_env.globals.update(game_in_library=game_in_library)
+    The ETag combines the catalog version with the request path, so a revalidation answers
+    304 without touching the database (the version itself is cached) until games, stock or
+    covers change. Logged-in pages show a library and cart, so they are never shared or cached.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not catalog_page_shareable():
+            return private_response(view(*args, **kwargs))
+
+        version = crsr.get_catalog_version()
+        etag = catalog_etag(version)
+        if request.if_none_match.contains_weak(etag):
+            return shared_response('', etag, 304)
+        key = (request.full_path, version)
+        html = page_cache.get(key)
+        if html is None:
+            html = view(*args, **kwargs)
+            if not isinstance(html, str):
+                # Redirects and errors are neither cached nor tagged
+                return html
+            page_cache.set(key, html)
+        return shared_response(html, etag)
+    return wrapper
+
+
+def catalog_page_shareable():
+    return request.method == 'GET' and 'user_id' not in session
+
+
+def catalog_etag(version):
+    return '{}-{}'.format(version, hashlib.sha1(request.full_path.encode()).hexdigest()[:16])
+
+
+def private_response(rv):
+    response = make_response(rv)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def shared_response(rv, etag, status=None):
+    response = make_response(rv, status) if status else make_response(rv)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 0
+    response.cache_control.must_revalidate = True
+    # Shared caches must not hand this page to a logged-in visitor
+    response.vary.add('Cookie')
+    if HTTP_CACHE_S_MAXAGE:
+        response.cache_control.s_maxage = HTTP_CACHE_S_MAXAGE
+    return response
+
+
+@app.context_processor
+def inject_login_state():
+    return {'logged_in': 'user_id' in session}
+
+
+@app.before_request
+def start_query_profile():
+    crsr.profiler.start_request(request.endpoint or request.path)
+
+
+@app.before_request
+def set_read_preference():
+    # A client that wrote recently reads from the primary until replicas have caught up
+    if crsr.replicas:
+        crsr.pin_primary(session.get('primary_until', 0))
+
+
+@app.after_request
+def remember_recent_write(response):
+    if crsr.replicas and crsr.primary_pinned_until() > session.get('primary_until', 0):
+        session['primary_until'] = crsr.primary_pinned_until()
+    return response
+
+
+@app.after_request
+def add_query_profile_headers(response):
+    stats = crsr.profiler.end_request()
+    if stats is not None and (DB_DEBUG_HEADERS or app.debug):
+        response.headers['X-DB-Queries'] = str(stats.queries)
+        response.headers['X-DB-Time-Ms'] = '{:.2f}'.format(1000 * stats.db_time)
+        response.headers['Server-Timing'] = 'db;desc="{} queries";dur={:.2f}'.format(stats.queries,
+                                                                                   1000 * stats.db_time)
+    return response
 
 
 @app.template_filter('truncate_text')
@@ -45,17 +226,42 @@ def truncate_text(text, max_words=15, suffix='...'):
     return text
 
 
+@app.route('/covers/<path:filename>')
+def cover_file(filename):
+    # Variant filenames carry a content hash, so they can be cached forever
+    response = send_from_directory(VARIANTS_DIR, filename, max_age=COVER_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 @app.route('/')
 def landing_page():
     return render_template('landing_page.html')
 
 
 @app.route('/home')
+@catalog_page
 def home():
-    games = crsr.get_games_by_platform(platform='pc')
+    return render_listing('home', 'PC', crsr.get_games_by_platform(platform='pc', **page_args()))
+
+
+def page_args():
+    return {'after_id': request.args.get('after', type=int), 'limit': request.args.get('limit', PAGE_SIZE, type=int)}
+
+
+def render_listing(endpoint, cur_platform, page, **url_args):
+    # Shared by the sync views and their async versions in asgi.py
+    if page is None:
+        # Not a string, so catalog_page neither caches nor tags it
+        return CATALOG_UNAVAILABLE
+    games, next_after = page
+    load_covers(games)
+    next_url = url_for(endpoint, **url_args, after=next_after) if next_after else None
+    first_url = url_for(endpoint, **url_args) if 'after' in request.args else None
     platforms = ['PC', 'PS5', 'Xbox X', 'Nintendo Switch']
-    return render_template('home.html', games=games,
-                           platforms=platforms, cur_platform="PC", logged_in=logged_in)
+    return render_template('home.html', games=games, next_url=next_url, first_url=first_url,
+                           platforms=platforms, cur_platform=cur_platform)
 
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -63,13 +269,17 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        user = crsr.authenticate_user(username, password)
+        try:
+            user = authenticator.login(username, password, request.remote_addr)
+        except RateLimited as e:
+            flash('Too many login attempts, try again in {} seconds'.format(e.retry_after), 'error')
+            return redirect(url_for('home'))
+        except AuthBusy:
+            flash('The server is busy, please try again', 'error')
+            return redirect(url_for('home'))
         if user:
-            session['user_id'] = user['user_id']
-            session['username'] = user['username']
+            log_in(user)
             flash('Logged in successfully', 'success')
-            global logged_in
-            logged_in = True
             if user['user_id'] == 1:
                 return redirect(url_for('admin'))
             return redirect(url_for('home'))
@@ -81,53 +291,109 @@ def login():
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
-        if crsr.get_user_by_username(username):
-            flash('Username already exists', 'error')
-        else:
-            hashed_password = generate_password_hash(password)
-            email = request.form['email']
-            phone = request.form['phone']
-            address = request.form['address']
-            user = []
-            user.extend((username, hashed_password, phone, address, email))
-            var = crsr.create_user(user)
-            if var:
-                user = crsr.get_user_by_username(username)
-                session['user_id'] = user['user_id']
-                session['username'] = username
-                flash('Created Account successfully', 'Success')
-                global logged_in
-                logged_in = True
-                return redirect(url_for('home'))
+        try:
+            # The username and email UNIQUE keys reject duplicates, so there is no lookup beforehand
+            user = authenticator.signup(request.form['username'], request.form['password'], request.form['phone'],
+                                        request.form['address'], request.form['email'], request.remote_addr)
+        except RateLimited as e:
+            flash('Too many attempts, try again in {} seconds'.format(e.retry_after), 'error')
+            return redirect(url_for('home'))
+        except AuthBusy:
+            flash('The server is busy, please try again', 'error')
+            return redirect(url_for('home'))
+        except AccountExists as e:
+            flash('Email already in use' if e.field == 'email' else 'Username already exists', 'error')
+            return redirect(url_for('home'))
+        if user:
+            log_in(user)
+            flash('Created Account successfully', 'Success')
+            return redirect(url_for('home'))
         flash('Error creating account', 'error')
     return redirect(url_for('home'))
 
 
-@app.route('/filter', methods=['POST'])
+@app.route('/filter', methods=['GET', 'POST'])
+@catalog_page
 def filter_games():
-    platform = request.form['platform']
-    games = crsr.get_games_by_platform(platform=platform)
+    platform = request.values.get('platform')
+    if not platform:
+        return redirect(url_for('home'))
+    return render_listing('filter_games', platform, crsr.get_games_by_platform(platform=platform, **page_args()),
+                          platform=platform)
+
+
+@app.route('/search')
+@catalog_page
+def search():
+    q = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    result = crsr.search_games(q, page=page, limit=request.args.get('limit', PAGE_SIZE, type=int))
+    if result is None:
+        return CATALOG_UNAVAILABLE
+    games, next_page = result
+    load_covers(games)
+    next_url = url_for('search', q=q, page=next_page) if next_page else None
+    first_url = url_for('search', q=q) if page > 1 else None
     platforms = ['PC', 'PS5', 'Xbox X', 'Nintendo Switch']
-    return render_template('home.html', games=games, platforms=platforms, cur_platform=platform, logged_in=logged_in)
+    return render_template('home.html', games=games, next_url=next_url, first_url=first_url, platforms=platforms,
+                           heading='Results for "{}"'.format(q), search_query=q)
+
+
+@app.route('/search/suggest')
+def search_suggest():
+    return jsonify(crsr.suggest_games(request.args.get('q', '')))
 
 
 @app.route('/game/<int:game_id>')
+@catalog_page
 def game_details(game_id):
-    game = crsr.get_game_by_id(game_id)
+    return render_game(crsr.get_game_by_id(game_id))
+
+
+def render_game(game):
     if game:
-        return render_template('game.html', game=game, logged_in=logged_in)
+        return render_template('game.html', game=game)
     else:
         return "Game not found", 404
 
 
 @app.route('/profile')
 def profile():
-    user = crsr.get_user_by_username(session['username'])
-    user_id = user['user_id']
-    owned_games = crsr.get_owned_games(user_id)
-    return render_template('profile.html', user=user, owned_games=owned_games, logged_in=logged_in)
+    user = current_user()
+    if not user:
+        return redirect(url_for('home'))
+    profile_data = crsr.get_profile(user['user_id'], before_order_id=request.args.get('before', type=int),
+                                    library_after=request.args.get('after', type=int))
+    return render_profile(user, profile_data)
+
+
+def render_profile(user, profile_data):
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    if profile_data is None:
+        return "Profile unavailable, please try again", 503
+    next_orders_url = url_for('profile', before=profile_data['next_before_order_id'], after=after) \
+        if profile_data['next_before_order_id'] else None
+    next_library_url = url_for('profile', after=profile_data['next_library_after'], before=before) \
+        if profile_data['next_library_after'] else None
+    first_url = url_for('profile') if before or after else None
+    load_covers(profile_data['library'])
+    return render_template('profile.html', user=user, summary=profile_data['summary'],
+                           owned_games=profile_data['library'], orders=profile_data['orders'],
+                           next_orders_url=next_orders_url, next_library_url=next_library_url, first_url=first_url)
+
+
+@app.route('/profile/update', methods=['POST'])
+def update_profile():
+    if 'user_id' not in session:
+        return redirect(url_for('home'))
+    user_id = session['user_id']
+    if crsr.update_user(user_id, request.form['email'], request.form['phone'], request.form['address']):
+        invalidate_user(user_id)
+        flash('Profile updated', 'success')
+    else:
+        flash('Error updating profile', 'error')
+    return redirect(url_for('profile'))
 
 
 @app.route('/buyGame', methods=['POST'])
@@ -135,41 +401,139 @@ def buyGame():
     if request.method == "POST":
         gameID = request.form.get('gameID')  # Retrieve game ID from the form
         if gameID:
-            if 'username' in session:
-                username = session['username']
-                user = crsr.get_user_by_username(username)
-                if user:
-                    user_id = user['user_id']
-                    order_id = crsr.add_game_to_bought(gameID, user_id)
-                    if order_id:
-                        flash('Game purchased successfully!', 'success')
-                        order_details = crsr.get_order_details(order_id)
-                        return render_template('orderScreen.html', order_details=order_details)
+            if 'user_id' in session:
+                order, out_of_stock = crsr.checkout(session['user_id'], [gameID])
+                if order:
+                    return order_placed(order, 'Game purchased successfully!')
 
     return redirect(url_for('home'))
 
 
+def order_placed(order, message):
+    # The receipt is built from the rows checkout just inserted; the rest of the follow-up work is queued
+    invalidate_library()
+    user = current_user()
+    orderJobs.enqueue_post_purchase(jobs, crsr, order, user)
+    flash(message, 'success')
+    order_details = orderJobs.receipt_lines(order, user)
+    load_covers(order_details)
+    return render_template('orderScreen.html', order_details=order_details)
+
+
+@app.route('/cart')
+def cart():
+    if 'user_id' not in session:
+        return redirect(url_for('home'))
+    games = crsr.get_games_by_ids(session.get('cart', []))
+    load_covers(games or [])
+    platforms = ['PC', 'PS5', 'Xbox X', 'Nintendo Switch']
+    return render_template('cart.html', games=games, platforms=platforms, out_of_stock=[])
+
+
+@app.route('/cart/add', methods=['POST'])
+def add_to_cart():
+    gameID = request.form.get('gameID')
+    if gameID and 'user_id' in session:
+        cart_ids = session.get('cart', [])
+        if int(gameID) not in cart_ids:
+            session['cart'] = cart_ids + [int(gameID)]
+        flash('Game added to cart', 'success')
+    return redirect(url_for('cart'))
+
+
+@app.route('/cart/remove', methods=['POST'])
+def remove_from_cart():
+    gameID = request.form.get('gameID')
+    if gameID:
+        session['cart'] = [game_id for game_id in session.get('cart', []) if game_id != int(gameID)]
+    return redirect(url_for('cart'))
+
+
+@app.route('/checkout', methods=['POST'])
+def checkout():
+    cart_ids = session.get('cart', [])
+    if 'user_id' not in session or not cart_ids:
+        return redirect(url_for('cart'))
+    order, out_of_stock = crsr.checkout(session['user_id'], cart_ids)
+    if order:
+        session['cart'] = []
+        return order_placed(order, 'Order placed successfully!')
+
+    flash('Some games in your cart are out of stock' if out_of_stock else 'Error placing order', 'error')
+    games = crsr.get_games_by_ids(cart_ids)
+    load_covers(games or [])
+    platforms = ['PC', 'PS5', 'Xbox X', 'Nintendo Switch']
+    return render_template('cart.html', games=games, platforms=platforms, out_of_stock=out_of_stock)
+
+
 @app.route('/admin')
 def admin():
-    if not session['user_id'] == 1:
+    if not session.get('user_id') == 1:
+        abort(403)
+    page = crsr.get_all_games(after_id=request.args.get('after', type=int),
+                              limit=request.args.get('limit', PAGE_SIZE, type=int))
+    if page is None:
+        return CATALOG_UNAVAILABLE
+    games, next_after = page
+    load_covers(games)
+    next_url = url_for('admin', after=next_after) if next_after else None
+    first_url = url_for('admin') if 'after' in request.args else None
+    # The dashboard reads only precomputed rollup rows, and only on the first page
+    dashboard = crsr.get_sales_dashboard() if 'after' not in request.args else None
+    return render_template('admin.html', games=games, next_url=next_url, first_url=first_url, dashboard=dashboard)
+
+
+@app.route('/admin/pool_stats')
+def pool_stats():
+    if not session.get('user_id') == 1:
+        abort(403)
+    return jsonify(crsr.pool_stats())
+
+
+@app.route('/admin/db_stats')
+def db_stats():
+    if not session.get('user_id') == 1:
         abort(403)
-    games = crsr.get_all_games()
-    return render_template('admin.html', games=games, logged_in=logged_in)
+    return jsonify(queries=crsr.profiler.report(), pool=crsr.pool_stats(), catalog_cache=crsr.catalog_cache.stats(),
+                   page_cache=page_cache.stats(), jobs=jobs.stats(), replicas=crsr.replica_stats(),
+                   auth=authenticator.stats())
+
+
+@app.route('/admin/job_stats')
+def job_stats():
+    if not session.get('user_id') == 1:
+        abort(403)
+    return jsonify(jobs.stats())
 
 
 @app.route('/delete_game', methods=['POST'])
 def delete_game():
+    if not session.get('user_id') == 1:
+        abort(403)
     if request.method == "POST":
         game_id = request.form.get('game_id')
         if game_id:
-            # Implement the code to delete the game from the database using its ID
-            if crsr.delete_game(game_id):
-                flash('Game deleted successfully!', 'success')
+            # Retire rather than delete, so orders and libraries keep the game
+            if crsr.retire_games([game_id]) is not None:
+                flash('Game removed from the store', 'success')
             else:
                 flash('Error deleting game!', 'error')
     return redirect(url_for('admin'))
 
 
+@app.route('/admin/retire_games', methods=['POST'])
+def retire_games():
+    if not session.get('user_id') == 1:
+        abort(403)
+    game_ids = request.form.getlist('game_ids', type=int)
+    retired = crsr.retire_games(game_ids)
+    if retired is not None:
+        flash('Retired {} games'.format(retired), 'success')
+    else:
+        flash('Error retiring games', 'error')
+    return redirect(url_for('admin'))
+
+
 @app.route('/addItem', methods=['POST', 'GET'])
 def addItem():
     if request.method == 'POST':
@@ -192,13 +556,17 @@ def addItem():
         if file and file.filename.endswith('.jpg'):
             filename = sanitize_filename(game_name) + '.jpg'
             # Save the file with the modified filename
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+            cover_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            file.save(cover_path)
         else:
             flash('Invalid file format. Please upload a JPG file', 'error')
             return redirect(url_for('admin'))
 
         game = [game_name, details, developer, publisher, platform, price, count]
-        if crsr.add_game_to_list(game):
+        game_id = crsr.add_game_to_list(game)
+        if game_id:
+            # Thumbnails and WebP variants are generated off the request thread
+            covers.submit(game_id, game_name, cover_path)
             flash('Game added successfully!', 'success')
         else:
             flash('Error adding game', 'error')
@@ -208,10 +576,8 @@ def addItem():
 
 @app.route('/logout')
 def logout():
-    session.pop('user_id', None)
-    session.pop('username', None)
-    global logged_in
-    logged_in = False
+    session.clear()
+    session.regenerate()
     flash('Logged out successfully', 'success')
     return redirect(url_for('home'))
 
@@ -0,0 +1,272 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import errorcode
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+CHECK_PATTERN = re.compile(r'^--\s*check:\s*(\S+):\s*(.+)$')
+
+# Named lock serializing migration runs, e.g. of app workers that boot against a stale schema together
+LOCK_NAME = 'gamestore_migrate'
+LOCK_TIMEOUT = int(os.environ.get('DB_MIGRATE_LOCK_TIMEOUT', 600))
+
+
+class MigrationLockTimeout(Exception):
+    """
+    Raised when another process held the migration lock for longer than the timeout.
+    """
+
+
+class Migration:
+    def __init__(self, path):
+        """
+        Load a numbered migration file such as `0003_catalog_and_order_indexes.sql`.
+
+        Statements end with `;` unless a `DELIMITER` line changes it (for trigger bodies).
+        Lines of the form `-- check: <index>: <query>` name an index that EXPLAIN of the
+        query is expected to use once the migration is applied.
+        """
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.version = int(self.name.split('_', 1)[0])
+        with open(path, 'r') as file:
+            self.sql = file.read()
+        self.checks = []
+        for line in self.sql.splitlines():
+            match = CHECK_PATTERN.match(line.strip())
+            if match:
+                self.checks.append((match.group(1), match.group(2)))
+
+    def statements(self):
+        delimiter = ';'
+        buffer = []
+        for line in self.sql.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('--'):
+                continue
+            if stripped.upper().startswith('DELIMITER '):
+                delimiter = stripped.split()[1]
+                continue
+            if stripped.endswith(delimiter):
+                buffer.append(line.rstrip()[:-len(delimiter)])
+                statement = '\n'.join(buffer).strip()
+                buffer = []
+                if statement:
+                    yield statement
+            else:
+                buffer.append(line)
+        if '\n'.join(buffer).strip():
+            yield '\n'.join(buffer).strip()
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    """
+    Return every migration in `directory`, ordered by version.
+    """
+    migrations = [Migration(os.path.join(directory, name))
+                  for name in os.listdir(directory) if re.match(r'^\d+_.*\.sql$', name)]
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version in {}".format(directory))
+    return migrations
+
+
+def schema_fingerprint(migrations=None):
+    """
+    Return a hash of every migration file, identifying the schema the code expects.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+    digest = hashlib.sha256()
+    for migration in migrations:
+        digest.update(migration.name.encode('utf-8'))
+        digest.update(migration.sql.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def stored_fingerprint(cnx):
+    """
+    Return the fingerprint recorded by the last apply, or None if the database was never bootstrapped.
+    This is a single primary-key read and runs no DDL.
+    """
+    cursor = cnx.cursor()
+    try:
+        cursor.execute("SELECT fingerprint FROM schema_state WHERE id = 1")
+        row = cursor.fetchone()
+    except mysql.connector.errors.ProgrammingError as err:
+        if err.errno == errorcode.ER_NO_SUCH_TABLE:
+            return None
+        raise
+    finally:
+        cursor.close()
+    return row[0] if row else None
+
+
+def schema_is_current(cnx, migrations=None):
+    return stored_fingerprint(cnx) == schema_fingerprint(migrations)
+
+
+def ensure_version_table(cnx):
+    cursor = cnx.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+          version INT PRIMARY KEY,
+          name VARCHAR(255),
+          applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_state (
+          id TINYINT PRIMARY KEY,
+          fingerprint CHAR(64),
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.close()
+
+
+def applied_versions(cnx):
+    """
+    Return the set of migration versions recorded in schema_version.
+    """
+    ensure_version_table(cnx)
+    cursor = cnx.cursor()
+    cursor.execute("SELECT version FROM schema_version")
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return versions
+
+
+@contextmanager
+def migration_lock(cnx, timeout=LOCK_TIMEOUT):
+    """
+    Hold the server-wide LOCK_NAME lock on `cnx` for the duration of a `with` block,
+    waiting up to `timeout` seconds for another process to release it.
+    """
+    cursor = cnx.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, timeout))
+        if cursor.fetchone()[0] != 1:
+            raise MigrationLockTimeout("Another migration run held {} for over {}s".format(LOCK_NAME, timeout))
+        try:
+            yield
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def apply_migrations(cnx, migrations=None):
+    """
+    Apply every migration not yet recorded in schema_version, in order, and record the
+    resulting schema fingerprint. Safe to run repeatedly, and concurrently: runs are serialized
+    by migration_lock, and one that finds the schema current once it holds the lock does nothing.
+    Returns the names of the migrations applied.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+    with migration_lock(cnx):
+        if schema_is_current(cnx, migrations):
+            return []
+        done = applied_versions(cnx)
+        applied = []
+        cursor = cnx.cursor()
+        try:
+            for migration in migrations:
+                if migration.version in done:
+                    continue
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                               (migration.version, migration.name))
+                cnx.commit()
+                applied.append(migration.name)
+
+            cursor.execute("""
+                INSERT INTO schema_state (id, fingerprint) VALUES (1, %s)
+                ON DUPLICATE KEY UPDATE fingerprint = VALUES(fingerprint)
+            """, (schema_fingerprint(migrations),))
+            cnx.commit()
+        finally:
+            cursor.close()
+        return applied
+
+
+def run_checks(cnx, migrations=None):
+    """
+    EXPLAIN each check query of the applied migrations.
+    Returns (migration name, expected index, keys used, passed) tuples.
+    """
+    if migrations is None:
+        migrations = load_migrations()
+    done = applied_versions(cnx)
+    results = []
+    cursor = cnx.cursor(dictionary=True)
+    try:
+        for migration in migrations:
+            if migration.version not in done:
+                continue
+            for index, query in migration.checks:
+                cursor.execute("EXPLAIN " + query)
+                keys = [row['key'] for row in cursor.fetchall() if row['key']]
+                results.append((migration.name, index, keys, index in keys))
+    finally:
+        cursor.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply and inspect database schema migrations.")
+    parser.add_argument('command', nargs='?', default='bootstrap', choices=['bootstrap', 'apply', 'status', 'check'],
+                        help="create the database and apply pending migrations (bootstrap, the default; "
+                             "apply is an alias), list their status, "
+                             "or EXPLAIN the hot queries against the new indexes")
+    args = parser.parse_args(argv)
+
+    from sqlCommands import MySql
+
+    try:
+        cnx = MySql.createConnection()
+    except mysql.connector.Error as err:
+        print("Error creating MySQL connection: {}".format(err))
+        return 1
+
+    try:
+        migrations = load_migrations()
+        if args.command in ('bootstrap', 'apply'):
+            applied = apply_migrations(cnx, migrations)
+            for name in applied:
+                print("Applied {}".format(name))
+            if not applied:
+                print("Schema is up to date.")
+            print("Schema fingerprint {}".format(schema_fingerprint(migrations)))
+        elif args.command == 'status':
+            done = applied_versions(cnx)
+            for migration in migrations:
+                print("[{}] {}".format('x' if migration.version in done else ' ', migration.name))
+            print("Fingerprint {}".format('current' if schema_is_current(cnx, migrations) else 'out of date'))
+        else:
+            results = run_checks(cnx, migrations)
+            for name, index, keys, passed in results:
+                print("{} {}: {} (used: {})".format('OK  ' if passed else 'FAIL', name, index,
+                                                   ', '.join(keys) or 'none'))
+            if not all(result[3] for result in results):
+                return 1
+    except (mysql.connector.Error, MigrationLockTimeout) as err:
+        print("Error running migrations: {}".format(err))
+        return 1
+    finally:
+        cnx.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,6 @@
-CREATE TABLE games (
+-- Baseline schema (formerly tables.sql)
+
+CREATE TABLE IF NOT EXISTS games (
   game_id INT PRIMARY KEY AUTO_INCREMENT,
   game_name VARCHAR(255),
   details TEXT,
@@ -8,7 +10,7 @@ CREATE TABLE games (
   price DECIMAL(4,2)
 );
 
-CREATE TABLE users (
+CREATE TABLE IF NOT EXISTS users (
   user_id INT PRIMARY KEY AUTO_INCREMENT,
   username VARCHAR(255) UNIQUE,
   phone VARCHAR(15),
@@ -17,7 +19,7 @@ CREATE TABLE users (
   password_hash TEXT
 );
 
-CREATE TABLE user_orders (
+CREATE TABLE IF NOT EXISTS user_orders (
   order_id INT PRIMARY KEY AUTO_INCREMENT,
   date_order DATE,
   user_id INT,
@@ -26,7 +28,7 @@ CREATE TABLE user_orders (
     ON DELETE CASCADE ON UPDATE CASCADE
 ) AUTO_INCREMENT = 140101;
 
-CREATE TABLE order_items (
+CREATE TABLE IF NOT EXISTS order_items (
   order_id INT,
   game_id INT,
   FOREIGN KEY (order_id)
@@ -37,11 +39,10 @@ CREATE TABLE order_items (
     ON DELETE CASCADE ON UPDATE CASCADE
 );
 
-CREATE TABLE game_inventory (
+CREATE TABLE IF NOT EXISTS game_inventory (
   game_id INT PRIMARY KEY,
   games_count INT,
   FOREIGN KEY (game_id)
     REFERENCES games (game_id)
     ON DELETE CASCADE ON UPDATE CASCADE
 );
-
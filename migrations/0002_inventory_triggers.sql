@@ -0,0 +1,32 @@
+-- Inventory triggers (formerly created by MySql.create_triggers on every start)
+
+DROP TRIGGER IF EXISTS update_inventory_after_order;
+DROP TRIGGER IF EXISTS check_inventory_before_order;
+
+DELIMITER $$
+
+CREATE TRIGGER update_inventory_after_order
+AFTER INSERT ON order_items
+FOR EACH ROW
+BEGIN
+  UPDATE game_inventory
+  SET games_count = games_count - 1
+  WHERE game_id = NEW.game_id;
+END$$
+
+CREATE TRIGGER check_inventory_before_order
+BEFORE INSERT ON order_items
+FOR EACH ROW
+BEGIN
+  DECLARE available_count INT;
+  SELECT games_count INTO available_count
+  FROM game_inventory
+  WHERE game_id = NEW.game_id;
+
+  IF available_count <= 0 THEN
+    SIGNAL SQLSTATE '45000'
+    SET MESSAGE_TEXT = 'Game is out of stock';
+  END IF;
+END$$
+
+DELIMITER ;
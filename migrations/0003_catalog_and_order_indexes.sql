@@ -0,0 +1,15 @@
+-- Indexes for the platform filter, owned-games lookup and game deletion.
+-- InnoDB drops the implicit foreign-key indexes these supersede.
+
+-- check: idx_games_platform: SELECT g.game_id FROM games g WHERE g.platform = 'PC'
+-- check: PRIMARY: SELECT oi.game_id FROM order_items oi JOIN user_orders uo ON oi.order_id = uo.order_id WHERE uo.user_id = 1
+-- check: idx_user_orders_user_id: SELECT oi.game_id FROM order_items oi JOIN user_orders uo ON oi.order_id = uo.order_id WHERE uo.user_id = 1
+-- check: idx_order_items_game_id: SELECT oi.order_id FROM order_items oi WHERE oi.game_id = 1
+
+CREATE INDEX idx_games_platform ON games (platform);
+
+ALTER TABLE order_items
+  ADD PRIMARY KEY (order_id, game_id),
+  ADD INDEX idx_order_items_game_id (game_id);
+
+CREATE INDEX idx_user_orders_user_id ON user_orders (user_id);
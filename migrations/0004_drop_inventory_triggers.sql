@@ -0,0 +1,5 @@
+-- Stock is now checked and decremented set-wise by MySql.checkout inside the order
+-- transaction, so the per-row triggers from 0002 would decrement it twice.
+
+DROP TRIGGER IF EXISTS update_inventory_after_order;
+DROP TRIGGER IF EXISTS check_inventory_before_order;
@@ -0,0 +1,8 @@
+-- FULLTEXT indexes for /search (ranked) and /search/suggest (name typeahead).
+
+-- check: ft_games_search: SELECT game_id FROM games WHERE MATCH (game_name, developer, publisher, details) AGAINST ('+zelda*' IN BOOLEAN MODE)
+-- check: ft_games_name: SELECT game_id FROM games WHERE MATCH (game_name) AGAINST ('+zel*' IN BOOLEAN MODE)
+
+ALTER TABLE games ADD FULLTEXT INDEX ft_games_search (game_name, developer, publisher, details);
+
+ALTER TABLE games ADD FULLTEXT INDEX ft_games_name (game_name);
@@ -0,0 +1,15 @@
+-- Resized, content-hashed cover variants produced by coverImages.CoverProcessor.
+
+CREATE TABLE IF NOT EXISTS game_covers (
+  game_id INT,
+  variant VARCHAR(32),
+  format VARCHAR(8),
+  path VARCHAR(255),
+  width INT,
+  height INT,
+  bytes INT,
+  PRIMARY KEY (game_id, variant, format),
+  FOREIGN KEY (game_id)
+    REFERENCES games (game_id)
+    ON DELETE CASCADE ON UPDATE CASCADE
+);
@@ -0,0 +1,39 @@
+-- Precomputed sales rollups for the admin dashboard, maintained incrementally by analytics.py.
+-- order_items.price records what was paid; rows from before this migration fall back to games.price.
+
+-- check: idx_sales_by_game_revenue: SELECT s.game_id FROM sales_by_game s ORDER BY s.revenue DESC LIMIT 10
+-- check: idx_game_inventory_count: SELECT gi.game_id FROM game_inventory gi WHERE gi.games_count <= 5
+
+ALTER TABLE order_items ADD COLUMN price DECIMAL(5,2) NULL;
+
+CREATE TABLE IF NOT EXISTS sales_by_game (
+  game_id INT PRIMARY KEY,
+  units INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+  last_sold DATE,
+  INDEX idx_sales_by_game_revenue (revenue)
+);
+
+CREATE TABLE IF NOT EXISTS sales_by_platform (
+  platform VARCHAR(20) PRIMARY KEY,
+  units INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_by_day (
+  day DATE PRIMARY KEY,
+  orders INT NOT NULL DEFAULT 0,
+  units INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+);
+
+-- Single row: the highest order_id already folded into the rollups
+CREATE TABLE IF NOT EXISTS sales_rollup_state (
+  id TINYINT PRIMARY KEY,
+  last_order_id INT NOT NULL DEFAULT 0,
+  refreshed_at DATETIME
+);
+
+INSERT IGNORE INTO sales_rollup_state (id, last_order_id) VALUES (1, 0);
+
+CREATE INDEX idx_game_inventory_count ON game_inventory (games_count);
@@ -0,0 +1,9 @@
+-- Soft delete: retired games leave the storefront but keep their order history.
+-- The platform index gains retired_at so active listings stay an index range in game_id order.
+
+-- check: idx_games_platform: SELECT g.game_id FROM games g WHERE g.platform = 'PC' AND g.retired_at IS NULL ORDER BY g.game_id LIMIT 41
+
+ALTER TABLE games
+  ADD COLUMN retired_at DATETIME NULL,
+  DROP INDEX idx_games_platform,
+  ADD INDEX idx_games_platform (platform, retired_at);
@@ -0,0 +1,8 @@
+-- Single-row counter bumped on every catalog or stock change; drives ETags and the rendered-page cache.
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+  id TINYINT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 1
+);
+
+INSERT IGNORE INTO catalog_version (id, version) VALUES (1, 1);
@@ -0,0 +1,27 @@
+-- Per-user profile summary, kept current by MySql.checkout in the order's own transaction.
+-- Order history pages walk idx_user_orders_user_id, whose entries end in the order_id primary key,
+-- so a keyset page (user_id = ? AND order_id < ? ORDER BY order_id DESC) reads only that page.
+
+-- check: idx_user_orders_user_id: SELECT uo.order_id FROM user_orders uo WHERE uo.user_id = 1 AND uo.order_id < 1000000 ORDER BY uo.order_id DESC LIMIT 11
+
+CREATE TABLE IF NOT EXISTS user_summary (
+  user_id INT PRIMARY KEY,
+  orders INT NOT NULL DEFAULT 0,
+  games_owned INT NOT NULL DEFAULT 0,
+  total_spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+  last_order_id INT,
+  FOREIGN KEY (user_id)
+    REFERENCES users (user_id)
+    ON DELETE CASCADE
+);
+
+INSERT INTO user_summary (user_id, orders, games_owned, total_spent, last_order_id)
+SELECT uo.user_id, COUNT(DISTINCT uo.order_id), COUNT(DISTINCT oi.game_id),
+       COALESCE(SUM(COALESCE(oi.price, g.price, 0)), 0), MAX(uo.order_id)
+FROM user_orders uo
+LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+LEFT JOIN games g ON g.game_id = oi.game_id
+WHERE uo.user_id IS NOT NULL
+GROUP BY uo.user_id
+ON DUPLICATE KEY UPDATE orders = VALUES(orders), games_owned = VALUES(games_owned),
+                        total_spent = VALUES(total_spent), last_order_id = VALUES(last_order_id);
@@ -0,0 +1,4 @@
+-- sales_by_platform.platform matches games.platform (VARCHAR(255)): a longer platform name
+-- failed the rollup INSERT in strict mode, inside the watermark transaction, stalling the refresher.
+
+ALTER TABLE sales_by_platform MODIFY platform VARCHAR(255) NOT NULL;
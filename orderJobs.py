@@ -0,0 +1,74 @@
+import json
+import os
+from email.message import EmailMessage
+
+OUTBOX_DIR = os.environ.get('OUTBOX_DIR', os.path.join('instance', 'outbox'))
+RECEIPTS_DIR = os.environ.get('RECEIPTS_DIR', os.path.join('instance', 'receipts'))
+MAIL_FROM = os.environ.get('MAIL_FROM', 'orders@haven.example')
+
+
+def receipt_lines(order, user):
+    """
+    Build the order screen rows (one per game, like get_order_details) from the order that
+    checkout just inserted and the cached user row, without querying the database again.
+    """
+    user = user or {}
+    return [dict(item, order_id=order['order_id'], date_order=order['date_order'], user_id=user.get('user_id'),
+                 username=user.get('username'), address=user.get('address'), email=user.get('email'))
+            for item in sorted(order['items'], key=lambda item: item['game_name'])]
+
+
+def render_receipt(order, user):
+    lines = receipt_lines(order, user)
+    text = ["Order #{} - {}".format(order['order_id'], order['date_order']), '']
+    for line in lines:
+        text.append("{:<50} {:<16} ${}".format(line['game_name'], line['platform'], line['price']))
+    text += ['', "Total: ${}".format(sum(line['price'] for line in lines))]
+    if user and user.get('address'):
+        text.append("Delivered to: {}".format(user['address']))
+    return '\n'.join(text) + '\n'
+
+
+def write_receipt(order, user, directory=RECEIPTS_DIR):
+    """
+    Store the receipt as JSON. Rewriting it on a retry is harmless.
+    """
+    os.makedirs(directory, exist_ok=True)
+    receipt = {'order_id': order['order_id'], 'date_order': order['date_order'],
+               'user_id': (user or {}).get('user_id'), 'items': receipt_lines(order, user)}
+    path = os.path.join(directory, 'order-{}.json'.format(order['order_id']))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(receipt, file, indent=2, default=str)
+    os.replace(temp_path, path)
+
+
+def send_confirmation_email(order, user, outbox=OUTBOX_DIR):
+    """
+    Local mail stub: the confirmation is written to `outbox` as an .eml file instead of being sent.
+    """
+    if not user or not user.get('email'):
+        return
+    message = EmailMessage()
+    message['From'] = MAIL_FROM
+    message['To'] = user['email']
+    message['Subject'] = "Your HAVEN order #{}".format(order['order_id'])
+    message.set_content("Thanks for your order, {}!\n\n{}".format(user['username'], render_receipt(order, user)))
+    os.makedirs(outbox, exist_ok=True)
+    with open(os.path.join(outbox, 'order-{}.eml'.format(order['order_id'])), 'wb') as file:
+        file.write(bytes(message))
+
+
+def refresh_sales_rollups(db):
+    if db.refresh_sales_rollups() is None:
+        raise RuntimeError("Sales rollup refresh failed")
+
+
+def enqueue_post_purchase(jobs, db, order, user):
+    """
+    Queue the work that follows a committed order, so the purchase request does not wait for it.
+    """
+    jobs.enqueue('write_receipt', write_receipt, order, user)
+    jobs.enqueue('confirmation_email', send_confirmation_email, order, user)
+    # One pending refresh covers every order committed before it runs
+    jobs.enqueue('sales_rollups', refresh_sales_rollups, db, key='sales_rollups')
@@ -0,0 +1,206 @@
+import contextvars
+import heapq
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger('gamestore.sql')
+
+
+def normalize(statement, limit=300):
+    """
+    Collapse whitespace in a SQL statement for logs and reports.
+    """
+    statement = re.sub(r'\s+', ' ', statement).strip()
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+class RequestStats:
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.errors = 0
+        self.db_time = 0.0
+        self.slowest = []
+
+    def add(self, statement, seconds, error, keep):
+        self.queries += 1
+        self.db_time += seconds
+        if error:
+            self.errors += 1
+        entry = (seconds, self.queries, statement)
+        if len(self.slowest) < keep:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'queries': self.queries,
+            'errors': self.errors,
+            'db_ms': round(1000 * self.db_time, 3),
+            'slowest': [{'ms': round(1000 * seconds, 3), 'sql': normalize(statement)}
+                        for seconds, _, statement in sorted(self.slowest, reverse=True)],
+        }
+
+
+class QueryProfiler:
+    def __init__(self, slow_threshold_ms=100, keep_slowest=5):
+        """
+        Record the number and duration of SQL statements, per request and in aggregate.
+
+        A request is whatever runs between start_request() and end_request() in one thread or
+        asyncio task; statements outside a request only count towards the totals. Statements
+        slower than `slow_threshold_ms` are logged to the 'gamestore.sql' logger.
+        """
+        self.slow_threshold = slow_threshold_ms / 1000.0
+        self.keep_slowest = keep_slowest
+        self._current = contextvars.ContextVar('query_stats_{}'.format(id(self)), default=None)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._slowest = RequestStats('all')
+
+    def start_request(self, name):
+        self._current.set(RequestStats(name))
+
+    def end_request(self):
+        """
+        Finish the current request and return its RequestStats (None if none was started).
+        """
+        stats = self._current.get()
+        self._current.set(None)
+        if stats is not None:
+            with self._lock:
+                totals = self._endpoints.setdefault(stats.name, {'requests': 0, 'queries': 0, 'errors': 0,
+                                                                 'db_ms': 0.0, 'max_queries': 0})
+                totals['requests'] += 1
+                totals['queries'] += stats.queries
+                totals['errors'] += stats.errors
+                totals['db_ms'] += 1000 * stats.db_time
+                totals['max_queries'] = max(totals['max_queries'], stats.queries)
+        return stats
+
+    def record(self, statement, seconds, error=False):
+        stats = self._current.get()
+        if stats is not None:
+            stats.add(statement, seconds, error, self.keep_slowest)
+        with self._lock:
+            self._slowest.add(statement, seconds, error, self.keep_slowest)
+        if seconds >= self.slow_threshold:
+            logger.warning("Slow query (%.1f ms, %s): %s", 1000 * seconds,
+                           stats.name if stats is not None else 'background', normalize(statement))
+
+    def report(self):
+        """
+        Aggregate per-endpoint query counts and DB time, plus the slowest statements seen.
+        """
+        with self._lock:
+            endpoints = {}
+            for name, totals in self._endpoints.items():
+                endpoints[name] = dict(totals,
+                                       db_ms=round(totals['db_ms'], 3),
+                                       avg_queries=round(totals['queries'] / totals['requests'], 2),
+                                       avg_db_ms=round(totals['db_ms'] / totals['requests'], 3))
+            overall = self._slowest.summary()
+        return {
+            'slow_threshold_ms': 1000 * self.slow_threshold,
+            'queries': overall['queries'],
+            'errors': overall['errors'],
+            'db_ms': overall['db_ms'],
+            'slowest': overall['slowest'],
+            'endpoints': endpoints,
+        }
+
+    def wrap(self, cnx):
+        return ProfiledConnection(cnx, self)
+
+    def wrap_async(self, cnx):
+        return AsyncProfiledConnection(cnx, self)
+
+
+class ProfiledConnection:
+    """
+    Connection proxy whose cursors report every execute to a QueryProfiler.
+    """
+
+    def __init__(self, cnx, profiler):
+        self._cnx = cnx
+        self._profiler = profiler
+
+    def cursor(self, *args, **kwargs):
+        return ProfiledCursor(self._cnx.cursor(*args, **kwargs), self._profiler)
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+
+class ProfiledCursor:
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+
+    def _timed(self, method, statement, *args, **kwargs):
+        start = time.perf_counter()
+        error = False
+        try:
+            return method(statement, *args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._profiler.record(statement, time.perf_counter() - start, error)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._timed(self._cursor.execute, statement, *args, **kwargs)
+
+    def executemany(self, statement, *args, **kwargs):
+        return self._timed(self._cursor.executemany, statement, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class AsyncProfiledConnection:
+    """
+    ProfiledConnection for mysql.connector.aio connections, whose cursor() is a coroutine.
+    """
+    def __init__(self, cnx, profiler):
+        self._cnx = cnx
+        self._profiler = profiler
+
+    async def cursor(self, *args, **kwargs):
+        return AsyncProfiledCursor(await self._cnx.cursor(*args, **kwargs), self._profiler)
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+
+class AsyncProfiledCursor:
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+
+    async def _timed(self, method, statement, *args, **kwargs):
+        start = time.perf_counter()
+        error = False
+        try:
+            return await method(statement, *args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._profiler.record(statement, time.perf_counter() - start, error)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await self._timed(self._cursor.execute, statement, *args, **kwargs)
+
+    async def executemany(self, statement, *args, **kwargs):
+        return await self._timed(self._cursor.executemany, statement, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,147 @@
+"""
+Route catalog reads to MySQL read replicas, falling back to the primary.
+
+Replicas are configured with DB_REPLICAS, a comma-separated list of host:port pairs that
+share the primary's credentials and database name (override with DB_REPLICA_USER and
+DB_REPLICA_PASSWORD). To try it locally, run a second mysqld replicating from the first
+(e.g. on port 3307) and start the app with DB_REPLICAS=127.0.0.1:3307.
+"""
+import logging
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errorcode
+
+logger = logging.getLogger('gamestore.replicas')
+
+# Errors that mean the replica (not the query) is the problem; PoolTimeout is a PoolError
+FAILOVER_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError,
+                   mysql.connector.errors.PoolError)
+
+
+def parse_endpoints(value):
+    """
+    Parse 'host[:port],host[:port]' into [(host, port)].
+    """
+    endpoints = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(':')
+            endpoints.append((host, int(port or 3306)))
+    return endpoints
+
+
+def replication_lag(cnx):
+    """
+    Return the replica's lag in seconds, None if it is not replicating, or -1 if it cannot be measured.
+    """
+    cursor = cnx.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.errors.ProgrammingError as e:
+            if e.errno in (errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR, errorcode.ER_ACCESS_DENIED_ERROR):
+                return -1
+            # Before MySQL 8.0.22
+            cursor.execute("SHOW SLAVE STATUS")
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    if not row:
+        return None
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return int(lag) if lag is not None else None
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.down_until = 0.0
+        self.lag = None
+        self.checked_at = 0.0
+        self.reads = 0
+        self.failures = 0
+        self.last_error = None
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, max_lag=5, retry_after=30.0, lag_check_interval=5.0):
+        """
+        Pick a replica for each read, round-robin over the ones that are up and no more than
+        `max_lag` seconds behind (0 skips the lag check). A replica that fails is left out for
+        `retry_after` seconds; lag is re-measured at most every `lag_check_interval` seconds.
+        """
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.retry_after = retry_after
+        self.lag_check_interval = lag_check_interval
+        self._lock = threading.Lock()
+        self._next = 0
+        self.primary_reads = 0
+
+    def choose(self):
+        """
+        Return a usable Replica, or None when reads should go to the primary.
+        """
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+                now = time.monotonic()
+                if replica.down_until > now:
+                    continue
+                check_lag = self.max_lag and replica.checked_at + self.lag_check_interval <= now
+                if check_lag:
+                    # Claim the check so concurrent readers keep using the last measurement
+                    replica.checked_at = now
+            if check_lag and not self._measure_lag(replica):
+                continue
+            if self.max_lag and (replica.lag is None or replica.lag > self.max_lag):
+                continue
+            with self._lock:
+                replica.reads += 1
+            return replica
+        with self._lock:
+            self.primary_reads += 1
+        return None
+
+    def _measure_lag(self, replica):
+        try:
+            with replica.pool.connection() as cnx:
+                lag = replication_lag(cnx)
+        except mysql.connector.Error as e:
+            self.mark_failed(replica, e)
+            return False
+        if lag == -1:
+            logger.warning("Cannot read replication status on %s (needs REPLICATION CLIENT); "
+                           "assuming it is current", replica.name)
+            lag = 0
+        elif lag is None:
+            logger.warning("%s is not replicating; reading from the primary", replica.name)
+        elif lag > self.max_lag:
+            logger.warning("%s is %ss behind; reading from the primary", replica.name, lag)
+        replica.lag = lag
+        return True
+
+    def mark_failed(self, replica, error):
+        with self._lock:
+            replica.down_until = time.monotonic() + self.retry_after
+            replica.failures += 1
+            replica.last_error = str(error)
+        logger.warning("Replica %s failed, reading from the primary for %.0fs: %s", replica.name,
+                       self.retry_after, error)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'primary_reads': self.primary_reads,
+                'replicas': [{'name': replica.name, 'up': replica.down_until <= now, 'lag': replica.lag,
+                              'reads': replica.reads, 'failures': replica.failures,
+                              'last_error': replica.last_error, 'pool': replica.pool.stats()}
+                             for replica in self.replicas],
+            }
@@ -0,0 +1,251 @@
+import abc
+import argparse
+import json
+import os
+import re
+import secrets
+import sys
+import tempfile
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+try:
+    import redis
+except ImportError:  # Redis is optional; without it sessions live in SESSION_DIR
+    redis = None
+
+SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL')
+SESSION_DIR = os.environ.get('SESSION_DIR', os.path.join('instance', 'sessions'))
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 3600))
+
+SID_PATTERN = re.compile(r'[A-Za-z0-9_-]{43}')
+
+
+def new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class SessionStore(abc.ABC):
+    """
+    Key/value store with per-key expiry, shared by every worker process.
+    Values are anything Flask's session serializer understands.
+    """
+    serializer = TaggedJSONSerializer()
+
+    @abc.abstractmethod
+    def get(self, key):
+        """
+        Return the value stored under `key`, or None if it is missing or expired.
+        """
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl):
+        """
+        Store `value` under `key` for `ttl` seconds.
+        """
+
+    @abc.abstractmethod
+    def touch(self, key, ttl):
+        """
+        Restart the expiry of `key` at `ttl` seconds without rewriting its value.
+        """
+
+    @abc.abstractmethod
+    def delete(self, key):
+        pass
+
+    def get_or_load(self, key, loader, ttl):
+        """
+        Return the stored value for `key`, calling `loader` and storing its result on a miss.
+        None is never stored, so a failed load is retried on the next call.
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+
+class FileSessionStore(SessionStore):
+    def __init__(self, directory=SESSION_DIR):
+        """
+        One JSON file per key. Writes go through a temporary file and an atomic rename, so
+        concurrent workers on the same host never see a partial value. A key expires `ttl`
+        seconds after it was last written or touched.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key.replace(':', '-') + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+            expired = os.path.getmtime(path) + entry['ttl'] < time.time()
+        except (OSError, ValueError, KeyError):
+            return None
+        if expired:
+            self.delete(key)
+            return None
+        return self.serializer.loads(entry['value'])
+
+    def set(self, key, value, ttl):
+        entry = json.dumps({'ttl': ttl, 'value': self.serializer.dumps(value)})
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(entry)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            os.unlink(temp_path)
+            raise
+
+    def touch(self, key, ttl):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def purge(self):
+        """
+        Delete every expired entry. Returns the number removed.
+        """
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(path) as file:
+                    ttl = json.load(file)['ttl']
+                if os.path.getmtime(path) + ttl < now:
+                    os.unlink(path)
+                    removed += 1
+            except (OSError, ValueError, KeyError):
+                continue
+        return removed
+
+
+class RedisSessionStore(SessionStore):
+    def __init__(self, url=SESSION_REDIS_URL, prefix='gamestore:'):
+        if redis is None:
+            raise RuntimeError("SESSION_REDIS_URL is set but the redis package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return self.serializer.loads(value.decode()) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, self.serializer.dumps(value), ex=ttl)
+
+    def touch(self, key, ttl):
+        self.client.expire(self.prefix + key, ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def create_store():
+    """
+    Use Redis when SESSION_REDIS_URL is set, otherwise a file store under SESSION_DIR.
+    """
+    if SESSION_REDIS_URL:
+        return RedisSessionStore(SESSION_REDIS_URL)
+    return FileSessionStore(SESSION_DIR)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid or new_sid()
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """
+        Move the session to a fresh id (on login), so an id planted before login is worthless after it.
+        """
+        self.previous_sid = self.previous_sid or self.sid
+        self.sid = new_sid()
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keep session data in a SessionStore; the cookie only carries a random session id.
+    Sessions that never hold any data are not stored at all.
+    """
+
+    def __init__(self, store, ttl=SESSION_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SID_PATTERN.fullmatch(sid):
+            data = self.store.get('session:' + sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.store.delete('session:' + session.previous_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete('session:' + session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        response.vary.add('Cookie')
+        if not session.modified:
+            self.store.touch('session:' + session.sid, self.ttl)
+            return
+
+        self.store.set('session:' + session.sid, dict(session), self.ttl)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app), domain=domain, path=path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the server-side session store.")
+    parser.add_argument('command', choices=['purge'])
+    args = parser.parse_args(argv)
+
+    store = create_store()
+    if not isinstance(store, FileSessionStore):
+        print("Redis expires keys on its own; nothing to purge")
+        return 0
+    print("Removed {} expired entries".format(store.purge()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
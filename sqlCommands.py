@@ -1,178 +1,488 @@
+import datetime
+import os
+import contextvars
+import re
+import time
+
 import mysql.connector
-from werkzeug.security import check_password_hash
+from mysql.connector import errorcode
+
+import analytics
+import inventory
+import migrate
+from analytics import LOW_STOCK_THRESHOLD
+from catalogCache import CatalogCache
+from connectionPool import ConnectionPool
+from queryProfiler import QueryProfiler
+from replicaRouter import FAILOVER_ERRORS, Replica, ReplicaRouter, parse_endpoints
+from storageBackend import (CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL, DELETE_CHUNK_SIZE, DETAILS_PREVIEW, MAX_PAGE_SIZE,
+                            ORDER_PAGE_SIZE, PAGE_SIZE, POOL_SIZE, POOL_TIMEOUT, SLOW_QUERY_MS, STARTUP_MODE,
+                            AccountExists, StorageBackend, build_profile, cover_map_from_rows, profile_limits,
+                            split_page)
+
+DB_CONFIG = {
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'root'),
+    'host': os.environ.get('DB_HOST', '127.0.0.1'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'database': os.environ.get('DB_NAME', 'projectDB'),
+}
+
+POOL_HEALTH_CHECK = os.environ.get('DB_POOL_HEALTH_CHECK', '1') != '0'
+
+# Read replicas for catalog reads, as host:port,host:port; empty means every read goes to the primary
+REPLICA_ENDPOINTS = parse_endpoints(os.environ.get('DB_REPLICAS', ''))
+REPLICA_CONFIG = dict(DB_CONFIG, user=os.environ.get('DB_REPLICA_USER', DB_CONFIG['user']),
+                      password=os.environ.get('DB_REPLICA_PASSWORD', DB_CONFIG['password']))
+REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+REPLICA_RETRY_AFTER = float(os.environ.get('DB_REPLICA_RETRY_AFTER', 30))
+# After a write, that client's reads stay on the primary for this long (read-your-writes)
+STICKY_SECONDS = float(os.environ.get('DB_STICKY_SECONDS', 10))
+
+# InnoDB's default full-text stopword list (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD)
+FULLTEXT_STOPWORDS = frozenset([
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in',
+    'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+    'will', 'with', 'und', 'www',
+])
+
+# Recompute the profile summary of the listed users from their orders
+USER_SUMMARY_REBUILD = """
+    INSERT INTO user_summary (user_id, orders, games_owned, total_spent, last_order_id)
+    SELECT u.user_id, COUNT(DISTINCT uo.order_id), COUNT(DISTINCT oi.game_id),
+           COALESCE(SUM(COALESCE(oi.price, g.price, 0)), 0), MAX(uo.order_id)
+    FROM users u
+    LEFT JOIN user_orders uo ON uo.user_id = u.user_id
+    LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE u.user_id IN ({})
+    GROUP BY u.user_id
+    ON DUPLICATE KEY UPDATE orders = VALUES(orders), games_owned = VALUES(games_owned),
+                            total_spent = VALUES(total_spent), last_order_id = VALUES(last_order_id)
+"""
+
+
+def fulltext_terms(text, max_terms=8):
+    """
+    Turn free text into a BOOLEAN MODE query requiring every word as a prefix, e.g. 'zel bre' -> '+zel* +bre*'.
+    Operator characters are dropped so user input cannot change the query syntax. Words InnoDB
+    never indexes (stopwords, words under 3 characters) are skipped unless they are the word
+    still being typed, which is only ever matched as a prefix.
+    """
+    words = [word.lower() for word in re.findall(r'\w+', text or '')]
+    kept = [word for word in words[:-1] if len(word) >= 3 and word not in FULLTEXT_STOPWORDS]
+    if words:
+        kept.append(words[-1])
+    return ' '.join('+{}*'.format(word) for word in kept[:max_terms])
+
+
+# Read queries shared with the asyncio data layer (asyncSqlCommands.AsyncMySql)
+CATALOG_VERSION_QUERY = "SELECT version FROM catalog_version WHERE id = 1"
+
+GAME_BY_ID_QUERY = """
+    SELECT g.*, gi.games_count
+    FROM games g
+    LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+    WHERE g.game_id = %s
+"""
+
+USER_PROFILE_QUERY = "SELECT user_id, username, email, phone, address FROM users WHERE user_id = %s"
+
+# The unique key named in an ER_DUP_ENTRY message, without the table prefix newer servers add
+DUP_KEY = re.compile(r"for key '(?:\w+\.)?(\w+)'")
+
+OWNED_GAME_IDS_QUERY = """
+    SELECT DISTINCT oi.game_id
+    FROM order_items oi
+    JOIN user_orders uo ON oi.order_id = uo.order_id
+    WHERE uo.user_id = %s
+"""
+
+COVER_MAP_QUERY = "SELECT game_id, variant, format, path FROM game_covers WHERE game_id IN ({})"
+
+USER_SUMMARY_QUERY = "SELECT orders, games_owned, total_spent, last_order_id FROM user_summary WHERE user_id = %s"
 
+# Each owned game once, however many times it was bought
+LIBRARY_PAGE_QUERY = """
+    SELECT g.game_id, g.game_name, g.platform, g.price
+    FROM games g
+    WHERE g.game_id IN (
+        SELECT oi.game_id
+        FROM user_orders uo
+        JOIN order_items oi ON oi.order_id = uo.order_id
+        WHERE uo.user_id = %s
+    ) AND g.game_id > %s
+    ORDER BY g.game_id
+    LIMIT %s
+"""
+
+# Pick the page of orders first, then join their items
+ORDER_HISTORY_QUERY = """
+    SELECT uo.order_id, uo.date_order, oi.game_id, g.game_name, g.platform,
+           COALESCE(oi.price, g.price) AS price
+    FROM (
+        SELECT order_id, date_order
+        FROM user_orders
+        WHERE user_id = %s AND order_id < %s
+        ORDER BY order_id DESC
+        LIMIT %s
+    ) AS uo
+    LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    ORDER BY uo.order_id DESC, g.game_name
+"""
+
+
+def game_page_query(platform, after_id, limit, join='LEFT JOIN'):
+    """
+    Build the keyset query for one page of active games' card columns (details cut to a preview).
+    Returns (query, params, limit); the query fetches one extra row to learn whether there is a next page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    conditions = ['g.retired_at IS NULL']
+    params = []
+    if platform:
+        conditions.append('g.platform = %s')
+        params.append(platform)
+    if after_id is not None:
+        conditions.append('g.game_id > %s')
+        params.append(int(after_id))
+    query = """
+        SELECT g.game_id, g.game_name, LEFT(g.details, {preview}) AS details,
+               g.platform, g.price, gi.games_count
+        FROM games g
+        {join} game_inventory gi ON g.game_id = gi.game_id
+        WHERE {where}
+        ORDER BY g.game_id
+        LIMIT %s
+    """.format(preview=DETAILS_PREVIEW, join=join, where=' AND '.join(conditions))
+    return query, params + [limit + 1], limit
+
+
+class MySql(StorageBackend):
+    errors = (mysql.connector.Error,)
+
+    def __init__(self, pool_size=POOL_SIZE, pool_timeout=POOL_TIMEOUT, health_check=POOL_HEALTH_CHECK,
+                 startup=STARTUP_MODE):
+        """
+        Initialize the MySql class and a pool of connections to the MySQL database.
+        Every method checks a connection out of the pool and returns it when done,
+        so one instance can be shared by all request threads.
+        """
+        self.profiler = QueryProfiler(slow_threshold_ms=SLOW_QUERY_MS)
+        self.pool = ConnectionPool(lambda: mysql.connector.connect(**DB_CONFIG),
+                                   size=pool_size, timeout=pool_timeout, health_check=health_check,
+                                   wrap=self.profiler.wrap, errors=self.errors)
+        self.replicas = self._create_replicas(REPLICA_ENDPOINTS, pool_size, pool_timeout, health_check)
+        # Per thread or asyncio task, like the request it belongs to
+        self._primary_until = contextvars.ContextVar('primary_until_{}'.format(id(self)), default=0)
+        self.catalog_cache = CatalogCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+        self.connect_ms = 0.0
+        self.startup_ms = 0.0
+        self.prepare_schema(startup)
+
+    def prepare_schema(self, mode):
+        """
+        Check the schema once against the fingerprint recorded by the last migration run.
+        When it is current no DDL runs; in 'auto' mode a stale or missing schema is bootstrapped.
+        Workers booting together take turns on the migration lock, and all but the first find
+        the schema current once they hold it.
+        """
+        if mode == 'skip':
+            return
+        start = time.perf_counter()
+        current = False
+        try:
+            cnx = self.pool.acquire()
+            self.connect_ms = 1000 * (time.perf_counter() - start)
+            try:
+                current = migrate.schema_is_current(cnx)
+            finally:
+                self.pool.release(cnx)
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_BAD_DB_ERROR:
+                print("Error checking schema: {}".format(e))
+                return
+
+        if not current:
+            if mode == 'auto':
+                self.bootstrap()
+            else:
+                print("Database schema is out of date; run `python migrate.py bootstrap`")
+        self.startup_ms = 1000 * (time.perf_counter() - start) - self.connect_ms
+        print("Schema check took {:.1f} ms (+{:.1f} ms connect)".format(self.startup_ms, self.connect_ms))
 
-class MySql:
-    def __init__(self):
+    def bootstrap(self):
         """
-        Initialize the MySql class and create a connection to the MySQL database.
+        Provision the database: create it if needed and apply every pending migration.
         """
-        self.connection = self.createConnection()
+        try:
+            self.createConnection().close()
+        except mysql.connector.Error as e:
+            print("Error creating MySQL connection: {}".format(e))
+            return
         self.create_tables()
-        self.create_triggers()
 
     @staticmethod
     def createConnection():
         """
-        Create a connection to the MySQL database.
+        Create a connection to the MySQL database, creating the database if needed.
         """
+        server_config = {key: value for key, value in DB_CONFIG.items() if key != 'database'}
+        cnx = mysql.connector.connect(**server_config)
+        myCursor = cnx.cursor()
+
+        # Create the database if it does not exist
         try:
-            # Attempt to connect to the database
-            cnx = mysql.connector.connect(user='root', password='root', host='127.0.0.1')
-            myCursor = cnx.cursor()
+            myCursor.execute('CREATE DATABASE IF NOT EXISTS {}'.format(DB_CONFIG['database']))
+        except mysql.connector.errors.DatabaseError:
+            pass
+        finally:
+            myCursor.close()
+            cnx.database = DB_CONFIG['database']
+        return cnx
 
-            # Create the database if it does not exist
-            try:
-                myCursor.execute('CREATE DATABASE IF NOT EXISTS projectDB')
-            except mysql.connector.errors.DatabaseError:
-                pass
-            finally:
-                # Connect to the database
-                cnx = mysql.connector.connect(user='root', password='root', host='127.0.0.1', database='projectDB')
-            return cnx
-        except mysql.connector.Error as err:
-            print("Error creating MySQL connection: {}".format(err))
+    def pool_stats(self):
+        """
+        Return connection pool usage (in use, waiting, wait times).
+        """
+        return self.pool.stats()
+
+    def _create_replicas(self, endpoints, pool_size, pool_timeout, health_check):
+        if not endpoints:
             return None
+        replicas = []
+        for host, port in endpoints:
+            config = dict(REPLICA_CONFIG, host=host, port=port)
+            pool = ConnectionPool(lambda config=config: mysql.connector.connect(**config),
+                                  size=pool_size, timeout=pool_timeout, health_check=health_check,
+                                  wrap=self.profiler.wrap, errors=self.errors)
+            replicas.append(Replica('{}:{}'.format(host, port), pool))
+        return ReplicaRouter(replicas, max_lag=REPLICA_MAX_LAG, retry_after=REPLICA_RETRY_AFTER)
 
-    def get_all_games(self):
-        try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = """
-                SELECT g.*, gi.games_count
-                FROM games g
-                JOIN game_inventory gi ON g.game_id = gi.game_id
-            """
-            cursor.execute(query)
-            result = cursor.fetchall()
+    def replica_stats(self):
+        """
+        Return replica health, lag and read counts, or None when no replicas are configured.
+        """
+        return self.replicas.stats() if self.replicas else None
+
+    def pin_primary(self, until):
+        """
+        Send this thread's (or task's) replica-eligible reads to the primary until `until` (a time.time()
+        timestamp). The web app calls this per request with the client's last write time.
+        """
+        self._primary_until.set(until)
+
+    def primary_pinned_until(self):
+        return self._primary_until.get()
+
+    def _reads_from_primary(self):
+        return self.replicas is None or self.primary_pinned_until() > time.time()
+
+    def _wrote(self):
+        # Let this thread (and, through the session, this client) read what it just wrote
+        if self.replicas:
+            self._primary_until.set(time.time() + STICKY_SECONDS)
+
+    def _read(self, read):
+        """
+        Run `read(cnx)` for a query that tolerates a few seconds of replication lag, on a healthy,
+        caught-up replica when there is one, otherwise on the primary, and return its result.
+        A replica that fails, whether handing out a connection or mid-query, is marked down and
+        the read is run again on the primary, so only a primary failure reaches the caller.
+        """
+        replica = None if self._reads_from_primary() else self.replicas.choose()
+        if replica is not None:
+            try:
+                with replica.pool.connection() as cnx:
+                    return read(cnx)
+            except FAILOVER_ERRORS as e:
+                self.replicas.mark_failed(replica, e)
+        with self.pool.connection() as cnx:
+            return read(cnx)
+
+    def _cached_read(self, key, loader):
+        """
+        Serve a replica-eligible read through the catalog cache, except while this thread is
+        pinned to the primary: a cached page may predate the client's own write.
+        """
+        if self.replicas and self._reads_from_primary():
+            return loader()
+        return self.catalog_cache.get_or_load(key, loader)
+
+    def get_catalog_version(self):
+        """
+        Return the catalog version counter, bumped by every change to games, stock or covers.
+        It is kept in the catalog cache, so other workers see a bump within the cache TTL, the
+        same window in which they may still serve the cached pages it describes. It is read from
+        the same server as the pages, so a lagging replica never pairs a new version with old rows.
+        """
+        return self._cached_read('version', self._load_catalog_version) or 0
+
+    def _load_catalog_version(self):
+        def read(cnx):
+            cursor = cnx.cursor()
+            cursor.execute(CATALOG_VERSION_QUERY)
+            row = cursor.fetchone()
             cursor.close()
-            return result
+            return row[0] if row else None
+
+        try:
+            return self._read(read)
         except mysql.connector.Error as e:
-            print("Error executing query: {}".format(e))
+            print("Error reading catalog version: {}".format(e))
             return None
 
-    def execute_sql_file(self, filename):
-        """
-        Execute SQL commands from a file.
-        """
-        try:
-            with open(filename, 'r') as file:
-                commands = file.read().split(';')
-                cursor = self.connection.cursor()
-
-                for command in commands:
-                    command = command.strip()
-                    if command:
-                        try:
-                            # Check if table already exists
-                            if command.startswith("CREATE TABLE"):
-                                table_name = command.split("CREATE TABLE")[1].split("(")[0].strip()
-                                cursor.execute("SHOW TABLES LIKE %s", (table_name,))
-                                if cursor.fetchone():
-                                    print("Table '{}' already exists. Skipping creation.".format(table_name))
-                                    continue
-
-                            cursor.execute(command)
-                            self.connection.commit()
-                        except mysql.connector.Error as err:
-                            print("Error executing command: {}".format(err))
-                            self.connection.rollback()
-        except IOError as e:
-            print("Error reading SQL file: {}".format(e))
+    def catalog_changed(self):
+        """
+        Bump the catalog version and drop this worker's cached catalog pages. The bump runs as its
+        own statement after the change has committed, so the counter row is only locked briefly.
+        The cache is dropped only once the bump has committed: dropping it earlier would let a
+        concurrent request re-cache the old version (and the pages keyed by it) for a full TTL.
+        """
+        self._wrote()
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+                cnx.commit()
+                cursor.close()
+        except mysql.connector.Error as e:
+            print("Error bumping catalog version: {}".format(e))
         finally:
-            cursor.close()
+            self.catalog_cache.invalidate()
 
-    def create_triggers(self):
+    def get_all_games(self, after_id=None, limit=PAGE_SIZE):
         """
-        Create triggers in the database.
+        Retrieve one page of games with inventory for the admin page, ordered by game_id.
+        Returns (games, next_after_id); next_after_id is None on the last page. None on error.
         """
-        try:
-            cursor = self.connection.cursor()
-            # Trigger to update game inventory after order is placed
-            cursor.execute("""
-                CREATE TRIGGER update_inventory_after_order
-                AFTER INSERT ON order_items
-                FOR EACH ROW
-                BEGIN
-                    UPDATE game_inventory
-                    SET games_count = games_count - 1
-                    WHERE game_id = NEW.game_id;
-                END
-            """)
-
-            # Trigger to check inventory before placing order
-            cursor.execute("""
-                CREATE TRIGGER check_inventory_before_order
-                BEFORE INSERT ON order_items
-                FOR EACH ROW
-                BEGIN
-                    DECLARE available_count INT;
-                    SELECT games_count INTO available_count
-                    FROM game_inventory
-                    WHERE game_id = NEW.game_id;
-
-                    IF available_count <= 0 THEN
-                        SIGNAL SQLSTATE '45000'
-                        SET MESSAGE_TEXT = 'Game is out of stock';
-                    END IF;
-                END
-            """)
-
-            self.connection.commit()
+        return self._load_game_page(None, after_id, limit, join='JOIN')
+
+    def _load_game_page(self, platform, after_id, limit, join='LEFT JOIN'):
+        """
+        Keyset-paginate the card columns of active games (details cut to a preview) by game_id.
+        """
+        query, params, limit = game_page_query(platform, after_id, limit, join)
+        def read(cnx):
+            cursor = cnx.cursor(dictionary=True)
+            cursor.execute(query, params)
+            result = cursor.fetchall()
             cursor.close()
+            return split_page(result, limit, 'game_id')
+
+        try:
+            return self._read(read)
         except mysql.connector.Error as e:
-            print("Error creating triggers:", e)
-            self.connection.rollback()
+            print("Error executing query: {}".format(e))
+            return None
 
     def create_tables(self):
         """
-        Create tables by executing SQL commands from a file.
+        Bring the schema up to date by applying pending migrations from migrations/.
         """
-        self.execute_sql_file('tables.sql')
+        try:
+            with self.pool.connection() as cnx:
+                for name in migrate.apply_migrations(cnx):
+                    print("Applied migration {}".format(name))
+        except (mysql.connector.Error, IOError, migrate.MigrationLockTimeout) as e:
+            print("Error applying migrations: {}".format(e))
 
-    def get_games_by_platform(self, platform=None):
+    def get_games_by_platform(self, platform=None, after_id=None, limit=PAGE_SIZE):
         """
-        Retrieve games based on the specified platform, including games_count.
+        Retrieve one page of games for the specified platform, including games_count.
+        Returns (games, next_after_id); next_after_id is None on the last page. None on error,
+        so a failed read is never mistaken for (and cached as) an empty catalog.
+        Pages are served from the catalog cache; writes to games or inventory invalidate it.
+        """
+        key = (platform.lower() if platform else None, after_id, limit)
+        return self._cached_read(key, lambda: self._load_game_page(platform, after_id, limit))
+
+    def search_games(self, text, page=1, limit=PAGE_SIZE):
         """
+        Full-text search over name, developer, publisher and details, best matches first.
+        Every word is prefix-matched so partial input works. Returns (games, next_page), or None on error.
+        """
+        terms = fulltext_terms(text)
+        if not terms:
+            return [], None
+        page = max(1, int(page))
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        key = ('search', terms, page, limit)
+        return self._cached_read(key, lambda: self._search_games(terms, page, limit))
+
+    def _search_games(self, terms, page, limit):
+        def read(cnx):
+            cursor = cnx.cursor(dictionary=True)
+            query = """
+                SELECT g.game_id, g.game_name, LEFT(g.details, {preview}) AS details,
+                       g.platform, g.price, gi.games_count,
+                       MATCH (g.game_name, g.developer, g.publisher, g.details)
+                           AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM games g
+                LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+                WHERE MATCH (g.game_name, g.developer, g.publisher, g.details) AGAINST (%s IN BOOLEAN MODE)
+                  AND g.retired_at IS NULL
+                ORDER BY score DESC, g.game_id
+                LIMIT %s OFFSET %s
+            """.format(preview=DETAILS_PREVIEW)
+            cursor.execute(query, (terms, terms, limit + 1, (page - 1) * limit))
+            result = cursor.fetchall()
+            cursor.close()
+            if len(result) > limit:
+                return result[:limit], page + 1
+            return result, None
+
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            if platform:
-                query = """
-                    SELECT g.*, gi.games_count
-                    FROM games g
-                    LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
-                    WHERE platform = %s
-                """
-                cursor.execute(query, (platform,))
-            else:
-                query = """
-                    SELECT g.*, gi.games_count
-                    FROM games g
-                    LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
-                """
-                cursor.execute(query)
+            return self._read(read)
+        except mysql.connector.Error as e:
+            print("Error searching games: {}".format(e))
+            return None
+
+    def suggest_games(self, text, limit=8):
+        """
+        Typeahead: games whose name has words starting with the typed words.
+        """
+        terms = fulltext_terms(text)
+        if not terms:
+            return []
+        key = ('suggest', terms, limit)
+        return self._cached_read(key, lambda: self._suggest_games(terms, limit)) or []
+
+    def _suggest_games(self, terms, limit):
+        def read(cnx):
+            cursor = cnx.cursor(dictionary=True)
+            query = """
+                SELECT game_id, game_name, platform
+                FROM games
+                WHERE MATCH (game_name) AGAINST (%s IN BOOLEAN MODE) AND retired_at IS NULL
+                ORDER BY MATCH (game_name) AGAINST (%s IN BOOLEAN MODE) DESC, game_name
+                LIMIT %s
+            """
+            cursor.execute(query, (terms, terms, limit))
             result = cursor.fetchall()
             cursor.close()
             return result
+
+        try:
+            return self._read(read)
         except mysql.connector.Error as e:
-            print("Error executing query: {}".format(e))
+            print("Error suggesting games: {}".format(e))
             return None
 
     def get_game_by_id(self, game_id):
         """
         Retrieve a game by its ID, including games_count.
         """
-        try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = """
-                SELECT g.*, gi.games_count
-                FROM games g
-                LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
-                WHERE g.game_id = %s
-            """
-            cursor.execute(query, (game_id,))
+        def read(cnx):
+            cursor = cnx.cursor(dictionary=True)
+            cursor.execute(GAME_BY_ID_QUERY, (game_id,))
             result = cursor.fetchone()
             cursor.close()
             return result
+
+        try:
+            return self._read(read)
         except mysql.connector.Error as e:
             print("Error executing query: {}".format(e))
             return None
@@ -182,45 +492,93 @@ class MySql:
         Retrieve a user by their ID.
         """
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = "SELECT * FROM users WHERE user_id = %s"
-            cursor.execute(query, (user_id,))
-            result = cursor.fetchone()
-            cursor.close()
-            return result
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                query = "SELECT * FROM users WHERE user_id = %s"
+                cursor.execute(query, (user_id,))
+                result = cursor.fetchone()
+                cursor.close()
+                return result
         except mysql.connector.Error as e:
             print("Error executing query: {}".format(e))
             return None
 
-    def authenticate_user(self, username, password):
+    def get_user_profile(self, user_id):
         """
-        Authenticate a user based on their username and password.
+        Retrieve the displayable fields of a user (everything but the password hash).
         """
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = "SELECT * FROM users WHERE username = %s"
-            cursor.execute(query, (username,))
-            user = cursor.fetchone()
-            cursor.close()
-            if user and check_password_hash(user['password_hash'], password):
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                cursor.execute(USER_PROFILE_QUERY, (user_id,))
+                result = cursor.fetchone()
+                cursor.close()
+                return result
+        except mysql.connector.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    def update_user(self, user_id, email, phone, address):
+        """
+        Update a user's contact details.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                query = "UPDATE users SET email = %s, phone = %s, address = %s WHERE user_id = %s"
+                cursor.execute(query, (email, phone, address, user_id))
+                cnx.commit()
+                cursor.close()
+                return True
+        except mysql.connector.Error as e:
+            print("Error updating user: {}".format(e))
+            return False
+
+    def get_login(self, username):
+        """
+        Retrieve just what a login needs (user_id, username, password_hash) for a username.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                query = "SELECT user_id, username, password_hash FROM users WHERE username = %s"
+                cursor.execute(query, (username,))
+                user = cursor.fetchone()
+                cursor.close()
                 return user
         except mysql.connector.Error as e:
-            print("Error authenticating user: {}".format(e))
-        return None
+            print("Error reading login: {}".format(e))
+            return None
+
+    def update_password_hash(self, user_id, password_hash):
+        """
+        Replace a user's password hash (e.g. after the hash cost was raised).
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("UPDATE users SET password_hash = %s WHERE user_id = %s", (password_hash, user_id))
+                cnx.commit()
+                cursor.close()
+                return True
+        except mysql.connector.Error as e:
+            print("Error updating password hash: {}".format(e))
+            return False
 
     def get_user_by_username(self, username):
         """
         Retrieve a user by their username.
         """
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = 'SELECT * FROM users WHERE username = %s'
-            cursor.execute(query, (username,))
-            user = cursor.fetchone()
-            cursor.close()
-            if user:
-                return user
-            return False
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                query = 'SELECT * FROM users WHERE username = %s'
+                cursor.execute(query, (username,))
+                user = cursor.fetchone()
+                cursor.close()
+                if user:
+                    return user
+                return False
 
         except mysql.connector.Error as e:
             print("Error executing query: {}".format(e))
@@ -228,74 +586,207 @@ class MySql:
 
     def create_user(self, user):
         """
-        Create a new user.
+        Create a new user and return its user_id; raises AccountExists if the username or email is taken.
         """
         try:
-            cursor = self.connection.cursor()
-            query = 'INSERT INTO users (username, password_hash, phone, address, email) VALUES(%s, %s, %s, %s, %s)'
-            cursor.execute(query, (user[0], user[1], user[2], user[3], user[4],))
-            self.connection.commit()
-
-            # Check if user was successfully created
-            query = 'SELECT * FROM users WHERE username = %s'
-            cursor.execute(query, (user[0],))
-            created_user = cursor.fetchone()
-            cursor.close()
-
-            if created_user:
-                return True
-            return False
-
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                query = 'INSERT INTO users (username, password_hash, phone, address, email) VALUES(%s, %s, %s, %s, %s)'
+                cursor.execute(query, (user[0], user[1], user[2], user[3], user[4],))
+                user_id = cursor.lastrowid
+                cnx.commit()
+                cursor.close()
+                return user_id
         except mysql.connector.Error as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                # "Duplicate entry 'x' for key 'users.email'" (8.0.19+) or "... for key 'email'"
+                key = DUP_KEY.search(e.msg or '')
+                raise AccountExists('email' if key and key.group(1) == 'email' else 'username')
             print("Error executing query: {}".format(e))
-            return False
+            return None
 
     def add_game_to_bought(self, game_id, user_id):
         """
         Add a game to the user's bought games.
         """
+        order, out_of_stock = self.checkout(user_id, [game_id])
+        if out_of_stock:
+            print("Error adding game to bought: game {} is out of stock".format(game_id))
+        return order['order_id'] if order else False
+
+    def checkout(self, user_id, game_ids):
+        """
+        Buy several games as one order in a single transaction.
+
+        Stock is reserved for every game with one conditional UPDATE (see inventory.reserve),
+        and all order items are inserted with one executemany and committed together with the
+        user's profile summary; deadlocks are retried with backoff. Returns (order, out_of_stock):
+        `order` is a dict with order_id, date_order and the purchased items (None if nothing was
+        bought), and `out_of_stock` lists the game_ids that are unavailable, in which case
+        nothing is bought.
+        """
+        game_ids = list(dict.fromkeys(int(game_id) for game_id in game_ids))
+        if not game_ids:
+            return None, []
         try:
-            cursor = self.connection.cursor()
-            query = 'INSERT INTO user_orders (date_order, user_id) VALUES (CURDATE(), %s)'
-            cursor.execute(query, (user_id,))
+            with self.pool.connection() as cnx:
+                def place_order():
+                    try:
+                        return self._place_order(cnx, user_id, game_ids)
+                    except mysql.connector.Error:
+                        cnx.rollback()
+                        raise
+
+                order, out_of_stock = inventory.run_with_retry(place_order)
+            if order:
+                self.catalog_changed()
+            return order, out_of_stock
+        except mysql.connector.Error as e:
+            print("Error checking out order: {}".format(e))
+            return None, []
+
+    @staticmethod
+    def _place_order(cnx, user_id, game_ids):
+        quantities = {game_id: 1 for game_id in game_ids}
+        cursor = cnx.cursor()
+        try:
+            if not inventory.reserve(cursor, quantities):
+                cnx.rollback()
+                return None, inventory.shortages(cursor, quantities)
+
+            details = cnx.cursor(dictionary=True)
+            query = """
+                SELECT game_id, game_name, developer, publisher, platform, price
+                FROM games
+                WHERE game_id IN ({})
+            """.format(', '.join(['%s'] * len(game_ids)))
+            details.execute(query, game_ids)
+            games = {row['game_id']: row for row in details.fetchall()}
+            details.close()
+
+            date_order = datetime.date.today()
+            query = 'INSERT INTO user_orders (date_order, user_id) VALUES (%s, %s)'
+            cursor.execute(query, (date_order, user_id))
             order_id = cursor.lastrowid
 
-            query = 'INSERT INTO order_items (order_id, game_id) VALUES (%s, %s)'
-            cursor.execute(query, (order_id, game_id))
+            # Record the price paid, so sales figures survive later price changes
+            query = 'INSERT INTO order_items (order_id, game_id, price) VALUES (%s, %s, %s)'
+            cursor.executemany(query, [(order_id, game_id, games[game_id]['price']) for game_id in game_ids])
 
-            self.connection.commit()
+            # Games the user already owned from earlier orders do not add to games_owned
+            query = """
+                INSERT INTO user_summary (user_id, orders, games_owned, total_spent, last_order_id)
+                VALUES (%s, 1, %s - (
+                    SELECT COUNT(DISTINCT oi.game_id)
+                    FROM user_orders uo
+                    JOIN order_items oi ON oi.order_id = uo.order_id
+                    WHERE uo.user_id = %s AND uo.order_id <> %s AND oi.game_id IN ({})
+                ), %s, %s)
+                ON DUPLICATE KEY UPDATE orders = orders + 1, games_owned = games_owned + VALUES(games_owned),
+                                        total_spent = total_spent + VALUES(total_spent),
+                                        last_order_id = VALUES(last_order_id)
+            """.format(', '.join(['%s'] * len(game_ids)))
+            total = sum(games[game_id]['price'] for game_id in game_ids)
+            cursor.execute(query, [user_id, len(game_ids), user_id, order_id] + game_ids + [total, order_id])
+
+            cnx.commit()
+            items = [games[game_id] for game_id in game_ids]
+            return {'order_id': order_id, 'date_order': date_order, 'items': items}, []
+        finally:
             cursor.close()
-            return order_id
-        except mysql.connector.Error as e:
-            print("Error adding game to bought: {}".format(e))
-            self.connection.rollback()
-            return False
 
-    def get_owned_games(self, user_id):
-        try:
-            cursor = self.connection.cursor(dictionary=True)
+    def get_games_by_ids(self, game_ids):
+        """
+        Retrieve several games (e.g. a cart) with one query, in the order given.
+        """
+        game_ids = [int(game_id) for game_id in game_ids]
+        if not game_ids:
+            return []
+        def read(cnx):
+            cursor = cnx.cursor(dictionary=True)
             query = """
-                SELECT g.*
+                SELECT g.game_id, g.game_name, g.platform, g.price, gi.games_count
                 FROM games g
-                JOIN (
-                    SELECT oi.game_id
-                    FROM order_items oi
-                    JOIN user_orders uo ON oi.order_id = uo.order_id
-                    WHERE uo.user_id = %s
-                ) AS user_games ON g.game_id = user_games.game_id
-            """
+                LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+                WHERE g.game_id IN ({})
+            """.format(', '.join(['%s'] * len(game_ids)))
+            cursor.execute(query, game_ids)
+            games = {row['game_id']: row for row in cursor.fetchall()}
+            cursor.close()
+            return [games[game_id] for game_id in game_ids if game_id in games]
+
+        try:
+            return self._read(read)
+        except mysql.connector.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    def get_profile(self, user_id, before_order_id=None, library_after=None, order_limit=ORDER_PAGE_SIZE,
+                    library_limit=PAGE_SIZE):
+        """
+        Retrieve what the profile page shows, on one pooled connection: the user's summary
+        (orders, games owned, total spent), one page of their library and one page of their
+        order history. Each page is a single keyset-paginated query.
 
-            # Execute the query with user_id as a parameter
-            cursor.execute(query, (user_id,))
+        Returns a dict with 'summary', 'library', 'next_library_after', 'orders' and
+        'next_before_order_id'; each order has order_id, date_order, items and total.
+        """
+        before, after, order_limit, library_limit = profile_limits(before_order_id, library_after, order_limit,
+                                                                   library_limit)
+        def read(cnx):
+            cursor = cnx.cursor(dictionary=True)
+            cursor.execute(USER_SUMMARY_QUERY, (user_id,))
+            summary = cursor.fetchone()
+            cursor.execute(LIBRARY_PAGE_QUERY, (user_id, after, library_limit + 1))
+            library = cursor.fetchall()
+            cursor.execute(ORDER_HISTORY_QUERY, (user_id, before, order_limit + 1))
+            order_rows = cursor.fetchall()
+            cursor.close()
+            return build_profile(summary, library, order_rows, order_limit, library_limit)
 
-            # Fetch all rows
-            owned_games = cursor.fetchall()
+        try:
+            return self._read(read)
+        except mysql.connector.Error as e:
+            print("Error fetching profile: {}".format(e))
+            return None
 
-            # Close the cursor and connection
+    def rebuild_user_summaries(self, user_ids=None, batch_size=1000):
+        """
+        Recompute profile summaries from the orders table, for the given users or everyone
+        (e.g. after orders were loaded in bulk). Returns the number of users processed, or None on error.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                if user_ids is None:
+                    cursor.execute("SELECT user_id FROM users")
+                    user_ids = [row[0] for row in cursor.fetchall()]
+                user_ids = [int(user_id) for user_id in user_ids]
+                for start in range(0, len(user_ids), batch_size):
+                    batch = user_ids[start:start + batch_size]
+                    cursor.execute(USER_SUMMARY_REBUILD.format(', '.join(['%s'] * len(batch))), batch)
+                    cnx.commit()
+                cursor.close()
+                return len(user_ids)
+        except mysql.connector.Error as e:
+            print("Error rebuilding user summaries: {}".format(e))
+            return None
+
+    def get_owned_game_ids(self, user_id):
+        """
+        Retrieve the set of game_ids owned by a user with a single query.
+        """
+        def read(cnx):
+            cursor = cnx.cursor()
+            cursor.execute(OWNED_GAME_IDS_QUERY, (user_id,))
+            owned_game_ids = {row[0] for row in cursor.fetchall()}
             cursor.close()
-            return owned_games
+            return owned_game_ids
+
+        try:
+            return self._read(read)
         except mysql.connector.Error as e:
-            print(f"Error fetching owned games: {e}")
+            print(f"Error fetching owned game ids: {e}")
             return None
 
     def get_order_details(self, order_id):
@@ -303,72 +794,257 @@ class MySql:
         Retrieve details about a specific order including the game and user details.
         """
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = """
-                SELECT uo.order_id, uo.date_order, u.user_id, u.username, u.phone, u.address, u.email,
-                       g.*, oi.order_id AS oi_order_id
-                FROM user_orders uo
-                JOIN order_items oi ON uo.order_id = oi.order_id
-                JOIN games g ON oi.game_id = g.game_id
-                JOIN users u ON uo.user_id = u.user_id
-                WHERE uo.order_id = %s
-            """
-            cursor.execute(query, (order_id,))
-            order_details = cursor.fetchall()
-            cursor.close()
-            return order_details
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                query = """
+                    SELECT uo.order_id, uo.date_order, u.user_id, u.username, u.phone, u.address, u.email,
+                           g.*, oi.order_id AS oi_order_id
+                    FROM user_orders uo
+                    JOIN order_items oi ON uo.order_id = oi.order_id
+                    JOIN games g ON oi.game_id = g.game_id
+                    JOIN users u ON uo.user_id = u.user_id
+                    WHERE uo.order_id = %s
+                    ORDER BY g.game_name
+                """
+                cursor.execute(query, (order_id,))
+                order_details = cursor.fetchall()
+                cursor.close()
+                return order_details
         except mysql.connector.Error as e:
             print("Error fetching order details:", e)
             return None
 
-    def delete_game(self, game_id):
+    def retire_games(self, game_ids):
+        """
+        Soft-delete games: they disappear from listings, search and sale (stock is zeroed, so
+        checkout reports them out of stock), while orders, libraries and sales history keep them.
+        Two set-based UPDATEs in one short transaction, however many games or orders there are.
+        Returns the number of games retired.
+        """
+        game_ids = list(dict.fromkeys(int(game_id) for game_id in game_ids))
+        if not game_ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(game_ids))
         try:
-            cursor = self.connection.cursor()
-
-            # Retrieve order_ids associated with the game_id
-            cursor.execute("SELECT order_id FROM order_items WHERE game_id = %s", (game_id,))
-            order_ids = cursor.fetchall()
-
-            # Delete game references from order_items table
-            cursor.execute("DELETE FROM order_items WHERE game_id = %s", (game_id,))
-
-            # Delete corresponding order_ids from user_orders table
-            for order_id in order_ids:
-                cursor.execute("DELETE FROM user_orders WHERE order_id = %s", (order_id[0],))
-
-            # Delete game from game_inventory table
-            cursor.execute("DELETE FROM game_inventory WHERE game_id = %s", (game_id,))
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("UPDATE games SET retired_at = NOW() WHERE game_id IN ({}) AND retired_at IS NULL"
+                               .format(placeholders), game_ids)
+                retired = cursor.rowcount
+                cursor.execute("UPDATE game_inventory SET games_count = 0 WHERE game_id IN ({})".format(placeholders),
+                               game_ids)
+                cnx.commit()
+                cursor.close()
+            self.catalog_changed()
+            return retired
+        except mysql.connector.Error as e:
+            print("Error retiring games: {}".format(e))
+            return None
 
-            # Finally, delete game from games table
-            cursor.execute("DELETE FROM games WHERE game_id = %s", (game_id,))
+    def delete_game(self, game_id, chunk_size=DELETE_CHUNK_SIZE):
+        """
+        Permanently delete a game together with every order that contains it.
 
-            # Commit changes
-            self.connection.commit()
-            cursor.close()
+        The game is retired first so no new orders for it can appear, then its orders are
+        deleted `chunk_size` at a time, each chunk in its own transaction so locks are held
+        only briefly; ON DELETE CASCADE removes their order_items. Deleting the game row
+        finally cascades to game_inventory and game_covers.
+        """
+        if self.retire_games([game_id]) is None:
+            return False
+        try:
+            with self.pool.connection() as cnx:
+                while self._delete_order_chunk(cnx, game_id, chunk_size):
+                    pass
+                cursor = cnx.cursor()
+                cursor.execute("DELETE FROM games WHERE game_id = %s", (game_id,))
+                cnx.commit()
+                cursor.close()
+            self.catalog_changed()
             return True
         except mysql.connector.Error as e:
             print("Error deleting game:", e)
-            self.connection.rollback()
             return False
 
+    @staticmethod
+    def _delete_order_chunk(cnx, game_id, chunk_size):
+        """
+        Delete up to `chunk_size` orders containing the game in one transaction, recomputing
+        the profile summaries of their owners. Returns how many orders were deleted.
+        """
+        cursor = cnx.cursor()
+        try:
+            cursor.execute("""
+                SELECT oi.order_id, uo.user_id
+                FROM order_items oi
+                JOIN user_orders uo ON uo.order_id = oi.order_id
+                WHERE oi.game_id = %s
+                LIMIT %s
+            """, (game_id, chunk_size))
+            rows = cursor.fetchall()
+            order_ids = [row[0] for row in rows]
+            user_ids = sorted({row[1] for row in rows if row[1] is not None})
+            if order_ids:
+                cursor.execute("DELETE FROM user_orders WHERE order_id IN ({})"
+                               .format(', '.join(['%s'] * len(order_ids))), order_ids)
+            if user_ids:
+                cursor.execute(USER_SUMMARY_REBUILD.format(', '.join(['%s'] * len(user_ids))), user_ids)
+            cnx.commit()
+            return len(order_ids)
+        finally:
+            cursor.close()
+
     def add_game_to_list(self, game):
         try:
-            cursor = self.connection.cursor()
-            query = """INSERT INTO 
-            games (game_name, details, developer, publisher, platform, price) 
-            VALUES (%s, %s, %s, %s, %s, %s)"""
-            cursor.execute(query, (game[0], game[1], game[2], game[3], game[4], game[5],))
-            game_id = cursor.lastrowid
-            # Insert game count into game_inventory table
-            query = """
-                        INSERT INTO game_inventory (game_id, games_count)
-                        VALUES (%s, %s)
-                    """
-            cursor.execute(query, (game_id, game[6]))
-            self.connection.commit()
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                query = """INSERT INTO 
+                games (game_name, details, developer, publisher, platform, price) 
+                VALUES (%s, %s, %s, %s, %s, %s)"""
+                cursor.execute(query, (game[0], game[1], game[2], game[3], game[4], game[5],))
+                game_id = cursor.lastrowid
+                # Insert game count into game_inventory table
+                query = """
+                            INSERT INTO game_inventory (game_id, games_count)
+                            VALUES (%s, %s)
+                        """
+                cursor.execute(query, (game_id, game[6]))
+                cnx.commit()
+                cursor.close()
+            self.catalog_changed()
+            return game_id
+        except mysql.connector.Error as e:
+            print("Error adding game: ", e)
+            return False
+
+    def refresh_sales_rollups(self, rebuild=False):
+        """
+        Fold new orders into the sales rollups (recomputing them from scratch with `rebuild`).
+        Returns the number of orders processed.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                if rebuild:
+                    analytics.reset(cnx)
+                return analytics.refresh(cnx)
+        except mysql.connector.Error as e:
+            print("Error refreshing sales rollups: {}".format(e))
+            return None
+
+    def get_sales_dashboard(self, days=30, top=10, low_stock=LOW_STOCK_THRESHOLD):
+        """
+        Read the admin dashboard from the rollup tables: totals and per-platform figures, the
+        last `days` days, the `top` games by revenue and games with at most `low_stock` copies left.
+        Every query is a primary-key or index range over precomputed rows, never the order history.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                cursor.execute("SELECT platform, units, revenue FROM sales_by_platform ORDER BY revenue DESC")
+                platforms = cursor.fetchall()
+
+                cursor.execute("""
+                    SELECT day, orders, units, revenue FROM sales_by_day
+                    WHERE day > CURDATE() - INTERVAL %s DAY
+                    ORDER BY day DESC
+                """, (days,))
+                daily = cursor.fetchall()
+
+                cursor.execute("""
+                    SELECT s.game_id, g.game_name, g.platform, s.units, s.revenue, s.last_sold
+                    FROM sales_by_game s
+                    JOIN games g ON g.game_id = s.game_id
+                    ORDER BY s.revenue DESC
+                    LIMIT %s
+                """, (top,))
+                top_games = cursor.fetchall()
+
+                cursor.execute("""
+                    SELECT g.game_id, g.game_name, g.platform, gi.games_count
+                    FROM game_inventory gi
+                    JOIN games g ON g.game_id = gi.game_id
+                    WHERE gi.games_count <= %s AND g.retired_at IS NULL
+                    ORDER BY gi.games_count, gi.game_id
+                    LIMIT 50
+                """, (low_stock,))
+                low_stock_games = cursor.fetchall()
+
+                cursor.execute("SELECT last_order_id, refreshed_at FROM sales_rollup_state WHERE id = 1")
+                state = cursor.fetchone() or {'last_order_id': 0, 'refreshed_at': None}
+                cursor.close()
+        except mysql.connector.Error as e:
+            print("Error loading sales dashboard: {}".format(e))
+            return None
+
+        return {
+            'units': sum(row['units'] for row in platforms),
+            'revenue': sum(row['revenue'] for row in platforms),
+            'platforms': platforms,
+            'daily': daily,
+            'top_games': top_games,
+            'low_stock': low_stock_games,
+            'low_stock_threshold': low_stock,
+            'last_order_id': state['last_order_id'],
+            'refreshed_at': state['refreshed_at'],
+        }
+
+    def get_cover_map(self, game_ids):
+        """
+        Return {game_id: {(variant, format): filename}} for the processed covers of `game_ids`.
+        A page of cards is looked up with one query and kept in the catalog cache, so templates
+        never query per card and a catalog change only costs re-reading the covers on screen.
+        """
+        game_ids = sorted({int(game_id) for game_id in game_ids})
+        if not game_ids:
+            return {}
+        return self._cached_read(('covers', tuple(game_ids)), lambda: self._load_cover_map(game_ids)) or {}
+
+    def _load_cover_map(self, game_ids):
+        def read(cnx):
+            cursor = cnx.cursor()
+            cursor.execute(COVER_MAP_QUERY.format(', '.join(['%s'] * len(game_ids))), game_ids)
+            cover_map = cover_map_from_rows(cursor.fetchall())
             cursor.close()
+            return cover_map
+
+        try:
+            return self._read(read)
+        except mysql.connector.Error as e:
+            print("Error fetching cover variants: {}".format(e))
+            return None
+
+    def set_cover_variants(self, game_id, variants):
+        """
+        Record the generated (variant, format, filename, width, height, bytes) files for a game.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                query = """
+                    REPLACE INTO game_covers (game_id, variant, format, path, width, height, bytes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """
+                cursor.executemany(query, [(game_id,) + tuple(variant) for variant in variants])
+                cnx.commit()
+                cursor.close()
+            # New variants change the rendered cards
+            self.catalog_changed()
             return True
         except mysql.connector.Error as e:
-            print("Error adding game: ", e)
-            self.connection.rollback()
+            print("Error saving cover variants: {}".format(e))
             return False
+
+    def get_game_names(self):
+        """
+        Retrieve the id and name of every game.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(dictionary=True)
+                cursor.execute("SELECT game_id, game_name FROM games ORDER BY game_id")
+                result = cursor.fetchall()
+                cursor.close()
+                return result
+        except mysql.connector.Error as e:
+            print("Error executing query: {}".format(e))
+            return []
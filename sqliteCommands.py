@@ -0,0 +1,1034 @@
+"""
+Embedded SQLite implementation of storageBackend.StorageBackend (DB_BACKEND=sqlite).
+
+It needs no database server, so tests, benchmarks and read-mostly edge nodes can run the whole
+storefront against a local file. The database runs in WAL mode: readers never block the writer
+or each other, and each pooled connection keeps up to SQLITE_STATEMENT_CACHE prepared statements,
+so the fixed query strings below are compiled once per connection. Writes take the database
+write lock up front (BEGIN IMMEDIATE), which serializes them, and stock is reserved with the
+same conditional decrement as MySQL (inventory.reserve), backed by a CHECK constraint.
+
+The schema mirrors the state migrations/ produce on MySQL, with an FTS5 index in place of the
+FULLTEXT indexes; SCHEMA_VERSION is the number of the migration it matches.
+"""
+import datetime
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+import inventory
+from analytics import LOW_STOCK_THRESHOLD
+from catalogCache import CatalogCache
+from connectionPool import ConnectionPool
+from queryProfiler import QueryProfiler
+from storageBackend import (CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL, DELETE_CHUNK_SIZE, DETAILS_PREVIEW, MAX_PAGE_SIZE,
+                            ORDER_PAGE_SIZE, PAGE_SIZE, POOL_SIZE, POOL_TIMEOUT, SLOW_QUERY_MS, STARTUP_MODE,
+                            AccountExists, StorageBackend, build_profile, cover_map_from_rows, profile_limits,
+                            split_page)
+
+# ':memory:' gives every connection its own database, so it is limited to a pool of one
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join('instance', 'gamestore.db'))
+# Prepared statements kept per connection (sqlite3's LRU statement cache)
+SQLITE_STATEMENT_CACHE = int(os.environ.get('SQLITE_STATEMENT_CACHE', 256))
+# How long a writer waits for the write lock before giving up
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+
+SCHEMA_VERSION = 11
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+  game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  game_name VARCHAR(255) COLLATE NOCASE,
+  details TEXT,
+  developer VARCHAR(255) COLLATE NOCASE,
+  publisher VARCHAR(255) COLLATE NOCASE,
+  platform VARCHAR(255) COLLATE NOCASE,
+  price DECIMAL(4,2),
+  retired_at DATETIME
+);
+
+CREATE INDEX IF NOT EXISTS idx_games_platform ON games (platform, retired_at);
+
+CREATE TABLE IF NOT EXISTS users (
+  user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  username VARCHAR(255) COLLATE NOCASE UNIQUE,
+  phone VARCHAR(15),
+  address VARCHAR(255),
+  email VARCHAR(255) COLLATE NOCASE UNIQUE,
+  password_hash TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_orders (
+  order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  date_order DATE,
+  user_id INT REFERENCES users (user_id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_orders_user_id ON user_orders (user_id);
+
+-- Order numbers start where they do on MySQL (AUTO_INCREMENT = 140101)
+INSERT INTO sqlite_sequence (name, seq)
+SELECT 'user_orders', 140100 WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'user_orders');
+
+CREATE TABLE IF NOT EXISTS order_items (
+  order_id INT REFERENCES user_orders (order_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  game_id INT REFERENCES games (game_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  price DECIMAL(5,2),
+  PRIMARY KEY (order_id, game_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_items_game_id ON order_items (game_id);
+
+-- The CHECK is the backstop inventory.reserve's conditional decrement never trips
+CREATE TABLE IF NOT EXISTS game_inventory (
+  game_id INT PRIMARY KEY REFERENCES games (game_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  games_count INT CHECK (games_count >= 0)
+);
+
+CREATE INDEX IF NOT EXISTS idx_game_inventory_count ON game_inventory (games_count);
+
+CREATE TABLE IF NOT EXISTS game_covers (
+  game_id INT REFERENCES games (game_id) ON DELETE CASCADE ON UPDATE CASCADE,
+  variant VARCHAR(32),
+  format VARCHAR(8),
+  path VARCHAR(255),
+  width INT,
+  height INT,
+  bytes INT,
+  PRIMARY KEY (game_id, variant, format)
+);
+
+CREATE TABLE IF NOT EXISTS sales_by_game (
+  game_id INT PRIMARY KEY,
+  units INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+  last_sold DATE
+);
+
+CREATE INDEX IF NOT EXISTS idx_sales_by_game_revenue ON sales_by_game (revenue);
+
+CREATE TABLE IF NOT EXISTS sales_by_platform (
+  platform VARCHAR(255) COLLATE NOCASE PRIMARY KEY,
+  units INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_by_day (
+  day DATE PRIMARY KEY,
+  orders INT NOT NULL DEFAULT 0,
+  units INT NOT NULL DEFAULT 0,
+  revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sales_rollup_state (
+  id INT PRIMARY KEY,
+  last_order_id INT NOT NULL DEFAULT 0,
+  refreshed_at DATETIME
+);
+
+INSERT OR IGNORE INTO sales_rollup_state (id, last_order_id) VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+  id INT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 1
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1);
+
+CREATE TABLE IF NOT EXISTS user_summary (
+  user_id INT PRIMARY KEY REFERENCES users (user_id) ON DELETE CASCADE,
+  orders INT NOT NULL DEFAULT 0,
+  games_owned INT NOT NULL DEFAULT 0,
+  total_spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+  last_order_id INT
+);
+
+-- /search and /search/suggest; the triggers keep the index in step with games
+CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5(
+  game_name, developer, publisher, details, content='games', content_rowid='game_id'
+);
+
+CREATE TRIGGER IF NOT EXISTS games_fts_insert AFTER INSERT ON games BEGIN
+  INSERT INTO games_fts (rowid, game_name, developer, publisher, details)
+  VALUES (NEW.game_id, NEW.game_name, NEW.developer, NEW.publisher, NEW.details);
+END;
+
+CREATE TRIGGER IF NOT EXISTS games_fts_delete AFTER DELETE ON games BEGIN
+  INSERT INTO games_fts (games_fts, rowid, game_name, developer, publisher, details)
+  VALUES ('delete', OLD.game_id, OLD.game_name, OLD.developer, OLD.publisher, OLD.details);
+END;
+
+CREATE TRIGGER IF NOT EXISTS games_fts_update
+AFTER UPDATE OF game_name, developer, publisher, details ON games BEGIN
+  INSERT INTO games_fts (games_fts, rowid, game_name, developer, publisher, details)
+  VALUES ('delete', OLD.game_id, OLD.game_name, OLD.developer, OLD.publisher, OLD.details);
+  INSERT INTO games_fts (rowid, game_name, developer, publisher, details)
+  VALUES (NEW.game_id, NEW.game_name, NEW.developer, NEW.publisher, NEW.details);
+END;
+"""
+
+GAME_CARD_COLUMNS = """
+    g.game_id, g.game_name, substr(g.details, 1, {preview}) AS details, g.platform, g.price, gi.games_count
+""".format(preview=DETAILS_PREVIEW)
+
+GAME_BY_ID_QUERY = """
+    SELECT g.*, gi.games_count
+    FROM games g
+    LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+    WHERE g.game_id = ?
+"""
+
+USER_PROFILE_QUERY = "SELECT user_id, username, email, phone, address FROM users WHERE user_id = ?"
+
+OWNED_GAME_IDS_QUERY = """
+    SELECT DISTINCT oi.game_id
+    FROM order_items oi
+    JOIN user_orders uo ON oi.order_id = uo.order_id
+    WHERE uo.user_id = ?
+"""
+
+USER_SUMMARY_QUERY = "SELECT orders, games_owned, total_spent, last_order_id FROM user_summary WHERE user_id = ?"
+
+LIBRARY_PAGE_QUERY = """
+    SELECT g.game_id, g.game_name, g.platform, g.price
+    FROM games g
+    WHERE g.game_id IN (
+        SELECT oi.game_id
+        FROM user_orders uo
+        JOIN order_items oi ON oi.order_id = uo.order_id
+        WHERE uo.user_id = ?
+    ) AND g.game_id > ?
+    ORDER BY g.game_id
+    LIMIT ?
+"""
+
+ORDER_HISTORY_QUERY = """
+    SELECT uo.order_id, uo.date_order, oi.game_id, g.game_name, g.platform,
+           COALESCE(oi.price, g.price) AS "price [DECIMAL]"
+    FROM (
+        SELECT order_id, date_order
+        FROM user_orders
+        WHERE user_id = ? AND order_id < ?
+        ORDER BY order_id DESC
+        LIMIT ?
+    ) AS uo
+    LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    ORDER BY uo.order_id DESC, g.game_name
+"""
+
+USER_SUMMARY_REBUILD = """
+    INSERT INTO user_summary (user_id, orders, games_owned, total_spent, last_order_id)
+    SELECT u.user_id, COUNT(DISTINCT uo.order_id), COUNT(DISTINCT oi.game_id),
+           ROUND(COALESCE(SUM(COALESCE(oi.price, g.price, 0)), 0), 2), MAX(uo.order_id)
+    FROM users u
+    LEFT JOIN user_orders uo ON uo.user_id = u.user_id
+    LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE u.user_id IN ({})
+    GROUP BY u.user_id
+    ON CONFLICT (user_id) DO UPDATE SET orders = excluded.orders, games_owned = excluded.games_owned,
+                                        total_spent = excluded.total_spent, last_order_id = excluded.last_order_id
+"""
+
+# analytics.ROLLUP_QUERIES in SQLite's upsert syntax
+ROLLUP_QUERIES = [
+    """
+    INSERT INTO sales_by_game (game_id, units, revenue, last_sold)
+    SELECT oi.game_id, COUNT(*), ROUND(SUM(COALESCE(oi.price, g.price, 0)), 2), MAX(uo.date_order)
+    FROM user_orders uo
+    JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE uo.order_id > ? AND uo.order_id <= ?
+    GROUP BY oi.game_id
+    ON CONFLICT (game_id) DO UPDATE SET units = units + excluded.units,
+                                        revenue = ROUND(revenue + excluded.revenue, 2),
+                                        last_sold = MAX(COALESCE(last_sold, excluded.last_sold), excluded.last_sold)
+    """,
+    """
+    INSERT INTO sales_by_platform (platform, units, revenue)
+    SELECT COALESCE(g.platform, 'Unknown'), COUNT(*), ROUND(SUM(COALESCE(oi.price, g.price, 0)), 2)
+    FROM user_orders uo
+    JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE uo.order_id > ? AND uo.order_id <= ?
+    GROUP BY COALESCE(g.platform, 'Unknown')
+    ON CONFLICT (platform) DO UPDATE SET units = units + excluded.units,
+                                         revenue = ROUND(revenue + excluded.revenue, 2)
+    """,
+    """
+    INSERT INTO sales_by_day (day, orders, units, revenue)
+    SELECT uo.date_order, COUNT(DISTINCT uo.order_id), COUNT(oi.game_id),
+           ROUND(COALESCE(SUM(COALESCE(oi.price, g.price)), 0), 2)
+    FROM user_orders uo
+    LEFT JOIN order_items oi ON oi.order_id = uo.order_id
+    LEFT JOIN games g ON g.game_id = oi.game_id
+    WHERE uo.order_id > ? AND uo.order_id <= ? AND uo.date_order IS NOT NULL
+    GROUP BY uo.date_order
+    ON CONFLICT (day) DO UPDATE SET orders = orders + excluded.orders, units = units + excluded.units,
+                                    revenue = ROUND(revenue + excluded.revenue, 2)
+    """,
+]
+
+CENTS = Decimal('0.01')
+
+# Store prices as exact decimal text and dates in ISO format; read DECIMAL, DATE and DATETIME
+# columns (every one has two decimal places) back as the Decimal, date and datetime values
+# mysql.connector returns; "name [DECIMAL]" aliases convert computed columns too
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()).quantize(CENTS))
+sqlite3.register_converter('DATE', lambda value: datetime.date.fromisoformat(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.datetime.fromisoformat(value.decode()))
+
+
+class DictCursor(sqlite3.Cursor):
+    """
+    Cursor returning rows as dicts, like mysql.connector's cursor(dictionary=True).
+    """
+    def __init__(self, cnx):
+        super().__init__(cnx)
+        self.row_factory = lambda cursor, row: {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def fts_terms(text, max_terms=8):
+    """
+    Turn free text into an FTS5 query requiring every word as a prefix, e.g. 'zel bre' -> '"zel"* "bre"*'.
+    Only word characters are kept, each word quoted, so user input cannot change the query syntax.
+    """
+    words = [word.lower() for word in re.findall(r'\w+', text or '')]
+    return ' '.join('"{}"*'.format(word) for word in words[:max_terms])
+
+
+def placeholders(values):
+    return ', '.join(['?'] * len(values))
+
+
+class SQLite(StorageBackend):
+    placeholder = '?'
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path=SQLITE_PATH, pool_size=POOL_SIZE, pool_timeout=POOL_TIMEOUT, startup=STARTUP_MODE):
+        """
+        Open the database file at `path` (created if missing) behind a pool of connections that
+        any thread may use, so one instance is shared by all request threads like MySql.
+        """
+        self.path = path
+        if path == ':memory:':
+            pool_size = 1
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.profiler = QueryProfiler(slow_threshold_ms=SLOW_QUERY_MS)
+        # sqlite3 connections cannot drop like a server's, so there is nothing to health-check
+        self.pool = ConnectionPool(self.createConnection, size=pool_size, timeout=pool_timeout, health_check=False,
+                                   wrap=self.profiler.wrap, errors=self.errors)
+        self.catalog_cache = CatalogCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+        self.connect_ms = 0.0
+        self.startup_ms = 0.0
+        self.prepare_schema(startup)
+
+    def createConnection(self):
+        """
+        Open a connection in autocommit mode (transactions are explicit) with WAL journaling,
+        foreign keys enforced and a statement cache of SQLITE_STATEMENT_CACHE entries.
+        """
+        cnx = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False,
+                              detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                              cached_statements=SQLITE_STATEMENT_CACHE)
+        cnx.execute('PRAGMA journal_mode = WAL')
+        # In WAL mode a commit survives an application crash without an fsync; only power loss can undo it
+        cnx.execute('PRAGMA synchronous = NORMAL')
+        cnx.execute('PRAGMA foreign_keys = ON')
+        return cnx
+
+    def prepare_schema(self, mode):
+        """
+        Compare the file's user_version with SCHEMA_VERSION; in 'auto' mode a stale or new
+        database is brought up to date.
+        """
+        if mode == 'skip':
+            return
+        start = time.perf_counter()
+        try:
+            with self.pool.connection() as cnx:
+                self.connect_ms = 1000 * (time.perf_counter() - start)
+                cursor = cnx.cursor()
+                cursor.execute('PRAGMA user_version')
+                current = cursor.fetchone()[0] == SCHEMA_VERSION
+                cursor.close()
+        except sqlite3.Error as e:
+            print("Error checking schema: {}".format(e))
+            return
+
+        if not current:
+            if mode == 'auto':
+                self.bootstrap()
+            else:
+                print("Database schema is out of date; start once with DB_STARTUP=auto")
+        self.startup_ms = 1000 * (time.perf_counter() - start) - self.connect_ms
+        print("Schema check took {:.1f} ms (+{:.1f} ms connect)".format(self.startup_ms, self.connect_ms))
+
+    def bootstrap(self):
+        """
+        Create every table, index and trigger that is missing and record SCHEMA_VERSION.
+        """
+        self.create_tables()
+
+    def create_tables(self):
+        try:
+            with self.pool.connection() as cnx:
+                cnx.executescript('BEGIN IMMEDIATE;{}PRAGMA user_version = {};COMMIT;'.format(SCHEMA, SCHEMA_VERSION))
+        except sqlite3.Error as e:
+            print("Error creating tables: {}".format(e))
+
+    @contextmanager
+    def transaction(self):
+        """
+        Borrow a connection holding the write lock (BEGIN IMMEDIATE) for the `with` block:
+        committed when the block ends, rolled back if it raises.
+        """
+        with self.pool.connection() as cnx:
+            cnx.execute('BEGIN IMMEDIATE')
+            try:
+                yield cnx
+                cnx.commit()
+            except BaseException:
+                cnx.rollback()
+                raise
+
+    def get_catalog_version(self):
+        """
+        Return the catalog version counter, bumped by every change to games, stock or covers.
+        """
+        return self.catalog_cache.get_or_load('version', self._load_catalog_version) or 0
+
+    def _load_catalog_version(self):
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+                row = cursor.fetchone()
+                cursor.close()
+                return row[0] if row else None
+        except sqlite3.Error as e:
+            print("Error reading catalog version: {}".format(e))
+            return None
+
+    def catalog_changed(self):
+        """
+        Bump the catalog version, then drop this worker's cached catalog pages once the bump has
+        committed, so a concurrent read cannot re-cache the old version.
+        """
+        try:
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+                cursor.close()
+        except sqlite3.Error as e:
+            print("Error bumping catalog version: {}".format(e))
+        finally:
+            self.catalog_cache.invalidate()
+
+    def get_all_games(self, after_id=None, limit=PAGE_SIZE):
+        """
+        Retrieve one page of games with inventory for the admin page, ordered by game_id (None on error).
+        """
+        return self._load_game_page(None, after_id, limit, join='JOIN')
+
+    def get_games_by_platform(self, platform=None, after_id=None, limit=PAGE_SIZE):
+        """
+        Retrieve one page of games for the specified platform through the catalog cache (None on error).
+        """
+        key = (platform.lower() if platform else None, after_id, limit)
+        return self.catalog_cache.get_or_load(key, lambda: self._load_game_page(platform, after_id, limit))
+
+    def _load_game_page(self, platform, after_id, limit, join='LEFT JOIN'):
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions = ['g.retired_at IS NULL', 'g.game_id > ?']
+        params = [int(after_id or 0)]
+        if platform:
+            conditions.append('g.platform = ?')
+            params.append(platform)
+        query = """
+            SELECT {columns}
+            FROM games g
+            {join} game_inventory gi ON g.game_id = gi.game_id
+            WHERE {where}
+            ORDER BY g.game_id
+            LIMIT ?
+        """.format(columns=GAME_CARD_COLUMNS, join=join, where=' AND '.join(conditions))
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(DictCursor)
+                cursor.execute(query, params + [limit + 1])
+                result = cursor.fetchall()
+                cursor.close()
+                return split_page(result, limit, 'game_id')
+        except sqlite3.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    def search_games(self, text, page=1, limit=PAGE_SIZE):
+        """
+        Full-text search over name, developer, publisher and details, best matches (BM25) first.
+        Returns (games, next_page), or None on error.
+        """
+        terms = fts_terms(text)
+        if not terms:
+            return [], None
+        page = max(1, int(page))
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        key = ('search', terms, page, limit)
+        return self.catalog_cache.get_or_load(key, lambda: self._search_games(terms, page, limit))
+
+    def _search_games(self, terms, page, limit):
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(DictCursor)
+                query = """
+                    SELECT {columns}, -f.rank AS score
+                    FROM games_fts f
+                    JOIN games g ON g.game_id = f.rowid
+                    LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+                    WHERE games_fts MATCH ? AND g.retired_at IS NULL
+                    ORDER BY f.rank, g.game_id
+                    LIMIT ? OFFSET ?
+                """.format(columns=GAME_CARD_COLUMNS)
+                cursor.execute(query, (terms, limit + 1, (page - 1) * limit))
+                result = cursor.fetchall()
+                cursor.close()
+                if len(result) > limit:
+                    return result[:limit], page + 1
+                return result, None
+        except sqlite3.Error as e:
+            print("Error searching games: {}".format(e))
+            return None
+
+    def suggest_games(self, text, limit=8):
+        """
+        Typeahead: games whose name has words starting with the typed words.
+        """
+        terms = fts_terms(text)
+        if not terms:
+            return []
+        key = ('suggest', terms, limit)
+        return self.catalog_cache.get_or_load(key, lambda: self._suggest_games(terms, limit)) or []
+
+    def _suggest_games(self, terms, limit):
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(DictCursor)
+                query = """
+                    SELECT g.game_id, g.game_name, g.platform
+                    FROM games_fts f
+                    JOIN games g ON g.game_id = f.rowid
+                    WHERE games_fts MATCH ? AND g.retired_at IS NULL
+                    ORDER BY f.rank, g.game_name
+                    LIMIT ?
+                """
+                cursor.execute(query, ('{{game_name}} : ({})'.format(terms), limit))
+                result = cursor.fetchall()
+                cursor.close()
+                return result
+        except sqlite3.Error as e:
+            print("Error suggesting games: {}".format(e))
+            return None
+
+    def get_game_by_id(self, game_id):
+        """
+        Retrieve a game by its ID, including games_count.
+        """
+        return self._fetch(GAME_BY_ID_QUERY, (game_id,), one=True)
+
+    def get_games_by_ids(self, game_ids):
+        """
+        Retrieve several games (e.g. a cart) with one query, in the order given.
+        """
+        game_ids = [int(game_id) for game_id in game_ids]
+        if not game_ids:
+            return []
+        query = """
+            SELECT g.game_id, g.game_name, g.platform, g.price, gi.games_count
+            FROM games g
+            LEFT JOIN game_inventory gi ON g.game_id = gi.game_id
+            WHERE g.game_id IN ({})
+        """.format(placeholders(game_ids))
+        rows = self._fetch(query, game_ids)
+        if rows is None:
+            return None
+        games = {row['game_id']: row for row in rows}
+        return [games[game_id] for game_id in game_ids if game_id in games]
+
+    def get_game_names(self):
+        """
+        Retrieve the id and name of every game.
+        """
+        return self._fetch("SELECT game_id, game_name FROM games ORDER BY game_id") or []
+
+    def _fetch(self, query, params=(), one=False):
+        """
+        Run a read and return its rows (or first row) as dicts; None on error.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(DictCursor)
+                cursor.execute(query, params)
+                result = cursor.fetchone() if one else cursor.fetchall()
+                cursor.close()
+                return result
+        except sqlite3.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    def add_game_to_list(self, game):
+        try:
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                query = """
+                    INSERT INTO games (game_name, details, developer, publisher, platform, price)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """
+                cursor.execute(query, (game[0], game[1], game[2], game[3], game[4], game[5]))
+                game_id = cursor.lastrowid
+                cursor.execute("INSERT INTO game_inventory (game_id, games_count) VALUES (?, ?)", (game_id, game[6]))
+                cursor.close()
+            self.catalog_changed()
+            return game_id
+        except sqlite3.Error as e:
+            print("Error adding game: ", e)
+            return False
+
+    def retire_games(self, game_ids):
+        """
+        Soft-delete games: off listings, search and sale, while their orders stay (see MySql.retire_games).
+        """
+        game_ids = list(dict.fromkeys(int(game_id) for game_id in game_ids))
+        if not game_ids:
+            return 0
+        try:
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("UPDATE games SET retired_at = ? WHERE game_id IN ({}) AND retired_at IS NULL"
+                               .format(placeholders(game_ids)), [datetime.datetime.now()] + game_ids)
+                retired = cursor.rowcount
+                cursor.execute("UPDATE game_inventory SET games_count = 0 WHERE game_id IN ({})"
+                               .format(placeholders(game_ids)), game_ids)
+                cursor.close()
+            self.catalog_changed()
+            return retired
+        except sqlite3.Error as e:
+            print("Error retiring games: {}".format(e))
+            return None
+
+    def delete_game(self, game_id, chunk_size=DELETE_CHUNK_SIZE):
+        """
+        Permanently delete a game together with every order that contains it, `chunk_size`
+        orders per transaction so the write lock is released between chunks.
+        """
+        if self.retire_games([game_id]) is None:
+            return False
+        try:
+            while self._delete_order_chunk(game_id, chunk_size):
+                pass
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+                cursor.close()
+            self.catalog_changed()
+            return True
+        except sqlite3.Error as e:
+            print("Error deleting game:", e)
+            return False
+
+    def _delete_order_chunk(self, game_id, chunk_size):
+        with self.transaction() as cnx:
+            cursor = cnx.cursor()
+            cursor.execute("""
+                SELECT oi.order_id, uo.user_id
+                FROM order_items oi
+                JOIN user_orders uo ON uo.order_id = oi.order_id
+                WHERE oi.game_id = ?
+                LIMIT ?
+            """, (game_id, chunk_size))
+            rows = cursor.fetchall()
+            order_ids = [row[0] for row in rows]
+            user_ids = sorted({row[1] for row in rows if row[1] is not None})
+            if order_ids:
+                cursor.execute("DELETE FROM user_orders WHERE order_id IN ({})".format(placeholders(order_ids)),
+                               order_ids)
+            if user_ids:
+                cursor.execute(USER_SUMMARY_REBUILD.format(placeholders(user_ids)), user_ids)
+            cursor.close()
+            return len(order_ids)
+
+    def get_cover_map(self, game_ids):
+        """
+        Return {game_id: {(variant, format): filename}} for the processed covers of `game_ids`,
+        one query per page of cards, through the catalog cache.
+        """
+        game_ids = sorted({int(game_id) for game_id in game_ids})
+        if not game_ids:
+            return {}
+        return self.catalog_cache.get_or_load(('covers', tuple(game_ids)), lambda: self._load_cover_map(game_ids)) or {}
+
+    def _load_cover_map(self, game_ids):
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("SELECT game_id, variant, format, path FROM game_covers WHERE game_id IN ({})"
+                               .format(placeholders(game_ids)), game_ids)
+                cover_map = cover_map_from_rows(cursor.fetchall())
+                cursor.close()
+                return cover_map
+        except sqlite3.Error as e:
+            print("Error fetching cover variants: {}".format(e))
+            return None
+
+    def set_cover_variants(self, game_id, variants):
+        """
+        Record the generated (variant, format, filename, width, height, bytes) files for a game.
+        """
+        try:
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                query = """
+                    REPLACE INTO game_covers (game_id, variant, format, path, width, height, bytes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """
+                cursor.executemany(query, [(game_id,) + tuple(variant) for variant in variants])
+                cursor.close()
+            self.catalog_changed()
+            return True
+        except sqlite3.Error as e:
+            print("Error saving cover variants: {}".format(e))
+            return False
+
+    def get_user_by_id(self, user_id):
+        """
+        Retrieve a user by their ID.
+        """
+        return self._fetch("SELECT * FROM users WHERE user_id = ?", (user_id,), one=True)
+
+    def get_user_by_username(self, username):
+        """
+        Retrieve a user by their username (False if there is none).
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor(DictCursor)
+                cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
+                user = cursor.fetchone()
+                cursor.close()
+                return user or False
+        except sqlite3.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    def get_user_profile(self, user_id):
+        """
+        Retrieve the displayable fields of a user (everything but the password hash).
+        """
+        return self._fetch(USER_PROFILE_QUERY, (user_id,), one=True)
+
+    def update_user(self, user_id, email, phone, address):
+        """
+        Update a user's contact details.
+        """
+        return self._write("UPDATE users SET email = ?, phone = ?, address = ? WHERE user_id = ?",
+                           (email, phone, address, user_id))
+
+    def get_login(self, username):
+        """
+        Retrieve just what a login needs (user_id, username, password_hash) for a username.
+        """
+        return self._fetch("SELECT user_id, username, password_hash FROM users WHERE username = ?", (username,),
+                           one=True)
+
+    def update_password_hash(self, user_id, password_hash):
+        """
+        Replace a user's password hash (e.g. after the hash cost was raised).
+        """
+        return self._write("UPDATE users SET password_hash = ? WHERE user_id = ?", (password_hash, user_id))
+
+    def _write(self, query, params):
+        """
+        Run one write in its own transaction. Returns True, or False on error.
+        """
+        try:
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute(query, params)
+                cursor.close()
+            return True
+        except sqlite3.Error as e:
+            print("Error executing query: {}".format(e))
+            return False
+
+    def create_user(self, user):
+        """
+        Create a new user and return its user_id; raises AccountExists if the username or email is taken.
+        """
+        try:
+            with self.transaction() as cnx:
+                cursor = cnx.cursor()
+                query = 'INSERT INTO users (username, password_hash, phone, address, email) VALUES (?, ?, ?, ?, ?)'
+                cursor.execute(query, (user[0], user[1], user[2], user[3], user[4]))
+                user_id = cursor.lastrowid
+                cursor.close()
+            return user_id
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: users.email"
+            raise AccountExists('email' if str(e).endswith('users.email') else 'username')
+        except sqlite3.Error as e:
+            print("Error executing query: {}".format(e))
+            return None
+
+    def add_game_to_bought(self, game_id, user_id):
+        """
+        Add a game to the user's bought games.
+        """
+        order, out_of_stock = self.checkout(user_id, [game_id])
+        if out_of_stock:
+            print("Error adding game to bought: game {} is out of stock".format(game_id))
+        return order['order_id'] if order else False
+
+    def checkout(self, user_id, game_ids):
+        """
+        Buy several games as one order in a single write transaction (see MySql.checkout).
+        Holding the write lock from the start means no retry loop is needed.
+        """
+        game_ids = list(dict.fromkeys(int(game_id) for game_id in game_ids))
+        if not game_ids:
+            return None, []
+        try:
+            with self.pool.connection() as cnx:
+                cnx.execute('BEGIN IMMEDIATE')
+                try:
+                    order, out_of_stock = self._place_order(cnx, user_id, game_ids)
+                except BaseException:
+                    cnx.rollback()
+                    raise
+            if order:
+                self.catalog_changed()
+            return order, out_of_stock
+        except sqlite3.Error as e:
+            print("Error checking out order: {}".format(e))
+            return None, []
+
+    @staticmethod
+    def _place_order(cnx, user_id, game_ids):
+        quantities = {game_id: 1 for game_id in game_ids}
+        cursor = cnx.cursor()
+        try:
+            if not inventory.reserve(cursor, quantities, placeholder='?'):
+                cnx.rollback()
+                return None, inventory.shortages(cursor, quantities, placeholder='?')
+
+            details = cnx.cursor(DictCursor)
+            details.execute("""
+                SELECT game_id, game_name, developer, publisher, platform, price
+                FROM games
+                WHERE game_id IN ({})
+            """.format(placeholders(game_ids)), game_ids)
+            games = {row['game_id']: row for row in details.fetchall()}
+            details.close()
+
+            date_order = datetime.date.today()
+            cursor.execute('INSERT INTO user_orders (date_order, user_id) VALUES (?, ?)', (date_order, user_id))
+            order_id = cursor.lastrowid
+
+            cursor.executemany('INSERT INTO order_items (order_id, game_id, price) VALUES (?, ?, ?)',
+                               [(order_id, game_id, games[game_id]['price']) for game_id in game_ids])
+
+            # Games the user already owned from earlier orders do not add to games_owned
+            query = """
+                INSERT INTO user_summary (user_id, orders, games_owned, total_spent, last_order_id)
+                VALUES (?, 1, ? - (
+                    SELECT COUNT(DISTINCT oi.game_id)
+                    FROM user_orders uo
+                    JOIN order_items oi ON oi.order_id = uo.order_id
+                    WHERE uo.user_id = ? AND uo.order_id <> ? AND oi.game_id IN ({})
+                ), ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET orders = orders + 1,
+                                                    games_owned = games_owned + excluded.games_owned,
+                                                    total_spent = ROUND(total_spent + excluded.total_spent, 2),
+                                                    last_order_id = excluded.last_order_id
+            """.format(placeholders(game_ids))
+            total = sum(games[game_id]['price'] for game_id in game_ids)
+            cursor.execute(query, [user_id, len(game_ids), user_id, order_id] + game_ids + [total, order_id])
+
+            cnx.commit()
+            items = [games[game_id] for game_id in game_ids]
+            return {'order_id': order_id, 'date_order': date_order, 'items': items}, []
+        finally:
+            cursor.close()
+
+    def get_owned_game_ids(self, user_id):
+        """
+        Retrieve the set of game_ids owned by a user with a single query.
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute(OWNED_GAME_IDS_QUERY, (user_id,))
+                owned_game_ids = {row[0] for row in cursor.fetchall()}
+                cursor.close()
+                return owned_game_ids
+        except sqlite3.Error as e:
+            print(f"Error fetching owned game ids: {e}")
+            return None
+
+    def get_profile(self, user_id, before_order_id=None, library_after=None, order_limit=ORDER_PAGE_SIZE,
+                    library_limit=PAGE_SIZE):
+        """
+        Retrieve the profile summary, a library page and an order history page (see MySql.get_profile),
+        all from one read transaction so they agree with each other.
+        """
+        before, after, order_limit, library_limit = profile_limits(before_order_id, library_after, order_limit,
+                                                                   library_limit)
+        try:
+            with self.pool.connection() as cnx:
+                cnx.execute('BEGIN')
+                cursor = cnx.cursor(DictCursor)
+                cursor.execute(USER_SUMMARY_QUERY, (user_id,))
+                summary = cursor.fetchone()
+                cursor.execute(LIBRARY_PAGE_QUERY, (user_id, after, library_limit + 1))
+                library = cursor.fetchall()
+                cursor.execute(ORDER_HISTORY_QUERY, (user_id, before, order_limit + 1))
+                order_rows = cursor.fetchall()
+                cursor.close()
+                cnx.rollback()
+                return build_profile(summary, library, order_rows, order_limit, library_limit)
+        except sqlite3.Error as e:
+            print("Error fetching profile: {}".format(e))
+            return None
+
+    def rebuild_user_summaries(self, user_ids=None, batch_size=1000):
+        """
+        Recompute profile summaries from the orders table, for the given users or everyone.
+        """
+        if user_ids is None:
+            rows = self._fetch("SELECT user_id FROM users")
+            if rows is None:
+                return None
+            user_ids = [row['user_id'] for row in rows]
+        user_ids = [int(user_id) for user_id in user_ids]
+        try:
+            for start in range(0, len(user_ids), batch_size):
+                batch = user_ids[start:start + batch_size]
+                with self.transaction() as cnx:
+                    cursor = cnx.cursor()
+                    cursor.execute(USER_SUMMARY_REBUILD.format(placeholders(batch)), batch)
+                    cursor.close()
+            return len(user_ids)
+        except sqlite3.Error as e:
+            print("Error rebuilding user summaries: {}".format(e))
+            return None
+
+    def get_order_details(self, order_id):
+        """
+        Retrieve details about a specific order including the game and user details.
+        """
+        return self._fetch("""
+            SELECT uo.order_id, uo.date_order, u.user_id, u.username, u.phone, u.address, u.email,
+                   g.*, oi.order_id AS oi_order_id
+            FROM user_orders uo
+            JOIN order_items oi ON uo.order_id = oi.order_id
+            JOIN games g ON oi.game_id = g.game_id
+            JOIN users u ON uo.user_id = u.user_id
+            WHERE uo.order_id = ?
+            ORDER BY g.game_name
+        """, (order_id,))
+
+    def refresh_sales_rollups(self, rebuild=False, batch_size=5000):
+        """
+        Fold new orders into the sales rollups (recomputing them from scratch with `rebuild`).
+        Each batch runs under the write lock, so no checkout can commit into its id range meanwhile.
+        """
+        processed = 0
+        try:
+            if rebuild:
+                with self.transaction() as cnx:
+                    cursor = cnx.cursor()
+                    for table in ('sales_by_game', 'sales_by_platform', 'sales_by_day'):
+                        cursor.execute("DELETE FROM {}".format(table))
+                    cursor.execute("UPDATE sales_rollup_state SET last_order_id = 0, refreshed_at = NULL WHERE id = 1")
+                    cursor.close()
+            while True:
+                with self.transaction() as cnx:
+                    cursor = cnx.cursor()
+                    cursor.execute("SELECT last_order_id FROM sales_rollup_state WHERE id = 1")
+                    last_order_id = cursor.fetchone()[0]
+                    cursor.execute("SELECT order_id FROM user_orders WHERE order_id > ? ORDER BY order_id LIMIT ?",
+                                   (last_order_id, batch_size))
+                    order_ids = [row[0] for row in cursor.fetchall()]
+                    if order_ids:
+                        for query in ROLLUP_QUERIES:
+                            cursor.execute(query, (last_order_id, order_ids[-1]))
+                        cursor.execute("UPDATE sales_rollup_state SET last_order_id = ?, refreshed_at = ? WHERE id = 1",
+                                       (order_ids[-1], datetime.datetime.now().replace(microsecond=0)))
+                    cursor.close()
+                processed += len(order_ids)
+                if len(order_ids) < batch_size:
+                    return processed
+        except sqlite3.Error as e:
+            print("Error refreshing sales rollups: {}".format(e))
+            return None
+
+    def get_sales_dashboard(self, days=30, top=10, low_stock=LOW_STOCK_THRESHOLD):
+        """
+        Read the admin dashboard from the rollup tables (see MySql.get_sales_dashboard).
+        """
+        try:
+            with self.pool.connection() as cnx:
+                cnx.execute('BEGIN')
+                cursor = cnx.cursor(DictCursor)
+                cursor.execute("SELECT platform, units, revenue FROM sales_by_platform ORDER BY revenue DESC")
+                platforms = cursor.fetchall()
+
+                cursor.execute("SELECT day, orders, units, revenue FROM sales_by_day WHERE day > ? ORDER BY day DESC",
+                               (datetime.date.today() - datetime.timedelta(days=days),))
+                daily = cursor.fetchall()
+
+                cursor.execute("""
+                    SELECT s.game_id, g.game_name, g.platform, s.units, s.revenue, s.last_sold
+                    FROM sales_by_game s
+                    JOIN games g ON g.game_id = s.game_id
+                    ORDER BY s.revenue DESC
+                    LIMIT ?
+                """, (top,))
+                top_games = cursor.fetchall()
+
+                cursor.execute("""
+                    SELECT g.game_id, g.game_name, g.platform, gi.games_count
+                    FROM game_inventory gi
+                    JOIN games g ON g.game_id = gi.game_id
+                    WHERE gi.games_count <= ? AND g.retired_at IS NULL
+                    ORDER BY gi.games_count, gi.game_id
+                    LIMIT 50
+                """, (low_stock,))
+                low_stock_games = cursor.fetchall()
+
+                cursor.execute("SELECT last_order_id, refreshed_at FROM sales_rollup_state WHERE id = 1")
+                state = cursor.fetchone() or {'last_order_id': 0, 'refreshed_at': None}
+                cursor.close()
+                cnx.rollback()
+        except sqlite3.Error as e:
+            print("Error loading sales dashboard: {}".format(e))
+            return None
+
+        return {
+            'units': sum(row['units'] for row in platforms),
+            'revenue': sum(row['revenue'] for row in platforms),
+            'platforms': platforms,
+            'daily': daily,
+            'top_games': top_games,
+            'low_stock': low_stock_games,
+            'low_stock_threshold': low_stock,
+            'last_order_id': state['last_order_id'],
+            'refreshed_at': state['refreshed_at'],
+        }
@@ -0,0 +1,289 @@
+"""
+The storage interface the storefront codes against, and the factory that picks an implementation.
+
+    DB_BACKEND=mysql    sqlCommands.MySql (default): the MySQL server in DB_HOST/DB_NAME
+    DB_BACKEND=sqlite   sqliteCommands.SQLite: an embedded database file at SQLITE_PATH
+
+Both return the same shapes (dict rows, (page, next_cursor) tuples, None or False on errors),
+share the catalog cache and query profiler, and enforce stock the same way, so views, jobs and
+the auth module never need to know which one they are talking to.
+"""
+import abc
+import os
+
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')
+
+# Settings both backends share, kept here so neither has to import the other (or its driver)
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+# auto: apply migrations only when the schema fingerprint is stale; verify: never run DDL; skip: no check
+STARTUP_MODE = os.environ.get('DB_STARTUP', 'auto')
+
+PAGE_SIZE = 40
+MAX_PAGE_SIZE = 100
+# Listing cards only show the start of `details`, so list queries do not ship the whole TEXT column
+DETAILS_PREVIEW = 300
+
+# Statements slower than this are logged to the 'gamestore.sql' logger
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# Orders removed per transaction when a game is purged, to bound lock time
+DELETE_CHUNK_SIZE = int(os.environ.get('DELETE_CHUNK_SIZE', 1000))
+
+# Orders per page of a profile's order history
+ORDER_PAGE_SIZE = 10
+
+CATALOG_CACHE_SIZE = int(os.environ.get('CATALOG_CACHE_SIZE', 256))
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 60))
+
+
+class AccountExists(Exception):
+    """
+    Raised by create_user when another user already has this username or email (`field`).
+    """
+    def __init__(self, field):
+        super().__init__("An account with this {} already exists".format(field))
+        self.field = field
+
+
+def split_page(rows, limit, key):
+    """
+    Split `limit` + 1 fetched rows into (page, next_cursor); next_cursor is None on the last page.
+    """
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1][key]
+    return rows, None
+
+
+def profile_limits(before_order_id, library_after, order_limit, library_limit):
+    """
+    Normalize get_profile's paging arguments into the parameters of its queries.
+    """
+    order_limit = max(1, min(int(order_limit), MAX_PAGE_SIZE))
+    library_limit = max(1, min(int(library_limit), MAX_PAGE_SIZE))
+    before = int(before_order_id) if before_order_id else 2 ** 31 - 1
+    return before, int(library_after or 0), order_limit, library_limit
+
+
+def build_profile(summary, library, order_rows, order_limit, library_limit):
+    """
+    Assemble get_profile's result from its three queries' rows, grouping history rows into orders.
+    """
+    orders = {}
+    for row in order_rows:
+        order = orders.setdefault(row['order_id'], {'order_id': row['order_id'], 'date_order': row['date_order'],
+                                                    'items': [], 'total': 0})
+        if row['game_id'] is not None:
+            order['items'].append({'game_id': row['game_id'], 'game_name': row['game_name'],
+                                   'platform': row['platform'], 'price': row['price']})
+            order['total'] += row['price'] or 0
+    library, next_library_after = split_page(library, library_limit, 'game_id')
+    orders, next_before_order_id = split_page(list(orders.values()), order_limit, 'order_id')
+    return {'summary': summary or {'orders': 0, 'games_owned': 0, 'total_spent': 0, 'last_order_id': None},
+            'library': library, 'next_library_after': next_library_after,
+            'orders': orders, 'next_before_order_id': next_before_order_id}
+
+
+def cover_map_from_rows(rows):
+    cover_map = {}
+    for game_id, variant, fmt, path in rows:
+        cover_map.setdefault(game_id, {})[(variant, fmt)] = path
+    return cover_map
+
+
+class StorageBackend(abc.ABC):
+    # Parameter marker of the backend's driver, for the few callers that run their own SQL
+    placeholder = '%s'
+    # Exception classes of the backend's driver, for the same callers and for its connection pool
+    errors = ()
+    # Read replicas are a MySQL feature; backends without them leave this None
+    replicas = None
+
+    def pool_stats(self):
+        """
+        Return connection pool usage (in use, waiting, wait times).
+        """
+        return self.pool.stats()
+
+    def replica_stats(self):
+        return None
+
+    def pin_primary(self, until):
+        pass
+
+    def primary_pinned_until(self):
+        return 0
+
+    # Schema
+    @abc.abstractmethod
+    def prepare_schema(self, mode):
+        """
+        Check the schema at startup ('auto' also creates or upgrades it, 'verify' only reports, 'skip' does neither).
+        """
+
+    @abc.abstractmethod
+    def bootstrap(self):
+        """
+        Create the database if needed and bring its schema up to date.
+        """
+
+    # Catalog
+    @abc.abstractmethod
+    def get_catalog_version(self):
+        """
+        Return the counter bumped by every change to games, stock or covers.
+        """
+
+    @abc.abstractmethod
+    def catalog_changed(self):
+        """
+        Bump the catalog version and drop cached catalog reads.
+        """
+
+    @abc.abstractmethod
+    def get_all_games(self, after_id=None, limit=None):
+        """
+        Return (games, next_after_id) for one page of the admin listing, or None on error.
+        """
+
+    @abc.abstractmethod
+    def get_games_by_platform(self, platform=None, after_id=None, limit=None):
+        """
+        Return (games, next_after_id) for one page of active games, optionally of one platform, or None on error.
+        """
+
+    @abc.abstractmethod
+    def search_games(self, text, page=1, limit=None):
+        """
+        Return (games, next_page) for a prefix-matching full-text search, best matches first, or None on error.
+        """
+
+    @abc.abstractmethod
+    def suggest_games(self, text, limit=8):
+        """
+        Return the games whose names match the typed words, for typeahead.
+        """
+
+    @abc.abstractmethod
+    def get_game_by_id(self, game_id):
+        pass
+
+    @abc.abstractmethod
+    def get_games_by_ids(self, game_ids):
+        pass
+
+    @abc.abstractmethod
+    def get_game_names(self):
+        pass
+
+    @abc.abstractmethod
+    def add_game_to_list(self, game):
+        """
+        Insert a (name, details, developer, publisher, platform, price, count) game; return its game_id or False.
+        """
+
+    @abc.abstractmethod
+    def retire_games(self, game_ids):
+        """
+        Take games off sale without touching their orders; return how many were retired.
+        """
+
+    @abc.abstractmethod
+    def delete_game(self, game_id, chunk_size=None):
+        """
+        Permanently delete a game and every order containing it.
+        """
+
+    @abc.abstractmethod
+    def get_cover_map(self, game_ids):
+        """
+        Return {game_id: {(variant, format): filename}} for the processed covers of `game_ids`.
+        """
+
+    @abc.abstractmethod
+    def set_cover_variants(self, game_id, variants):
+        pass
+
+    # Users
+    @abc.abstractmethod
+    def get_user_by_id(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def get_user_by_username(self, username):
+        pass
+
+    @abc.abstractmethod
+    def get_user_profile(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def update_user(self, user_id, email, phone, address):
+        pass
+
+    @abc.abstractmethod
+    def get_login(self, username):
+        pass
+
+    @abc.abstractmethod
+    def update_password_hash(self, user_id, password_hash):
+        pass
+
+    @abc.abstractmethod
+    def create_user(self, user):
+        """
+        Insert a (username, password_hash, phone, address, email) user; return its user_id, or None on error.
+        Raises AccountExists naming the column ('username' or 'email') when either is taken.
+        """
+
+    # Orders
+    @abc.abstractmethod
+    def add_game_to_bought(self, game_id, user_id):
+        pass
+
+    @abc.abstractmethod
+    def checkout(self, user_id, game_ids):
+        """
+        Buy several games as one order, all or nothing; return (order, out_of_stock).
+        """
+
+    @abc.abstractmethod
+    def get_owned_game_ids(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def get_profile(self, user_id, before_order_id=None, library_after=None, order_limit=None,
+                    library_limit=None):
+        pass
+
+    @abc.abstractmethod
+    def rebuild_user_summaries(self, user_ids=None, batch_size=1000):
+        pass
+
+    @abc.abstractmethod
+    def get_order_details(self, order_id):
+        pass
+
+    # Admin analytics
+    @abc.abstractmethod
+    def refresh_sales_rollups(self, rebuild=False):
+        pass
+
+    @abc.abstractmethod
+    def get_sales_dashboard(self, days=30, top=10, low_stock=None):
+        pass
+
+
+def open_backend(name=None, **kwargs):
+    """
+    Create the storage backend named by `name` (default: DB_BACKEND), passing `kwargs` to it.
+    """
+    name = (name or DB_BACKEND).lower()
+    if name == 'mysql':
+        from sqlCommands import MySql
+        return MySql(**kwargs)
+    if name == 'sqlite':
+        from sqliteCommands import SQLite
+        return SQLite(**kwargs)
+    raise ValueError("Unknown DB_BACKEND {!r} (expected 'mysql' or 'sqlite')".format(name))
@@ -0,0 +1,54 @@
+"""
+The suite runs against the embedded SQLite backend, so it needs no database server.
+The environment is set before anything imports the app, whose modules read it at import time.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix='gamestore-tests-')
+os.environ.update({
+    'DB_BACKEND': 'sqlite',
+    'SQLITE_PATH': os.path.join(WORKDIR, 'app.db'),
+    'SESSION_DIR': os.path.join(WORKDIR, 'sessions'),
+    'OUTBOX_DIR': os.path.join(WORKDIR, 'outbox'),
+    'RECEIPTS_DIR': os.path.join(WORKDIR, 'receipts'),
+    'ANALYTICS_REFRESH_SECONDS': '0',
+})
+
+import pytest  # noqa: E402
+
+from sqliteCommands import SQLite  # noqa: E402
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLite(path=str(tmp_path / 'store.db'))
+
+
+@pytest.fixture
+def add_game(db):
+    def add(name, platform='PC', count=5, price=9.99):
+        return db.add_game_to_list([name, 'Details', 'Dev', 'Pub', platform, price, count])
+    return add
+
+
+@pytest.fixture
+def user_id(db):
+    return db.create_user(['buyer', 'hash', '555', 'Somewhere', 'buyer@example.com'])
+
+
+@pytest.fixture
+def client():
+    import main
+    main.page_cache.invalidate()
+    main.crsr.catalog_cache.invalidate()
+    return main.app.test_client()
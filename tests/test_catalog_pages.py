@@ -0,0 +1,39 @@
+import main
+
+
+def failed_read(*args, **kwargs):
+    return None
+
+
+def test_failed_listing_read_is_a_503_that_is_neither_cached_nor_tagged(client, monkeypatch):
+    monkeypatch.setattr(main.crsr, 'get_games_by_platform', failed_read)
+
+    for path in ('/home', '/filter?platform=PS5'):
+        response = client.get(path)
+        assert response.status_code == 503
+        assert 'ETag' not in response.headers
+    assert main.page_cache.stats()['entries'] == 0
+
+
+def test_failed_search_read_is_a_503(client, monkeypatch):
+    monkeypatch.setattr(main.crsr, 'search_games', failed_read)
+
+    response = client.get('/search?q=zelda')
+
+    assert response.status_code == 503
+    assert 'ETag' not in response.headers
+    assert main.page_cache.stats()['entries'] == 0
+
+
+def test_listing_recovers_once_the_database_does(client, monkeypatch):
+    main.crsr.add_game_to_list(['Recovered Quest', 'Details', 'Dev', 'Pub', 'PC', 19.99, 3])
+    monkeypatch.setattr(main.crsr, 'get_games_by_platform', failed_read)
+    assert client.get('/home').status_code == 503
+
+    monkeypatch.undo()
+    response = client.get('/home')
+
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert 'Recovered Quest' in response.get_data(as_text=True)
+    assert client.get('/home', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
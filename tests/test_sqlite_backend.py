@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from storageBackend import AccountExists
+
+
+def stock(db, game_id):
+    return db.get_game_by_id(game_id)['games_count']
+
+
+def test_checkout_is_all_or_nothing(db, add_game, user_id):
+    in_stock = add_game('In Stock', count=1)
+    sold_out = add_game('Sold Out', count=0)
+
+    order, out_of_stock = db.checkout(user_id, [in_stock, sold_out])
+
+    assert order is None
+    assert out_of_stock == [sold_out]
+    assert stock(db, in_stock) == 1
+    assert db.get_owned_game_ids(user_id) == set()
+
+
+def test_checkout_takes_stock_and_records_the_order(db, add_game, user_id):
+    first, second = add_game('First', count=2), add_game('Second', count=1)
+
+    order, out_of_stock = db.checkout(user_id, [first, second])
+
+    assert out_of_stock == []
+    assert sorted(item['game_id'] for item in order['items']) == [first, second]
+    assert (stock(db, first), stock(db, second)) == (1, 0)
+    assert db.get_owned_game_ids(user_id) == {first, second}
+
+
+def test_checkout_rejects_oversell(db, add_game, user_id):
+    game_id = add_game('Last Copy', count=1)
+    assert db.checkout(user_id, [game_id])[0]
+
+    order, out_of_stock = db.checkout(user_id, [game_id])
+
+    assert order is None
+    assert out_of_stock == [game_id]
+    assert stock(db, game_id) == 0
+
+
+def test_concurrent_buyers_never_oversell(db, add_game, user_id):
+    game_id = add_game('Hot Release', count=3)
+    orders = []
+
+    def buy():
+        orders.append(db.checkout(user_id, [game_id])[0])
+
+    threads = [threading.Thread(target=buy) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(1 for order in orders if order) == 3
+    assert stock(db, game_id) == 0
+
+
+def test_keyset_pages_follow_their_cursors(db, add_game):
+    pc_games = [add_game('PC {}'.format(n)) for n in range(7)]
+    add_game('Console', platform='PS5')
+
+    pages = []
+    after_id = None
+    while True:
+        games, after_id = db.get_games_by_platform(platform='PC', after_id=after_id, limit=3)
+        pages.append([game['game_id'] for game in games])
+        if after_id is None:
+            break
+
+    assert pages == [pc_games[0:3], pc_games[3:6], pc_games[6:]]
+
+
+def test_keyset_cursor_is_the_last_id_on_the_page(db, add_game):
+    game_ids = [add_game('Game {}'.format(n)) for n in range(4)]
+
+    games, next_after = db.get_all_games(limit=2)
+
+    assert [game['game_id'] for game in games] == game_ids[:2]
+    assert next_after == game_ids[1]
+    assert db.get_all_games(after_id=game_ids[-1], limit=2) == ([], None)
+
+
+def test_retired_games_leave_the_listing(db, add_game):
+    kept, retired = add_game('Kept'), add_game('Retired')
+    db.retire_games([retired])
+
+    games, _ = db.get_games_by_platform(platform='PC')
+
+    assert [game['game_id'] for game in games] == [kept]
+
+
+def test_create_user_names_the_taken_username(db, user_id):
+    with pytest.raises(AccountExists) as excinfo:
+        db.create_user(['BUYER', 'hash', '555', 'Elsewhere', 'other@example.com'])
+    assert excinfo.value.field == 'username'
+
+
+def test_create_user_names_the_taken_email(db, user_id):
+    with pytest.raises(AccountExists) as excinfo:
+        db.create_user(['someone', 'hash', '555', 'Elsewhere', 'Buyer@Example.com'])
+    assert excinfo.value.field == 'email'